@@ -32,13 +32,28 @@
 PREPARE_LOGGING(FileWriter_i)
 
 FileWriter_i::FileWriter_i(const char *uuid, const char *label) :
-FileWriter_base(uuid, label) {
+FileWriter_base(uuid, label),
+port_threads_running(false),
+dataChar_feed(dataChar_in, "dataChar_in", &packet_ready),
+dataOctet_feed(dataOctet_in, "dataOctet_in", &packet_ready),
+dataShort_feed(dataShort_in, "dataShort_in", &packet_ready),
+dataUshort_feed(dataUshort_in, "dataUshort_in", &packet_ready),
+dataFloat_feed(dataFloat_in, "dataFloat_in", &packet_ready),
+dataDouble_feed(dataDouble_in, "dataDouble_in", &packet_ready),
+dataXML_feed(dataXML_in, "dataXML_in", &packet_ready),
+packet_prefetching(false),
+input_wait(0.0),
+stream_scheduling(false) {
     //properties are not updated until callback function is called and they are explicitly set.
     addPropertyListener(destination_uri, this, &FileWriter_i::destination_uriChanged);
     addPropertyListener(destination_uri_suffix, this, &FileWriter_i::destination_uri_suffixChanged);
     addPropertyListener(file_format, this, &FileWriter_i::file_formatChanged);
     addPropertyListener(advanced_properties, this, &FileWriter_i::advanced_propertiesChanged);
     addPropertyListener(recording_timer, this, &FileWriter_i::recording_timerChanged);
+    addPropertyListener(stream_weights, this, &FileWriter_i::stream_weightsChanged);
+    setPropertyQueryImpl(performance_statistics, this, &FileWriter_i::get_performance_statistics);
+    setPropertyQueryImpl(trace_events, this, &FileWriter_i::get_trace_events);
+    setPropertyQueryImpl(write_behind_statistics, this, &FileWriter_i::get_write_behind_statistics);
 }
 
 FileWriter_i::~FileWriter_i() {
@@ -51,39 +66,123 @@ void FileWriter_i::constructor() {
 
     // accounts for initial values of properties since callbacks are not called
     construct_recording_timer(recording_timer);
+    set_stream_weights(stream_weights);
     if (file_format == "BLUEFILE")
         current_writer_type = BLUEFILE;
     else
         current_writer_type = RAW;
     maxSize = sizeString_to_longBytes(advanced_properties.max_file_size);
+    checkpointSize = sizeString_to_longBytes(advanced_properties.header_checkpoint_size);
     change_uri();
 }
 
 void FileWriter_i::start() throw (CF::Resource::StartError, CORBA::SystemException) {
+    // The threads, queues and trace buffer below are only set up while stopped,
+    // since the threads of a running component are using them
+    if (started())
+        return;
+    input_wait = std::max(advanced_properties.input_wait_timeout, 0.0);
+    packet_ready.clear();
+    size_t write_behind_bytes = sizeString_to_longBytes(advanced_properties.write_behind_max_memory);
+    if (write_behind_bytes > 0) {
+        write_behind_queue<locked_file_io>::overflow_policy overflow = write_behind_queue<locked_file_io>::BLOCK;
+        if (advanced_properties.write_behind_overflow == "DROP")
+            overflow = write_behind_queue<locked_file_io>::DROP;
+        write_behind.start(write_behind_bytes, overflow, std::max(advanced_properties.write_behind_threads, CORBA::Long(1)));
+    }
+    if (advanced_properties.io_uring_queue_depth > 0 && !uring.start(advanced_properties.io_uring_queue_depth))
+        LOG_WARN(FileWriter_i, "io_uring is not available, local files will be written synchronously");
+    size_t finisher_threads = std::max(advanced_properties.finalizer_threads, CORBA::Long(0));
+    if (finisher_threads == 0 && (advanced_properties.standby_files || advanced_properties.thread_per_port))
+        finisher_threads = 1;
+    if (finisher_threads > 0)
+        finisher.start(finisher_threads, FINISHER_MAX_QUEUED_JOBS, boost::bind(&FileWriter_i::finisher_error, this, _1, _2));
+    if (advanced_properties.compression != "NONE") {
+        if (!block_compressor::available(block_compressor::codec_from_string(advanced_properties.compression))) {
+            LOG_WARN(FileWriter_i, advanced_properties.compression << " compression is not available, files will be written uncompressed");
+        } else {
+            size_t compression_threads = std::max(advanced_properties.compression_threads, CORBA::Long(0));
+            if (compression_threads == 0)
+                compression_threads = boost::thread::hardware_concurrency();
+            compressor.start(compression_threads);
+        }
+    }
+    configure_stream_scheduling();
+    reset_performance_statistics();
+    tracer.configure(std::max(advanced_properties.trace_buffer_events, CORBA::Long(0)));
     FileWriter_base::start();
+    if (advanced_properties.thread_per_port)
+        start_port_threads();
+    // Scheduling needs the feeds to drain the ports, whichever threads service them
+    if (stream_scheduling || (!advanced_properties.thread_per_port && input_wait > 0))
+        start_packet_prefetch();
 }
 
 void FileWriter_i::stop() throw (CF::Resource::StopError, CORBA::SystemException) {
+    // Release the service thread if it is waiting for data so it can exit
+    packet_ready.interrupt();
     FileWriter_base::stop();
+    stop_port_threads();
+    stop_packet_prefetch();
+    if (stream_scheduling) {
+        log_dropped_packets(dataChar_feed);
+        log_dropped_packets(dataOctet_feed);
+        log_dropped_packets(dataShort_feed);
+        log_dropped_packets(dataUshort_feed);
+        log_dropped_packets(dataFloat_feed);
+        log_dropped_packets(dataDouble_feed);
+        log_dropped_packets(dataXML_feed);
+    }
 
-    exclusive_lock lock(service_thread_lock);
+    write_lock lock(service_thread_lock);
+    exclusive_lock state_lock(stream_state_lock);
 
-    for (std::map<std::string, std::string>::iterator curFileIter = stream_to_file_mapping.begin(); curFileIter != stream_to_file_mapping.end(); curFileIter++) {
-        close_file(curFileIter->second, getSystemTimestamp());
+    for (stream_state_map::iterator curStreamIter = stream_states.begin(); curStreamIter != stream_states.end(); curStreamIter++) {
+        close_file(curStreamIter->second.destination_filename, getSystemTimestamp());
+    }
+    stream_states.clear();
+    packet_streams.clear();
+    for (standby_file_map::iterator standby = standby_files.begin(); standby != standby_files.end(); standby++)
+        discard_standby(standby->second);
+    standby_files.clear();
+    if (finisher.active()) {
+        // Waits for the files still being finished, which the loop above closed in parallel with finalizer_threads
+        finisher.stop();
+        file_finisher_counters counters = finisher.counters();
+        LOG_DEBUG(FileWriter_i, "Opened or finished " << counters.jobs << " files in the background (peak queued: "
+                << counters.peak_queued_jobs << ", blocked: " << counters.blocked_jobs << ")");
+        if (counters.failed_jobs > 0)
+            LOG_ERROR(FileWriter_i, "Failed to open or finish " << counters.failed_jobs << " files in the background");
     }
-    stream_to_file_mapping.clear();
+    compressor.stop();
     timer_set_iter = timer_set.end();
+
+    if (uring.active()) {
+        uring.stop();
+        if (uring.failures() > 0)
+            LOG_ERROR(FileWriter_i, "io_uring reported " << uring.failures() << " failed writes");
+    }
+    if (write_behind.active()) {
+        write_behind.stop();
+        write_behind_counters counters = write_behind.counters();
+        LOG_DEBUG(FileWriter_i, "Write-behind queue wrote " << counters.written_bytes << " bytes in " << counters.writes
+                << " writes (peak queued: " << counters.peak_queued_bytes << " bytes, blocked writes: " << counters.blocked_writes << ")");
+        if (counters.dropped_writes > 0)
+            LOG_WARN(FileWriter_i, "Write-behind queue dropped " << counters.dropped_bytes << " bytes in " << counters.dropped_writes << " writes");
+        if (counters.failed_writes > 0)
+            LOG_ERROR(FileWriter_i, "Write-behind queue failed to write " << counters.failed_writes << " times");
+    }
 }
 
 void FileWriter_i::destination_uriChanged(std::string oldValue, std::string newValue) {
-    exclusive_lock lock(service_thread_lock);
+    write_lock lock(service_thread_lock);
     if (oldValue != newValue) {
         change_uri();
     }
 }
 
 void FileWriter_i::destination_uri_suffixChanged(std::string oldValue, std::string newValue) {
-    exclusive_lock lock(service_thread_lock);
+    write_lock lock(service_thread_lock);
     if (oldValue != newValue) {
         change_uri();
     }
@@ -105,6 +204,8 @@ void FileWriter_i::change_uri() {
                     CF::DomainManager_var dm = FILE_WRITER_DOMAIN_MGR_HELPERS::domainManager_id_to_var(dom_id);
                     if (!CORBA::is_nil(dm)){
                         filesystem.update_sca_file_manager(dm->fileMgr());
+                        for (size_t port = 0; port < NUM_INPUT_PORTS; ++port)
+                            port_filesystems[port].update_sca_file_manager(dm->fileMgr());
                         component_status.domain_name = ossie::corba::returnString(dm->name());
                     } else {
                         LOG_DEBUG(FileWriter_i,"Domain Manager var is nil, throwing logic_error...");
@@ -138,6 +239,7 @@ void FileWriter_i::change_uri() {
     }
     prop_dirname = prefix + dir;
     prop_basename = base;
+    prop_basename_template.compile(base);
     prop_full_filename = prop_dirname + base;
     if (!filesystem.exists(prop_dirname)) {
     
@@ -156,7 +258,7 @@ void FileWriter_i::change_uri() {
 }
 
 void FileWriter_i::file_formatChanged(std::string oldValue, std::string newValue){
-    exclusive_lock lock(service_thread_lock);
+    write_lock lock(service_thread_lock);
     if (oldValue != newValue) {
         if (newValue == "BLUEFILE")
             current_writer_type = BLUEFILE;
@@ -166,7 +268,10 @@ void FileWriter_i::file_formatChanged(std::string oldValue, std::string newValue
 }
 
 void FileWriter_i::advanced_propertiesChanged(const advanced_properties_struct &oldValue, const advanced_properties_struct &newValue) {
-    exclusive_lock lock(service_thread_lock);
+    write_lock lock(service_thread_lock);
+    if (oldValue.header_checkpoint_size != newValue.header_checkpoint_size) {
+        checkpointSize = sizeString_to_longBytes(newValue.header_checkpoint_size);
+    }
     if (oldValue.max_file_size != newValue.max_file_size) {
         maxSize = sizeString_to_longBytes(newValue.max_file_size);
     }
@@ -176,8 +281,25 @@ void FileWriter_i::recording_timerChanged(const std::vector<timer_struct_struct>
     construct_recording_timer(newValue);
 }
 
+void FileWriter_i::stream_weightsChanged(const std::vector<stream_weight_struct> &oldValue, const std::vector<stream_weight_struct> &newValue) {
+    set_stream_weights(newValue);
+}
+
+void FileWriter_i::set_stream_weights(const std::vector<stream_weight_struct> &weights) {
+    std::map<std::string, double> stream_weight_map;
+    for (std::vector<stream_weight_struct>::const_iterator weight = weights.begin(); weight != weights.end(); ++weight)
+        stream_weight_map[weight->stream_id] = weight->weight;
+    dataChar_feed.set_stream_weights(stream_weight_map);
+    dataOctet_feed.set_stream_weights(stream_weight_map);
+    dataShort_feed.set_stream_weights(stream_weight_map);
+    dataUshort_feed.set_stream_weights(stream_weight_map);
+    dataFloat_feed.set_stream_weights(stream_weight_map);
+    dataDouble_feed.set_stream_weights(stream_weight_map);
+    dataXML_feed.set_stream_weights(stream_weight_map);
+}
+
 void FileWriter_i::construct_recording_timer(const std::vector<timer_struct_struct> &timers) {
-    exclusive_lock lock(service_thread_lock);
+    write_lock lock(service_thread_lock);
     timer_set.clear();
 
     for (unsigned int i=0; i<timers.size(); ++i){
@@ -191,6 +313,7 @@ void FileWriter_i::construct_recording_timer(const std::vector<timer_struct_stru
         timer_set.insert(timer_element);
     }
     timer_set_iter = timer_set.begin();
+    deadline_timer = timer_set.end();
 }
 
 /***********************************************************************************************
@@ -330,15 +453,45 @@ void FileWriter_i::construct_recording_timer(const std::vector<timer_struct_stru
 
  ************************************************************************************************/
 int FileWriter_i::serviceFunction() {
-    exclusive_lock lock(service_thread_lock);
+    // Write out staged data that has been waiting too long (write_buffer_max_age)
+    boost::posix_time::ptime now = boost::posix_time::microsec_clock::universal_time();
+    if (next_staging_check.is_not_a_date_time() || now >= next_staging_check) {
+        next_staging_check = now + boost::posix_time::milliseconds(100);
+        flush_aged_buffers();
+    }
+
+    // Ports with dedicated threads are serviced in portServiceFunction
+    if (port_threads_active())
+        return NOOP;
+
+    if (packet_prefetch_active()) {
+        // Sleep until one of the feeds has a packet. The wait itself stands in
+        // for the thread delay, so there is no need to return NOOP on timeout.
+        if (!packet_ready.wait(stream_scheduling ? std::max(input_wait, SCHEDULING_PORT_TIMEOUT) : input_wait))
+            return NORMAL;
+
+        read_lock lock(service_thread_lock);
+        // Service every port once. A feed that holds more packets (with
+        // stream scheduling) raises packet_ready again.
+        singleService(&dataChar_feed, "8t", port_filesystems[CHAR_PORT]);
+        singleService(&dataOctet_feed, "8o", port_filesystems[OCTET_PORT]);
+        singleService(&dataShort_feed, "16tr", port_filesystems[SHORT_PORT]);
+        singleService(&dataUshort_feed, "16or", port_filesystems[USHORT_PORT]);
+        singleService(&dataFloat_feed, "32fr", port_filesystems[FLOAT_PORT]);
+        singleService(&dataDouble_feed, "64fr", port_filesystems[DOUBLE_PORT]);
+        singleService(&dataXML_feed, "8t", port_filesystems[XML_PORT]);
+        return NORMAL;
+    }
+
+    read_lock lock(service_thread_lock);
     // Service each port individually. Does not account for multiple ports connected at once
-    bool retService = singleService(dataChar_in, "8t");
-    retService = retService || singleService(dataOctet_in, "8o");
-    retService = retService || singleService(dataShort_in, "16tr");
-    retService = retService || singleService(dataUshort_in, "16or");
-    retService = retService || singleService(dataFloat_in, "32fr");
-    retService = retService || singleService(dataDouble_in, "64fr");
-    retService = retService || singleService(dataXML_in, "8t");
+    bool retService = singleService(&dataChar_feed, "8t", port_filesystems[CHAR_PORT]);
+    retService = retService || singleService(&dataOctet_feed, "8o", port_filesystems[OCTET_PORT]);
+    retService = retService || singleService(&dataShort_feed, "16tr", port_filesystems[SHORT_PORT]);
+    retService = retService || singleService(&dataUshort_feed, "16or", port_filesystems[USHORT_PORT]);
+    retService = retService || singleService(&dataFloat_feed, "32fr", port_filesystems[FLOAT_PORT]);
+    retService = retService || singleService(&dataDouble_feed, "64fr", port_filesystems[DOUBLE_PORT]);
+    retService = retService || singleService(&dataXML_feed, "8t", port_filesystems[XML_PORT]);
 
     if (retService) // If retService is true, then at least 1 packet was received and processed
         return NORMAL;
@@ -346,13 +499,248 @@ int FileWriter_i::serviceFunction() {
     return NOOP;
 }
 
+/**
+ * Starts one service thread per input port (thread_per_port). Each thread only
+ * services its own port, so a busy port can no longer starve the others.
+ */
+void FileWriter_i::start_port_threads() {
+    exclusive_lock lock(port_threads_lock);
+    if (port_threads_running)
+        return;
+    port_threads_running = true;
+    start_port_thread(&dataChar_feed, "8t", CHAR_PORT);
+    start_port_thread(&dataOctet_feed, "8o", OCTET_PORT);
+    start_port_thread(&dataShort_feed, "16tr", SHORT_PORT);
+    start_port_thread(&dataUshort_feed, "16or", USHORT_PORT);
+    start_port_thread(&dataFloat_feed, "32fr", FLOAT_PORT);
+    start_port_thread(&dataDouble_feed, "64fr", DOUBLE_PORT);
+    start_port_thread(&dataXML_feed, "8t", XML_PORT);
+    LOG_DEBUG(FileWriter_i, "Started " << port_threads.size() << " port service threads");
+}
+
+template <class IN_PORT_TYPE> void FileWriter_i::start_port_thread(port_feed<IN_PORT_TYPE> *feed, const std::string & dt, INPUT_PORTS port) {
+    port_threads.push_back(boost::make_shared<boost::thread>(&FileWriter_i::portServiceFunction<IN_PORT_TYPE>, this, feed, dt, &port_filesystems[port]));
+}
+
+void FileWriter_i::stop_port_threads() {
+    {
+        exclusive_lock lock(port_threads_lock);
+        if (!port_threads_running)
+            return;
+        port_threads_running = false;
+    }
+    for (size_t i = 0; i < port_threads.size(); ++i)
+        port_threads[i]->join();
+    port_threads.clear();
+}
+
+bool FileWriter_i::port_threads_active() {
+    exclusive_lock lock(port_threads_lock);
+    return port_threads_running;
+}
+
+/**
+ * Starts prefetching on every port feed (input_wait_timeout without
+ * thread_per_port, or fair_stream_scheduling), so serviceFunction can wait on
+ * packet_ready.
+ */
+void FileWriter_i::start_packet_prefetch() {
+    exclusive_lock lock(port_threads_lock);
+    if (packet_prefetching)
+        return;
+    packet_prefetching = true;
+    // The feeds drain the ports with scheduling, even without input_wait_timeout
+    double timeout = stream_scheduling ? std::max(input_wait, SCHEDULING_PORT_TIMEOUT) : input_wait;
+    dataChar_feed.start_prefetch(timeout);
+    dataOctet_feed.start_prefetch(timeout);
+    dataShort_feed.start_prefetch(timeout);
+    dataUshort_feed.start_prefetch(timeout);
+    dataFloat_feed.start_prefetch(timeout);
+    dataDouble_feed.start_prefetch(timeout);
+    dataXML_feed.start_prefetch(timeout);
+}
+
+void FileWriter_i::stop_packet_prefetch() {
+    {
+        exclusive_lock lock(port_threads_lock);
+        if (!packet_prefetching)
+            return;
+        packet_prefetching = false;
+    }
+    dataChar_feed.stop_prefetch();
+    dataOctet_feed.stop_prefetch();
+    dataShort_feed.stop_prefetch();
+    dataUshort_feed.stop_prefetch();
+    dataFloat_feed.stop_prefetch();
+    dataDouble_feed.stop_prefetch();
+    dataXML_feed.stop_prefetch();
+}
+
+bool FileWriter_i::packet_prefetch_active() {
+    exclusive_lock lock(port_threads_lock);
+    return packet_prefetching;
+}
+
+/**
+ * Sets up the feeds for fair_stream_scheduling, ahead of the threads that
+ * drain and service them
+ */
+void FileWriter_i::configure_stream_scheduling() {
+    stream_scheduling = advanced_properties.fair_stream_scheduling;
+    size_t max_queued_bytes = sizeString_to_longBytes(advanced_properties.stream_queue_max_memory);
+    dataChar_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+    dataOctet_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+    dataShort_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+    dataUshort_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+    dataFloat_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+    dataDouble_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+    dataXML_feed.configure_scheduling(stream_scheduling, max_queued_bytes, STREAM_SCHEDULING_QUANTUM);
+}
+
+template <class IN_PORT_TYPE> void FileWriter_i::log_dropped_packets(port_feed<IN_PORT_TYPE> &feed) {
+    stream_drop_map drops = feed.dropped_packets();
+    for (stream_drop_map::iterator stream = drops.begin(); stream != drops.end(); ++stream) {
+        LOG_WARN(FileWriter_i, "Dropped " << stream->second.packets << " packets (" << stream->second.bytes
+                << " bytes) of stream " << stream->first << " on " << feed.name() << " to keep within stream_queue_max_memory");
+    }
+}
+
+/**
+ * Query of performance_statistics: the counters of each port feed, then of
+ * each stream recorded from it
+ */
+std::vector<io_statistics_struct> FileWriter_i::get_performance_statistics() {
+    std::vector<io_statistics_struct> statistics;
+    exclusive_lock state_lock(stream_state_lock);
+    add_port_statistics(dataChar_feed, port_filesystems[CHAR_PORT], statistics);
+    add_port_statistics(dataOctet_feed, port_filesystems[OCTET_PORT], statistics);
+    add_port_statistics(dataShort_feed, port_filesystems[SHORT_PORT], statistics);
+    add_port_statistics(dataUshort_feed, port_filesystems[USHORT_PORT], statistics);
+    add_port_statistics(dataFloat_feed, port_filesystems[FLOAT_PORT], statistics);
+    add_port_statistics(dataDouble_feed, port_filesystems[DOUBLE_PORT], statistics);
+    add_port_statistics(dataXML_feed, port_filesystems[XML_PORT], statistics);
+    return statistics;
+}
+
+io_statistics_struct FileWriter_i::io_statistics_to_struct(const io_statistics & counters) {
+    io_statistics_struct entry;
+    entry.bytes_written = counters.bytes_written.get();
+    entry.packets = counters.packets.get();
+    entry.write_latency_p50 = counters.write_latency.percentile(0.5);
+    entry.write_latency_p99 = counters.write_latency.percentile(0.99);
+    entry.write_latency_max = counters.write_latency.max();
+    entry.close_time = counters.close_usec.get() / 1e6;
+    entry.rollovers = counters.rollovers.get();
+    entry.queue_flushes = counters.queue_flushes.get();
+    return entry;
+}
+
+// Called with stream_state_lock held
+template <class IN_PORT_TYPE> void FileWriter_i::add_port_statistics(port_feed<IN_PORT_TYPE> &feed, locked_file_io &port_filesystem, std::vector<io_statistics_struct> &statistics) {
+    stream_drop_map drops = feed.dropped_packets();
+    io_statistics_struct port = io_statistics_to_struct(feed.statistics());
+    port.port = feed.name();
+    for (stream_drop_map::iterator stream = drops.begin(); stream != drops.end(); ++stream)
+        port.dropped_packets += stream->second.packets;
+    for (std::map<std::string, boost::shared_ptr<file_struct> >::iterator file = file_to_struct_mapping.begin(); file != file_to_struct_mapping.end(); ++file) {
+        if (file->second->io == &port_filesystem)
+            port.open_files++;
+    }
+    statistics.push_back(port);
+
+    for (packet_stream_map::iterator stream = packet_streams.begin(); stream != packet_streams.end(); ++stream) {
+        if (stream->first.first != feed.name())
+            continue;
+        io_statistics_struct entry = io_statistics_to_struct(*stream->second.statistics);
+        entry.port = feed.name();
+        entry.stream_id = stream->first.second;
+        stream_drop_map::iterator dropped = drops.find(entry.stream_id);
+        if (dropped != drops.end())
+            entry.dropped_packets = dropped->second.packets;
+        // The stream may write under another stream ID (STREAM_GROUP)
+        stream_state_map::iterator state = stream_states.find(stream->second.keywords.stream_id);
+        if (state != stream_states.end()) {
+            boost::shared_ptr<file_struct> file = stream_file(state->second);
+            if (file && file->io == &port_filesystem)
+                entry.open_files = 1;
+        }
+        statistics.push_back(entry);
+    }
+}
+
+/**
+ * Query of trace_events: the events in the trace buffer, in the order they were recorded
+ */
+std::vector<trace_event_struct> FileWriter_i::get_trace_events() {
+    std::vector<trace_event> events = tracer.events();
+    std::vector<trace_event_struct> result(events.size());
+    for (size_t i = 0; i < events.size(); ++i) {
+        result[i].phase = trace_phase_name(trace_phase(events[i].phase));
+        result[i].thread = events[i].thread;
+        result[i].start = events[i].start_usec / 1e6;
+        result[i].duration = events[i].usec;
+        result[i].bytes = events[i].bytes;
+    }
+    return result;
+}
+
+/**
+ * Query of write_behind_statistics: the counters of the write-behind queue
+ */
+write_behind_statistics_struct FileWriter_i::get_write_behind_statistics() {
+    write_behind_counters counters = write_behind.counters();
+    write_behind_statistics_struct result;
+    result.queued_bytes = counters.queued_bytes;
+    result.peak_queued_bytes = counters.peak_queued_bytes;
+    result.written_bytes = counters.written_bytes;
+    result.writes = counters.writes;
+    result.dropped_bytes = counters.dropped_bytes;
+    result.dropped_writes = counters.dropped_writes;
+    result.blocked_writes = counters.blocked_writes;
+    result.failed_writes = counters.failed_writes;
+    return result;
+}
+
+void FileWriter_i::reset_performance_statistics() {
+    dataChar_feed.statistics().reset();
+    dataOctet_feed.statistics().reset();
+    dataShort_feed.statistics().reset();
+    dataUshort_feed.statistics().reset();
+    dataFloat_feed.statistics().reset();
+    dataDouble_feed.statistics().reset();
+    dataXML_feed.statistics().reset();
+    exclusive_lock state_lock(stream_state_lock);
+    for (packet_stream_map::iterator stream = packet_streams.begin(); stream != packet_streams.end(); ++stream)
+        stream->second.statistics->reset();
+}
+
+/**
+ * Body of a dedicated port service thread. Mirrors the ThreadedComponent loop:
+ * service the port until it runs dry, then sleep for the thread delay. With
+ * input_wait_timeout set, it blocks on the port instead of sleeping. The wait
+ * happens outside of service_thread_lock so it never holds up configure().
+ */
+template <class IN_PORT_TYPE> void FileWriter_i::portServiceFunction(port_feed<IN_PORT_TYPE> * feed, const std::string dt, locked_file_io * port_filesystem) {
+    while (port_threads_active()) {
+        if (!feed->wait(input_wait)) {
+            if (input_wait <= 0)
+                boost::this_thread::sleep(boost::posix_time::microseconds(long(getThreadDelay() * 1e6)));
+            continue;
+        }
+        read_lock lock(service_thread_lock);
+        singleService(feed, dt, *port_filesystem);
+    }
+}
+
 /**
  * A templated service function that is generic between data types.
  */
-template <class IN_PORT_TYPE> bool FileWriter_i::singleService(IN_PORT_TYPE * dataIn, const std::string & dt) {
+template <class IN_PORT_TYPE> bool FileWriter_i::singleService(IN_PORT_TYPE * dataIn, const std::string & dt, locked_file_io & port_filesystem) {
     typename IN_PORT_TYPE::dataTransfer *packet = dataIn->getPacket(0);
     if (packet == NULL)
         return false;
+    // Keeps the packet alive until its data has been written by the write-behind queue
+    boost::shared_ptr<typename IN_PORT_TYPE::dataTransfer> packet_owner(packet);
     if (packet->inputQueueFlushed){
         LOG_WARN(FileWriter_i, "WARNING: FILEWRITER INPUT QUEUE HAS BEEN FLUSHED!\n");
     }
@@ -362,232 +750,258 @@ template <class IN_PORT_TYPE> bool FileWriter_i::singleService(IN_PORT_TYPE * da
     size_t packet_pos = 0;
     std::string existing_file = advanced_properties.existing_file;
 
+    // BYTE SWAP (done as the data is copied out of the packet, see write_data)
+    size_t swap_width = swap_bytes ? sizeof (PACKET_ELEMENT_TYPE) : 1;
+
+    exclusive_lock state_lock(stream_state_lock);
+
+    // SRI KEYWORDS (only parsed again when the SRI changes)
+    std::string packet_stream_id = packet->streamID;
+    packet_stream_key packet_key(dataIn->name(), packet_stream_id);
+    packet_stream_map::iterator curPacketsIter = packet_streams.find(packet_key);
+    if (curPacketsIter == packet_streams.end()) {
+        curPacketsIter = packet_streams.insert(std::make_pair(packet_key, packet_stream())).first;
+        parse_sri_keywords(packet->SRI, curPacketsIter->second.keywords);
+    } else if (packet->sriChanged) {
+        parse_sri_keywords(packet->SRI, curPacketsIter->second.keywords);
+    }
+    const sri_keywords & keywords = curPacketsIter->second.keywords;
+
+    // STATISTICS (performance_statistics)
+    boost::shared_ptr<io_statistics> stream_counters = curPacketsIter->second.statistics; // the entry is removed on EOS
+    packet_statistics statistics(dataIn->statistics(), *stream_counters);
+    statistics.packet(packet->inputQueueFlushed);
+
     // STREAM ID
-    std::string stream_id = packet->streamID;
-    updateIfFound_KeywordValueByID<std::string>(& packet->SRI, "STREAM_GROUP",stream_id);
+    std::string stream_id = keywords.stream_id;
 
     // Initial Search for file struct
     std::string destination_filename = "";
-    std::map<std::string, std::string>::iterator curFileIter = stream_to_file_mapping.find(stream_id);
-    std::map<std::string, file_struct>::iterator curFileDescIter = file_to_struct_mapping.end();
-    if (curFileIter != stream_to_file_mapping.end()) {
-        destination_filename = curFileIter->second;
-        curFileDescIter = file_to_struct_mapping.find(destination_filename);
+    bool stream_mapped = false;
+    boost::shared_ptr<file_struct> file;
+    stream_state_map::iterator curStreamIter = stream_states.find(stream_id);
+    if (curStreamIter != stream_states.end()) {
+        stream_mapped = true;
+        destination_filename = curStreamIter->second.destination_filename;
+        file = stream_file(curStreamIter->second);
     }
 
     // RECORDING TIMER
-     // modified the interpretation of tcmode and tcstatus
-     //   tcmode stores (bool) use_pkt_timestamp
-     //   tcstatus stores (bool) recording_enable
-    bool next_recording_enable = recording_enabled;
-    while (timer_set_iter != timer_set.end()) {
-        timer_timestamp = getSystemTimestamp();
-        if (timer_set_iter->tcmode == 1) // if use_pkt_timestamp
-            timer_timestamp = packet->T;
-        if (compare_utc_time(timer_timestamp, *timer_set_iter))
-            break;
-        next_recording_enable = (timer_set_iter->tcstatus == 1);
-        timer_set_iter++;
+    // Only the parts of the packet inside the recording window are written
+    std::vector<recording_segment> segments;
+    recording_segments(packet->T, packet->SRI, packet->dataBuffer.size(), sizeof (PACKET_ELEMENT_TYPE), segments);
+    size_t packet_bytes = packet->dataBuffer.size() * sizeof (packet->dataBuffer[0]);
+    size_t segment = 0;
+    while (segment < segments.size() && !segments[segment].enabled)
+        segment++;
+
+    // If recording is disabled, make sure files are closed
+    if (segment > 0 && !destination_filename.empty()) {
+        LOG_DEBUG(FileWriter_i, "CLOSING FILE: " << destination_filename << " DUE TO RECORDING BEING DISABLED!");
+        uint64_t close_start = monotonic_usec();
+        close_file(destination_filename, packet->T, stream_id);
+        statistics.closed(close_start);
+        stream_states.erase(stream_id);
+        stream_mapped = false;
+        file.reset();
+        destination_filename.clear();
     }
 
-    // If recording is disabled, make sure files are closed and check timer
-    if (!recording_enabled){
-        if (!destination_filename.empty()) {
-            LOG_DEBUG(FileWriter_i, "CLOSING FILE: " << destination_filename << " DUE TO RECORDING BEING DISABLED!");
-            close_file(destination_filename, packet->T, stream_id);
-            stream_to_file_mapping.erase(stream_id);
-            curFileIter = stream_to_file_mapping.end();
-            destination_filename.clear();
-        }
-
-        // If still disabled, clean up and return
-        if (!next_recording_enable){
-            delete packet;
-            return true;
-        }
+    // If disabled for the whole packet, clean up and return
+    if (segment == segments.size()){
+        return true;
     }
-    recording_enabled = next_recording_enable; // this takes effect next iteration
+    packet_pos = segments[segment].start;
+    size_t segment_end = (segment + 1 < segments.size()) ? segments[segment + 1].start : packet_bytes;
+
+    // Files start at a whole sample (or frame), whose time names them
+    size_t split_unit_elements;
+    double split_step;
+    split_unit(packet->SRI, split_unit_elements, split_step);
+    size_t unit_bytes = split_unit_elements * sizeof (PACKET_ELEMENT_TYPE);
+
+    // The first write of a new SRI starts a record of the time index
+    bool index_new_sri = packet->sriChanged;
 
     // Do not open a file handle that will be of size 0
     if (packet->dataBuffer.empty() && packet->EOS && destination_filename.empty()){
-        delete packet;
         return true;
     }
 
     // Check for state where we've reached our max file size (or time)
-    if (curFileIter != stream_to_file_mapping.end() && curFileDescIter == file_to_struct_mapping.end()){
-        delete packet;
+    if (stream_mapped && !file){
         return true;
     }
 
     // RESET ON RETUNE
-    if (advanced_properties.reset_on_retune && curFileDescIter != file_to_struct_mapping.end()) {
+    if (advanced_properties.reset_on_retune && file) {
         bool close = false;
-        close |= (curFileDescIter->second.lastSRI.xdelta != packet->SRI.xdelta);
-        close |= (curFileDescIter->second.lastSRI.mode != packet->SRI.mode);
-
-        double old_cf = 0;
-        double new_cf = 0;
-        updateIfFound_KeywordValueByID<double>(& curFileDescIter->second.lastSRI, "COL_RF", old_cf);
-        updateIfFound_KeywordValueByID<double>(& packet->SRI, "COL_RF", new_cf);
-        close |= (old_cf != new_cf);
-
-        old_cf = 0;
-        new_cf = 0;
-        updateIfFound_KeywordValueByID<double>(& curFileDescIter->second.lastSRI, "CHAN_RF", old_cf);
-        updateIfFound_KeywordValueByID<double>(& packet->SRI, "CHAN_RF", new_cf);
-        close |= (old_cf != new_cf);
+        close |= (file->last_keywords.xdelta != keywords.xdelta);
+        close |= (file->last_keywords.mode != keywords.mode);
+        close |= (file->last_keywords.col_rf != keywords.col_rf);
+        close |= (file->last_keywords.chan_rf != keywords.chan_rf);
 
         if (close) {
+            uint64_t close_start = monotonic_usec();
             close_file(destination_filename, packet->T, stream_id);
-            stream_to_file_mapping.erase(stream_id);
-            curFileIter = stream_to_file_mapping.end();
+            statistics.closed(close_start);
+            stream_states.erase(stream_id);
+            stream_mapped = false;
+            file.reset();
             destination_filename.clear();
         }
     }
 
-    // BYTE SWAP
-    if (swap_bytes) {
-        if (dt.find("16") != std::string::npos) {
-            LOG_DEBUG(FileWriter_i, "SWAP_BYTES - swapping 16");
-            std::vector<uint16_t> *svp = (std::vector<uint16_t> *) & packet->dataBuffer;
-            std::transform(svp->begin(), svp->end(), svp->begin(), Byte_Swap16<uint16_t>);
-        } else if (dt.find("32") != std::string::npos) {
-            LOG_DEBUG(FileWriter_i, "SWAP_BYTES - swapping 32");
-            std::vector<uint32_t> *svp = (std::vector<uint32_t> *) & packet->dataBuffer;
-            std::transform(svp->begin(), svp->end(), svp->begin(), Byte_Swap32<uint32_t>);
-        } else if (dt.find("64") != std::string::npos) {
-            LOG_DEBUG(FileWriter_i, "SWAP_BYTES - swapping 64");
-            std::vector<uint64_t> *svp = (std::vector<uint64_t> *) & packet->dataBuffer;
-            std::transform(svp->begin(), svp->end(), svp->begin(), Byte_Swap64<uint64_t>);
-        }
-    }
     do {
         try {
 
+            // End of the recording window: close the file, and skip to the next part of the packet inside a window
+            if (packet_pos >= segment_end && segment_end < packet_bytes) {
+                while (++segment < segments.size() && !segments[segment].enabled);
+                if (!destination_filename.empty()) {
+                    LOG_DEBUG(FileWriter_i, "CLOSING FILE: " << destination_filename << " DUE TO RECORDING BEING DISABLED!");
+                    uint64_t close_start = monotonic_usec();
+                    close_file(destination_filename, packet->T, stream_id);
+                    statistics.closed(close_start);
+                    stream_states.erase(stream_id);
+                    stream_mapped = false;
+                    file.reset();
+                    destination_filename.clear();
+                }
+                if (segment >= segments.size())
+                    break;
+                packet_pos = segments[segment].start;
+                segment_end = (segment + 1 < segments.size()) ? segments[segment + 1].start : packet_bytes;
+            }
+
             // Is File New
             bool new_file = destination_filename.empty();
             if (new_file) {
-                std::string basename = stream_to_basename(stream_id, packet->SRI, packet->T, file_format, dt);
+                BULKIO::PrecisionUTCTime file_time = time_at(packet->T, packet_pos / unit_bytes, split_step);
+                std::string basename = stream_to_basename(stream_id, packet->SRI, file_time, file_format, dt);
                 destination_filename = prop_dirname + basename;
                 bool append = false;
-                // Unless the file is appending, do something if the file already exists
-                if (filesystem.exists(destination_filename)) {
-                    if (existing_file == "DROP")
-                        throw std::logic_error("File Exists. Dropping Packet!");
-                    else if (existing_file == "TRUNCATE") {
-                        curFileDescIter = file_to_struct_mapping.find(destination_filename);
-                        if (curFileDescIter != file_to_struct_mapping.end()) {
-                            throw std::logic_error("Cannot truncate a file currently being written to by this File Writer. Dropping Packet!");
-                        }
-                    } else if (existing_file == "RENAME") {
-                        int counter = 1;
-                        std::string tmpFN = destination_filename;
-                        do {
-                            tmpFN = destination_filename + "-" + boost::lexical_cast<std::string>(counter);
-                            counter++;
-                        } while (filesystem.exists(tmpFN) && counter <= 1024);
-                        destination_filename = tmpFN;
-                        if (filesystem.exists(destination_filename))
-                            throw std::logic_error("Cannot rename file to an available name. Dropping Reset of Packet!");
-                    } else if (existing_file == "APPEND") {
-                        append = true;
+                // The file opened ahead of time for the stream, if this is the one
+                boost::shared_ptr<file_struct> standby = take_standby(stream_id, destination_filename, file_time);
+                // Unless the file is appending, do something if the file already exists. The
+                // file system is asked with stream_state_lock released.
+                if (!standby) {
+                    bool in_use = file_to_struct_mapping.find(destination_filename) != file_to_struct_mapping.end();
+                    state_lock.unlock();
+                    try {
+                        append = resolve_existing_file(port_filesystem, existing_file, in_use, destination_filename);
+                    } catch (...) {
+                        state_lock.lock();
+                        throw;
                     }
+                    state_lock.lock();
                 }
 
                 // Correlates stream ID to file
-                curFileIter = stream_to_file_mapping.insert(std::make_pair(stream_id, destination_filename)).first;
-                curFileDescIter = file_to_struct_mapping.find(destination_filename);
+                std::map<std::string, boost::shared_ptr<file_struct> >::iterator curFileDescIter = file_to_struct_mapping.find(destination_filename);
                 if (curFileDescIter == file_to_struct_mapping.end()) {
-                    double tmp_ws = packet->T.twsec + floor(packet->T.toff);
-                    double tmp_fs = packet->T.tfsec + (packet->T.toff-floor(packet->T.toff));
-                    if (tmp_fs >= 1.0) {
-                        tmp_fs -= 1.0;
-                        tmp_ws += 1.0;
+                    boost::shared_ptr<file_struct> fs = standby;
+                    if (!fs) {
+                        double tmp_ws, tmp_fs;
+                        file_start_time(file_time, tmp_ws, tmp_fs);
+                        fs.reset(new file_struct(destination_filename, current_writer_type, tmp_ws, tmp_fs, advanced_properties.enable_metadata_file, advanced_properties.use_hidden_files, advanced_properties.open_file_extension, advanced_properties.open_metadata_file_extension, stream_id, advanced_properties.metadata_format == "JSONL", advanced_properties.enable_index_file));
+                        fs->io = &port_filesystem;
                     }
-                    else if (tmp_fs < 0) {
-                        tmp_fs += 1.0;
-                        tmp_ws -= 1.0;
+                    // The file is opened with stream_state_lock released, and only its own lock
+                    // held, which the other threads that find it wait on (see wait_for_open)
+                    exclusive_lock file_lock(fs->file_lock, boost::try_to_lock);
+                    fs->opening = true;
+                    fs->lastSRI = packet->SRI;
+                    fs->last_keywords = keywords;
+                    fs->midas_type = midas_type<PACKET_ELEMENT_TYPE > ((fs->lastSRI.mode == 0));
+                    file_to_struct_mapping.insert(std::make_pair(destination_filename, fs));
+                    stream_states[stream_id] = stream_state(destination_filename, fs);
+                    stream_mapped = true;
+                    file = fs;
+                    state_lock.unlock();
+                    if (!file_lock.owns_lock())
+                        file_lock.lock(); // a standby file still being opened in the background
+                    if (standby) {
+                        claim_standby(*fs);
+                    } else {
+                        fs->file_size_internal = fs->io->file_size(fs->in_process_uri_filename);
+                        fs->max_size = rollover_size(*fs, packet->SRI, sizeof (PACKET_ELEMENT_TYPE));
+                        fs->opened = open_data_file(*fs, open_options(append));
                     }
-                    file_struct fs(destination_filename, current_writer_type, tmp_ws, tmp_fs, advanced_properties.enable_metadata_file, advanced_properties.use_hidden_files, advanced_properties.open_file_extension, advanced_properties.open_metadata_file_extension, stream_id);
-                    curFileDescIter = file_to_struct_mapping.insert(std::make_pair(destination_filename, fs)).first;
-                    curFileDescIter->second.file_size_internal = filesystem.file_size(curFileDescIter->second.in_process_uri_filename);
-
-                    bool open_success = filesystem.open_file(curFileDescIter->second.in_process_uri_filename, true, append);
-                    if (curFileDescIter->second.metdata_file_enabled())
-                        open_success |= filesystem.open_file(curFileDescIter->second.in_process_uri_metadata_filename, true, append);
-                    if (!open_success) {
-                        close_file(destination_filename, packet->T, stream_id);
-                        stream_to_file_mapping.erase(stream_id);
-                        LOG_ERROR(FileWriter_i, "ERROR OPENING FILE: " << curFileDescIter->second.in_process_uri_filename);
-                        throw std::logic_error("ERROR OPENING FILE: " + curFileDescIter->second.in_process_uri_filename);
+                    if (fs->opened) {
+                        if (advanced_properties.debug_output)
+                            std::cout << "DEBUG (" << __PRETTY_FUNCTION__ << "): OPENED STREAM: " << packet->streamID
+                                << " (" << stream_id << ") " << " OR FILE (TMP): " << fs->in_process_uri_filename
+                                << " OR FILE (TMP): " << fs->uri_filename << std::endl;
+                        LOG_INFO(FileWriter_i, "OPENED STREAM: " << packet->streamID << " (" << stream_id << ") " << " OR FILE (TMP): " << fs->in_process_uri_filename << " OR FILE (TMP): " << fs->uri_filename);
+
+                        file_io_message_struct file_event = create_file_io_message("OPEN", stream_id, filesystem.uri_to_file(fs->in_process_uri_filename));
+                        MessageEvent_out->sendMessage(file_event);
+
+                        // Initialize Metadata File (JSON lines need no header)
+                        if (fs->metdata_file_enabled() && !fs->json_metadata){
+                            std::string openXML = "<FileWriter_metadata>";
+                            write_metadata(*fs, openXML);
+                        }
                     }
-
-                    if (advanced_properties.debug_output)
-                        std::cout << "DEBUG (" << __PRETTY_FUNCTION__ << "): OPENED STREAM: " << packet->streamID
-                            << " (" << stream_id << ") " << " OR FILE (TMP): " << fs.in_process_uri_filename
-                            << " OR FILE (TMP): " << fs.uri_filename << std::endl;
-                    LOG_INFO(FileWriter_i, "OPENED STREAM: " << packet->streamID << " (" << stream_id << ") " << " OR FILE (TMP): " << fs.in_process_uri_filename << " OR FILE (TMP): " << fs.uri_filename);
-
-                    file_io_message_struct file_event = create_file_io_message("OPEN", stream_id, filesystem.uri_to_file(fs.in_process_uri_filename));
-                    MessageEvent_out->sendMessage(file_event);
-
-                    curFileDescIter->second.lastSRI = packet->SRI;
-
-                    // Initialize Metadata File
-                    if (curFileDescIter->second.metdata_file_enabled()){
-                        std::string openXML = "<FileWriter_metadata>";
-                        filesystem.write(curFileDescIter->second.in_process_uri_metadata_filename, &openXML, advanced_properties.force_flush);
+                    file_lock.unlock();
+                    state_lock.lock();
+                    fs->opening = false;
+                    if (!fs->opened) {
+                        if (!fs->closed)
+                            close_file(destination_filename, packet->T, stream_id);
+                        stream_state_map::iterator opened_state = stream_states.find(stream_id);
+                        if (opened_state != stream_states.end() && opened_state->second.file == fs)
+                            stream_states.erase(opened_state);
+                        // Drops the rest of the packet, rather than opening the file again for every part of it
+                        LOG_ERROR(FileWriter_i, "ERROR OPENING FILE: " << fs->in_process_uri_filename);
+                        break;
                     }
 
-                    // BLUEFILE
-                    if (curFileDescIter->second.file_type == BLUEFILE) {
-                        size_t pos = filesystem.file_tell(curFileDescIter->second.in_process_uri_filename);
-                        curFileDescIter->second.lastSRI = packet->SRI;
-                        curFileDescIter->second.midas_type = midas_type<PACKET_ELEMENT_TYPE > ((curFileDescIter->second.lastSRI.mode == 0));
-                        if (pos == 0) {
-                            std::string empty_string; // Write 512 block of 0s as place holder for bluefile header
-                            empty_string.resize(BLUEFILE_BLOCK_SIZE, '0');
-                            filesystem.write(fs.in_process_uri_filename, (char*) empty_string.c_str(), BLUEFILE_BLOCK_SIZE, advanced_properties.force_flush);
-                            filesystem.file_seek(fs.in_process_uri_filename, BLUEFILE_BLOCK_SIZE);
-                        } else if (curFileDescIter->second.num_writers == 1) {
-                            std::vector<char> buff(BLUEFILE_BLOCK_SIZE);
-                            filesystem.file_seek(fs.in_process_uri_filename, 0);
-                            filesystem.read(fs.in_process_uri_filename, &buff, BLUEFILE_BLOCK_SIZE);
-                            blue::HeaderControlBlock hcb = blue::HeaderControlBlock((const blue::hcb_s *) & buff[0]);
-                            if (hcb.validate(false) != 0) {
-                                LOG_WARN(FileWriter_i, "CAN NOT READ BLUEHEADER FOR APPENDING DATA!");
-                            }
-                            filesystem.file_seek(fs.in_process_uri_filename, hcb.getDataStart() + hcb.getDataSize());
-                        }
-                    }
+                    // Have the file the stream rolls over to next ready ahead of time
+                    if (!fs->closed)
+                        open_standby(stream_id, *fs, packet->SRI, dt, file_time, sizeof (PACKET_ELEMENT_TYPE));
 
                 } else{
-                    curFileDescIter->second.num_writers++;
+                    file = curFileDescIter->second;
+                    // Shared once another stream of the group has opened it
+                    wait_for_open(state_lock, *file);
+                    if (file->closed) {
+                        file.reset();
+                        destination_filename.clear();
+                        continue;
+                    }
+                    stream_states[stream_id] = stream_state(destination_filename, file);
+                    stream_mapped = true;
+                    file->num_writers++;
                 }
             }
 
-            curFileDescIter = file_to_struct_mapping.find(destination_filename);
-            if (curFileDescIter == file_to_struct_mapping.end()){
-                throw std::logic_error("ERROR. SHOULD HAVE CORRESPONDING FILE STRUCTURE OBJECT");
+            // Another port thread may be opening the file, or have closed it, with stream_state_lock released
+            if (file && file->opening)
+                wait_for_open(state_lock, *file);
+            if (file && file->closed) {
+                LOG_DEBUG(FileWriter_i, "FILE " << destination_filename << " WAS CLOSED BY ANOTHER PORT THREAD");
+                curStreamIter = stream_states.find(stream_id);
+                stream_mapped = (curStreamIter != stream_states.end());
+                file = stream_mapped ? stream_file(curStreamIter->second) : boost::shared_ptr<file_struct>();
+                destination_filename = stream_mapped ? curStreamIter->second.destination_filename : std::string();
+                if (stream_mapped && !file)
+                    break; // reached max file size without resetting, drop the rest of the packet
+                continue;
             }
 
+            if (!file || file->closed){
+                throw std::logic_error("ERROR. SHOULD HAVE CORRESPONDING FILE STRUCTURE OBJECT");
+            }
 
-            bool eos = (packet->EOS && (stream_id == packet->streamID));
-            size_t write_bytes = packet->dataBuffer.size() * sizeof (packet->dataBuffer[0]) - packet_pos;
-
-            long maxSize_time_size = maxSize;
-            if (advanced_properties.max_file_time > 0) {
-                // seconds                    *    samples/second     * B/sample
-                long maxSize_time = advanced_properties.max_file_time * 1 / packet->SRI.xdelta * sizeof (packet->dataBuffer[0]) * (packet->SRI.mode + 1);
-                if (maxSize_time > 0 && (maxSize_time_size <= 0 || maxSize_time < maxSize_time_size))
-                    maxSize_time_size = maxSize_time;
 
-            }
+            bool eos = (packet->EOS && (stream_id == packet->streamID) && segment_end == packet_bytes);
+            size_t write_bytes = segment_end - packet_pos;
 
             bool reached_max_size = false;
-            if (maxSize_time_size > 0) {
-                size_t avail_in_file = maxSize_time_size - curFileDescIter->second.file_size_internal;
+            if (file->max_size > 0) {
+                size_t avail_in_file = (file->max_size > file->file_size_internal) ? file->max_size - file->file_size_internal : 0;
                 if (avail_in_file <= write_bytes) {
                     write_bytes = avail_in_file;
                     reached_max_size = true;
@@ -597,37 +1011,91 @@ template <class IN_PORT_TYPE> bool FileWriter_i::singleService(IN_PORT_TYPE * da
 
             // Output Data To File
             if (advanced_properties.debug_output) {
-                std::cout << "DEBUG (" << __PRETTY_FUNCTION__ << "): WRITING: " << write_bytes << " BYTES TO FILE: " << curFileDescIter->second.in_process_uri_filename << std::endl;
-                LOG_DEBUG(FileWriter_i,"WRITING: " << write_bytes << " BYTES TO FILE: " << curFileDescIter->second.in_process_uri_filename );
+                std::cout << "DEBUG (" << __PRETTY_FUNCTION__ << "): WRITING: " << write_bytes << " BYTES TO FILE: " << file->in_process_uri_filename << std::endl;
+                LOG_DEBUG(FileWriter_i,"WRITING: " << write_bytes << " BYTES TO FILE: " << file->in_process_uri_filename );
+            }
+            file->file_size_internal += write_bytes;
+            {
+                // Only the file itself needs to be held while the data is written,
+                // which lets the other port threads carry on with their own streams
+                state_lock.unlock();
+                exclusive_lock file_lock(file->file_lock);
+                uint64_t write_start = monotonic_usec();
+                bool written = write_data(*file, (char*) &packet->dataBuffer[0] + packet_pos, write_bytes, packet_owner, swap_width, packet_pos % swap_width);
+                if (written)
+                    statistics.written(write_bytes, write_start);
+                if (written && file->index_file_enabled() && write_bytes > 0) {
+                    double write_ws, write_fs;
+                    file_start_time(time_at(packet->T, packet_pos / unit_bytes, split_step), write_ws, write_fs);
+                    index_record record;
+                    if (file->index.add(write_ws, write_fs, write_bytes / unit_bytes, write_bytes, split_step, index_new_sri || new_file, record))
+                        write_index(*file, record);
+                    index_new_sri = false;
+                }
+                if (header_checkpoint_due(*file))
+                    checkpoint_header(*file);
+                file_lock.unlock();
+                state_lock.lock();
+                // Dropped data (write_behind_overflow DROP) does not count toward max_file_size
+                if (!written) {
+                    LOG_DEBUG(FileWriter_i, "DROPPED " << write_bytes << " BYTES FOR FILE: " << file->in_process_uri_filename);
+                    file->file_size_internal -= write_bytes;
+                }
             }
-            filesystem.write(curFileDescIter->second.in_process_uri_filename, (char*) &packet->dataBuffer[0] + packet_pos, write_bytes, advanced_properties.force_flush);
-            curFileDescIter->second.file_size_internal += write_bytes;
             packet_pos += write_bytes;
 
+            // Another port thread may have closed the file while the lock was released
+            if (file->closed) {
+                LOG_DEBUG(FileWriter_i, "FILE " << destination_filename << " WAS CLOSED BY ANOTHER PORT THREAD");
+                curStreamIter = stream_states.find(stream_id);
+                if (curStreamIter == stream_states.end()) {
+                    stream_mapped = false;
+                    file.reset();
+                    destination_filename.clear();
+                    continue;
+                }
+                file = stream_file(curStreamIter->second);
+                if (curStreamIter->second.destination_filename != destination_filename) {
+                    destination_filename = curStreamIter->second.destination_filename;
+                    continue;
+                }
+                if (!file)
+                    break; // reached max file size without resetting, drop the rest of the packet
+            }
+
 
             if (packet->sriChanged || new_file) {
-                curFileDescIter->second.lastSRI = packet->SRI;
-                curFileDescIter->second.midas_type = midas_type<PACKET_ELEMENT_TYPE > ((curFileDescIter->second.lastSRI.mode == 0));
+                file->lastSRI = packet->SRI;
+                file->last_keywords = keywords;
+                file->midas_type = midas_type<PACKET_ELEMENT_TYPE > ((file->lastSRI.mode == 0));
                 packet->SRI.streamID = stream_id.c_str();
                 dataFile_out->pushSRI(packet->SRI);
-                if (curFileDescIter->second.metdata_file_enabled()) {
-                    std::string metadata = sri_to_XMLstring(packet->SRI);
-                    filesystem.write(curFileDescIter->second.in_process_uri_metadata_filename, &metadata, advanced_properties.force_flush);
+                if (file->metdata_file_enabled()) {
+                    std::string metadata = file->json_metadata ? sri_to_JSONstring(packet->SRI, packet->T) : sri_to_XMLstring(packet->SRI);
+                    exclusive_lock file_lock(file->file_lock);
+                    write_metadata(*file, metadata);
                 }
             }
 
             // Close File
             if (eos || reached_max_size) {
                 LOG_DEBUG(FileWriter_i, " *** PROCESSING EOS FOR STREAM ID : " << stream_id);
-                if (eos && curFileDescIter->second.metdata_file_enabled()) {
-                    std::string metadata = eos_to_XMLstring(packet->SRI);
-                    filesystem.write(curFileDescIter->second.in_process_uri_metadata_filename, &metadata, advanced_properties.force_flush);
+                if (eos && file->metdata_file_enabled()) {
+                    std::string metadata = file->json_metadata ? eos_to_JSONstring(packet->SRI, packet->T) : eos_to_XMLstring(packet->SRI);
+                    exclusive_lock file_lock(file->file_lock);
+                    write_metadata(*file, metadata);
                 }
-                close_file(destination_filename, packet->T, stream_id);
+                // With a standby file, the stream moves on while the full file is finished in the background
+                uint64_t close_start = monotonic_usec();
+                close_file(destination_filename, packet->T, stream_id, reached_max_size && advanced_properties.standby_files);
+                statistics.closed(close_start);
+                if (reached_max_size)
+                    statistics.rolled_over();
                 if (reached_max_size && advanced_properties.reset_on_max_file) {
                     LOG_DEBUG(FileWriter_i, "Reseting on max file size...");
-                    stream_to_file_mapping.erase(stream_id);
-                    curFileIter = stream_to_file_mapping.end();
+                    stream_states.erase(stream_id);
+                    stream_mapped = false;
+                    file.reset();
                     destination_filename.clear();
                 } else if (reached_max_size){
                     LOG_DEBUG(FileWriter_i, "Not reseting on max file size...");
@@ -642,70 +1110,919 @@ template <class IN_PORT_TYPE> bool FileWriter_i::singleService(IN_PORT_TYPE * da
             LOG_DEBUG(FileWriter_i, "Caught unknown exception in service function loop");
             break;
         };
-    } while (packet_pos < packet->dataBuffer.size() * sizeof (packet->dataBuffer[0]));
+    } while (packet_pos < packet_bytes);
 
     //Delete Memory
-    if (packet->EOS && stream_id == std::string(packet->streamID))
-        stream_to_file_mapping.erase(stream_id);
-    delete packet;
+    if (packet->EOS && stream_id == std::string(packet->streamID)) {
+        stream_states.erase(stream_id);
+        take_standby(stream_id, "", packet->T);
+    }
+    if (packet->EOS) {
+        packet_streams.erase(packet_key);
+    }
 
     return true;
 }
 
-bool FileWriter_i::close_file(const std::string& filename, const BULKIO::PrecisionUTCTime & timestamp, std::string streamId) {
-    std::map<std::string, file_struct>::iterator curFileDescIter = file_to_struct_mapping.find(filename);
+bool FileWriter_i::close_file(const std::string& filename, const BULKIO::PrecisionUTCTime & timestamp, std::string streamId, bool background) {
+    trace_scope trace(tracer, TRACE_CLOSE);
+    std::map<std::string, boost::shared_ptr<file_struct> >::iterator curFileDescIter = file_to_struct_mapping.find(filename);
     if (curFileDescIter == file_to_struct_mapping.end())
         return true;
 
 
-    std::string stream_id = streamId;
-    updateIfFound_KeywordValueByID<std::string>(&curFileDescIter->second.lastSRI, "STREAM_GROUP",stream_id);
+    // The stream ID (STREAM_GROUP, if any) the file was last written with, unless it never was
+    const std::string & last_stream_id = curFileDescIter->second->last_keywords.stream_id;
+    std::string stream_id = last_stream_id.empty() ? streamId : last_stream_id;
 
 
-    curFileDescIter->second.num_writers--;
-    if (curFileDescIter->second.num_writers <= 0) {
-        if (curFileDescIter->second.file_type == BLUEFILE) {
-            size_t curPos = filesystem.file_tell(curFileDescIter->second.in_process_uri_filename);
-            std::pair<blue::HeaderControlBlock, std::vector<char> > bheaders = createBluefilesHeaders(curFileDescIter->second.lastSRI,
-                            curPos, curFileDescIter->second.midas_type, curFileDescIter->second.start_time_ws, curFileDescIter->second.start_time_fs);
-            filesystem.file_seek(curFileDescIter->second.in_process_uri_filename, 0);
-            blue::hcb_s tmp_hcb = bheaders.first.getHCB();
-            filesystem.write(curFileDescIter->second.in_process_uri_filename, (char*) & tmp_hcb, BLUEFILE_BLOCK_SIZE, advanced_properties.force_flush);
-            filesystem.file_seek(curFileDescIter->second.in_process_uri_filename, curPos);
-            filesystem.write(curFileDescIter->second.in_process_uri_filename, (char*) &bheaders.second[0], bheaders.second.size(), advanced_properties.force_flush);
-        }
-        filesystem.close_file(curFileDescIter->second.in_process_uri_filename);
-        if(curFileDescIter->second.in_process_uri_filename != curFileDescIter->second.uri_filename){
-            filesystem.move_file(curFileDescIter->second.in_process_uri_filename,curFileDescIter->second.uri_filename);
+    curFileDescIter->second->num_writers--;
+    if (curFileDescIter->second->num_writers <= 0) {
+        boost::shared_ptr<file_struct> file = curFileDescIter->second; // outlives the erase below
+        file->finish = finish_options();
+        file->closed = true;
+        file_to_struct_mapping.erase(curFileDescIter);
+        curFileDescIter = file_to_struct_mapping.end();
+        // With thread_per_port, closing on one port thread does not hold up the others
+        if (background || advanced_properties.finalizer_threads > 0 || advanced_properties.thread_per_port)
+            finisher.submit(file->uri_filename, boost::bind(&FileWriter_i::finish_file, this, file, stream_id));
+        else
+            finish_file(file, stream_id);
+        return true;
+    }
+    return false;
+}
+
+/**
+ * Flushes, writes the Bluefile header of, closes, renames and announces a
+ * file that close_file() has taken out of file_to_struct_mapping, either on
+ * the service thread or in the background (finalizer_threads, or a file that
+ * rolled over onto a standby file).
+ */
+void FileWriter_i::finish_file(boost::shared_ptr<file_struct> file, std::string stream_id) {
+    exclusive_lock file_lock(file->file_lock);
+    flush_staged(*file, true);
+    if (file->compression.enabled())
+        finish_compressed_file(*file);
+    write_behind.drain(file->in_process_uri_filename);
+    if (file->file_type == BLUEFILE) {
+        size_t curPos = file->io->file_tell(file->in_process_uri_filename);
+        std::pair<blue::HeaderControlBlock, std::vector<char> > bheaders = createBluefilesHeaders(file->lastSRI, curPos, file->midas_type,
+                        file->start_time_ws, file->start_time_fs, file->finish.use_tc_prec, file->finish.swap_bytes, file->last_keywords.extended_header.get());
+        // Patch the header in place, the extended header follows the data
+        blue::hcb_s tmp_hcb = bheaders.first.getHCB();
+        file->io->write_at(file->in_process_uri_filename, 0, (char*) & tmp_hcb, BLUEFILE_BLOCK_SIZE, file->finish.force_flush);
+        file->io->write(file->in_process_uri_filename, (char*) &bheaders.second[0], bheaders.second.size(), file->finish.force_flush);
+        if (file->digest.active()) {
+            file->digest.update(&bheaders.second[0], bheaders.second.size());
+            file->digest.prepend((char*) &tmp_hcb, BLUEFILE_BLOCK_SIZE);
         }
+    }
+    if (!file->io->close_file(file->in_process_uri_filename))
+        LOG_ERROR(FileWriter_i, "ERROR WRITING OR CLOSING FILE: " << file->in_process_uri_filename);
+    if (file->preallocated)
+        file->io->release_preallocation(file->in_process_uri_filename);
+    if(file->in_process_uri_filename != file->uri_filename){
+        file->io->move_file(file->in_process_uri_filename,file->uri_filename);
+    }
 
-        if (curFileDescIter->second.metdata_file_enabled()) {
+    if (file->metdata_file_enabled()) {
+        if (file->digest.active())
+            write_metadata(*file, file->json_metadata ? checksum_to_JSONstring(file->digest) : checksum_to_XMLstring(file->digest));
+        if (!file->json_metadata) {
             std::string closeXML = "</FileWriter_metadata>";
-            filesystem.write(curFileDescIter->second.in_process_uri_metadata_filename, &closeXML, advanced_properties.force_flush);
-            filesystem.close_file(curFileDescIter->second.in_process_uri_metadata_filename);
-            if(curFileDescIter->second.in_process_uri_metadata_filename != curFileDescIter->second.uri_metadata_filename){
-                filesystem.move_file(curFileDescIter->second.in_process_uri_metadata_filename,curFileDescIter->second.uri_metadata_filename);
-            }
+            write_metadata(*file, closeXML);
+        }
+        flush_staged(*file, true);
+        write_behind.drain(file->in_process_uri_metadata_filename);
+        file->io->close_file(file->in_process_uri_metadata_filename);
+        if(file->in_process_uri_metadata_filename != file->uri_metadata_filename){
+            file->io->move_file(file->in_process_uri_metadata_filename,file->uri_metadata_filename);
         }
+    }
 
-        if (advanced_properties.debug_output)
-            std::cout << "DEBUG (" << __PRETTY_FUNCTION__ << "): CLOSED FILE: " << curFileDescIter->second.uri_filename << std::endl;
-        LOG_INFO(FileWriter_i, "CLOSED FILE: " << curFileDescIter->second.uri_filename );
+    if (file->index_file_enabled()) {
+        index_record record;
+        if (file->index.finish(record))
+            write_index(*file, record);
+        flush_staged(*file, true);
+        write_behind.drain(file->in_process_uri_index_filename);
+        file->io->close_file(file->in_process_uri_index_filename);
+        if (file->in_process_uri_index_filename != file->uri_index_filename)
+            file->io->move_file(file->in_process_uri_index_filename, file->uri_index_filename);
+    }
 
-        std::string sca_filename = filesystem.uri_to_file(curFileDescIter->second.uri_filename);
-        file_io_message_struct file_event = create_file_io_message("CLOSE", stream_id, sca_filename);
-        BULKIO::PrecisionUTCTime tstamp = bulkio::time::utils::now();
-        MessageEvent_out->sendMessage(file_event);
-        dataFile_out->pushPacket(sca_filename.c_str(), tstamp, true, stream_id.c_str());
+    if (file->finish.debug_output)
+        std::cout << "DEBUG (" << __PRETTY_FUNCTION__ << "): CLOSED FILE: " << file->uri_filename << std::endl;
+    LOG_INFO(FileWriter_i, "CLOSED FILE: " << file->uri_filename );
+
+    std::string sca_filename = filesystem.uri_to_file(file->uri_filename);
+    file_io_message_struct file_event = create_file_io_message("CLOSE", stream_id, sca_filename);
+    if (file->digest.active()) {
+        file_event.checksum = crc32c_to_string(file->digest.value());
+        std::vector<uint32_t> blocks = file->digest.block_values();
+        for (size_t i = 0; i < blocks.size(); ++i) {
+            if (i > 0)
+                file_event.block_checksums += " ";
+            file_event.block_checksums += crc32c_to_string(blocks[i]);
+        }
+    }
+    BULKIO::PrecisionUTCTime tstamp = bulkio::time::utils::now();
+    MessageEvent_out->sendMessage(file_event);
+    dataFile_out->pushPacket(sca_filename.c_str(), tstamp, true, stream_id.c_str());
+}
 
-        file_to_struct_mapping.erase(curFileDescIter);
-        curFileDescIter = file_to_struct_mapping.end();
+/**
+ * True if the header of a Bluefile that is being written is due to be
+ * rewritten (header_checkpoint_size, header_checkpoint_interval)
+ */
+bool FileWriter_i::header_checkpoint_due(const file_struct & file) {
+    if (file.file_type != BLUEFILE || (checkpointSize == 0 && advanced_properties.header_checkpoint_interval <= 0))
+        return false;
+    if (file.checkpoint_time.is_not_a_date_time())
+        return true;
+    if (checkpointSize > 0 && file.file_size_internal - file.checkpoint_size >= checkpointSize)
+        return true;
+    if (advanced_properties.header_checkpoint_interval > 0) {
+        boost::posix_time::time_duration elapsed = boost::posix_time::microsec_clock::universal_time() - file.checkpoint_time;
+        return elapsed.total_microseconds() >= advanced_properties.header_checkpoint_interval * 1e6;
+    }
+    return false;
+}
+
+/**
+ * Writes out the data of a Bluefile that is being written and rewrites its
+ * header to describe that data, without moving the write position. There is
+ * no extended header until the file is closed. The caller must hold
+ * file.file_lock.
+ */
+void FileWriter_i::checkpoint_header(file_struct & file) {
+    flush_staged(file, true);
+    write_behind.drain(file.in_process_uri_filename);
+    size_t curPos = file.io->file_tell(file.in_process_uri_filename);
+    blue::HeaderControlBlock hcb = createBluefileHCB(file.lastSRI, curPos, file.midas_type, file.start_time_ws, file.start_time_fs, advanced_properties.use_tc_prec, swap_bytes);
+    blue::hcb_s tmp_hcb = hcb.getHCB();
+    file.io->write_at(file.in_process_uri_filename, 0, (char*) & tmp_hcb, BLUEFILE_BLOCK_SIZE, false);
+    file.checkpoint_size = file.file_size_internal;
+    file.checkpoint_time = boost::posix_time::microsec_clock::universal_time();
+}
+
+/**
+ * Settles how a file is opened from the current properties
+ */
+file_open_options FileWriter_i::open_options(bool append) {
+    file_open_options options;
+    options.append = append;
+    // Every write is flushed with force_flush, which direct I/O cannot stage for.
+    // A memory mapped file is written by neither direct I/O nor io_uring. Only
+    // files of a fixed size are mapped, since a mapping extends the file ahead
+    // of the data.
+    options.memory_mapped = advanced_properties.memory_mapped_files && maxSize > 0 && advanced_properties.reset_on_max_file;
+    options.direct_io = advanced_properties.direct_io && !advanced_properties.force_flush && !options.memory_mapped;
+    options.uring = (uring.active() && !options.memory_mapped) ? &uring : NULL;
+    // Stage the writes to the file, unless every write has to be flushed
+    options.write_buffer_bytes = advanced_properties.force_flush ? 0 : sizeString_to_longBytes(advanced_properties.write_buffer_size);
+    options.metadata_buffer_bytes = options.write_buffer_bytes;
+    if (advanced_properties.metadata_format == "JSONL" && !advanced_properties.force_flush)
+        options.metadata_buffer_bytes = std::max(options.metadata_buffer_bytes, size_t(METADATA_BUFFER_SIZE));
+    options.index_interval = sizeString_to_longBytes(advanced_properties.index_interval);
+    options.compression = block_compressor::codec_from_string(advanced_properties.compression);
+    if (!block_compressor::available(options.compression))
+        options.compression = COMPRESSION_NONE;
+    options.compression_level = advanced_properties.compression_level;
+    options.checksum = advanced_properties.checksum == "CRC32C";
+    size_t checksum_block_bytes = sizeString_to_longBytes(advanced_properties.checksum_block_size);
+    options.checksum_block_bytes = checksum_block_bytes > 0 ? std::max(checksum_block_bytes, size_t(STAGING_BLOCK_SIZE)) : 0;
+    // Block sizes are recorded in 32 bits
+    options.compression_block_bytes = std::min(std::max(sizeString_to_longBytes(advanced_properties.compression_block_size), size_t(STAGING_BLOCK_SIZE)), size_t(1) << 30);
+    options.force_flush = advanced_properties.force_flush;
+    options.preallocate = advanced_properties.preallocate;
+    return options;
+}
+
+/**
+ * Settles how a file that is being closed is finished from the current
+ * properties, which finish_file() may not read once it runs in the background
+ */
+file_finish_options FileWriter_i::finish_options() {
+    file_finish_options options;
+    options.force_flush = advanced_properties.force_flush;
+    options.debug_output = advanced_properties.debug_output;
+    options.use_tc_prec = advanced_properties.use_tc_prec;
+    options.swap_bytes = swap_bytes;
+    return options;
+}
+
+/**
+ * force_flush for a write to a file, as it was when the file was closed once
+ * it is being finished
+ */
+bool FileWriter_i::flush_writes(const file_struct & file) {
+    return file.closed ? file.finish.force_flush : advanced_properties.force_flush;
+}
+
+/**
+ * Reports a job of the finisher that failed, from the thread that ran it
+ */
+void FileWriter_i::finisher_error(const std::string & uri, const std::string & error) {
+    LOG_ERROR(FileWriter_i, "ERROR OPENING OR FINISHING FILE: " << uri << ": " << error);
+}
+
+/**
+ * Opens the data (metadata and index) files of fs and gets it ready for the data:
+ * writes the placeholder for the Bluefile header, or finds the end of the
+ * data when appending, and sets up staging, compression and preallocation. Does not touch
+ * the state of the component, so that it can run in the background for a
+ * standby file. The caller must hold fs.file_lock.
+ */
+bool FileWriter_i::open_data_file(file_struct & fs, const file_open_options & options) {
+    trace_scope trace(tracer, TRACE_OPEN);
+    // Compressed blocks are neither aligned for direct I/O nor of a size known ahead for a mapping
+    bool compressed = options.compression != COMPRESSION_NONE && fs.file_type == RAW;
+    // A mapping covers the rest of the file, up to where it rolls over
+    size_t mapped_bytes = 0;
+    if (options.memory_mapped && !compressed && fs.max_size > fs.file_size_internal)
+        mapped_bytes = fs.max_size - fs.file_size_internal + ((fs.file_type == BLUEFILE && !options.append) ? BLUEFILE_BLOCK_SIZE : 0);
+    bool open_success = fs.io->open_file(fs.in_process_uri_filename, true, options.append, options.direct_io && !compressed, options.uring, mapped_bytes);
+    fs.direct_io = fs.io->is_direct(fs.in_process_uri_filename);
+    fs.async_io = fs.io->is_async(fs.in_process_uri_filename);
+    fs.memory_mapped = fs.io->is_mapped(fs.in_process_uri_filename);
+    if (fs.metdata_file_enabled())
+        open_success |= fs.io->open_file(fs.in_process_uri_metadata_filename, true, options.append);
+    if (fs.index_file_enabled())
+        open_success |= fs.io->open_file(fs.in_process_uri_index_filename, true, options.append);
+    if (!open_success)
+        return false;
+
+    size_t write_buffer_bytes = options.write_buffer_bytes;
+    size_t metadata_buffer_bytes = options.metadata_buffer_bytes;
+    if (fs.direct_io) {
+        write_buffer_bytes = std::max(write_buffer_bytes, size_t(DIRECT_IO_BUFFER_SIZE));
+        metadata_buffer_bytes = std::max(metadata_buffer_bytes, size_t(DIRECT_IO_BUFFER_SIZE));
+    }
+    fs.metadata_staging.configure(metadata_buffer_bytes, 1, 0);
+    fs.index_staging.configure(options.force_flush ? 0 : INDEX_BUFFER_SIZE, 1, 0);
+    // Only a file that is written from the start can be checksummed. The
+    // Bluefile header is added to the checksum when the file is closed.
+    if (options.checksum && !options.append)
+        fs.digest.configure(options.checksum_block_bytes, (fs.file_type == BLUEFILE) ? BLUEFILE_BLOCK_SIZE : 0);
+
+    // BLUEFILE
+    if (fs.file_type == BLUEFILE) {
+        size_t pos = fs.io->file_tell(fs.in_process_uri_filename);
+        if (pos == 0) {
+            std::string empty_string; // Write 512 block of 0s as place holder for bluefile header
+            empty_string.resize(BLUEFILE_BLOCK_SIZE, '0');
+            fs.io->write(fs.in_process_uri_filename, (char*) empty_string.c_str(), BLUEFILE_BLOCK_SIZE, options.force_flush);
+            fs.io->file_seek(fs.in_process_uri_filename, BLUEFILE_BLOCK_SIZE);
+        } else if (fs.num_writers == 1) {
+            std::vector<char> buff(BLUEFILE_BLOCK_SIZE);
+            fs.io->file_seek(fs.in_process_uri_filename, 0);
+            fs.io->read(fs.in_process_uri_filename, &buff, BLUEFILE_BLOCK_SIZE);
+            blue::HeaderControlBlock hcb = blue::HeaderControlBlock((const blue::hcb_s *) & buff[0]);
+            if (hcb.validate(false) != 0) {
+                LOG_WARN(FileWriter_i, "CAN NOT READ BLUEHEADER FOR APPENDING DATA!");
+            }
+            fs.io->file_seek(fs.in_process_uri_filename, hcb.getDataStart() + hcb.getDataSize());
+        }
+    }
+    // COMPRESSED RAW
+    if (compressed) {
+        // A compressed file ends with its index, so nothing can follow it
+        if (fs.io->file_tell(fs.in_process_uri_filename) != 0) {
+            LOG_WARN(FileWriter_i, "CAN NOT APPEND TO COMPRESSED FILE: " << fs.in_process_uri_filename);
+            return false;
+        }
+        compressed_file_header header;
+        memcpy(header.magic, COMPRESSED_FILE_MAGIC, sizeof(header.magic));
+        header.version = COMPRESSED_FILE_VERSION;
+        header.codec = options.compression;
+        header.block_size = options.compression_block_bytes;
+        header.reserved = 0;
+        fs.io->write(fs.in_process_uri_filename, (char*) &header, sizeof(header), options.force_flush);
+        if (fs.digest.active())
+            fs.digest.update((char*) &header, sizeof(header));
+        fs.compression.codec = options.compression;
+        fs.compression.level = options.compression_level;
+        fs.compression.block.configure(options.compression_block_bytes, 1, 0);
+        fs.compression.file_offset = sizeof(header);
+        fs.compression.data_offset = 0;
+    }
+    size_t data_start = fs.io->file_tell(fs.in_process_uri_filename);
+    // The time index of a compressed file counts the uncompressed data
+    fs.index.configure(options.index_interval, compressed ? 0 : data_start);
+    // Data is copied straight into the mapping, staging it would copy it twice,
+    // and the blocks of a compressed file are its staging
+    if (write_buffer_bytes > 0 && !fs.memory_mapped && !compressed)
+        fs.data_staging.configure(write_buffer_bytes, fs.direct_io ? DIRECT_IO_ALIGNMENT : STAGING_BLOCK_SIZE, data_start);
+
+    // Reserve the space the file will grow to, so it is laid out in as few extents as possible
+    if (options.preallocate && fs.max_size > fs.file_size_internal && !compressed) {
+        size_t expected_size = data_start + (fs.max_size - fs.file_size_internal);
+        fs.preallocated = fs.io->preallocate(fs.in_process_uri_filename, expected_size);
+        if (!fs.preallocated)
+            LOG_DEBUG(FileWriter_i, "Could not preallocate " << expected_size << " bytes for " << fs.in_process_uri_filename);
+    }
+    return true;
+}
+
+/**
+ * True if the file exists, or will once the files being finished in the
+ * background have been renamed
+ */
+bool FileWriter_i::file_exists(locked_file_io & io, const std::string & filename) {
+    return io.exists(filename) || finisher.pending(filename);
+}
+
+/**
+ * Does what existing_file says with a new file whose name is taken: renames
+ * it (RENAME), or waits for the files of that name being finished in the
+ * background (TRUNCATE, APPEND). Returns true if the file is appended to, and
+ * throws std::logic_error to drop the packet. Called with stream_state_lock
+ * released; in_use tells whether the file was open when it was last held.
+ */
+bool FileWriter_i::resolve_existing_file(locked_file_io & io, const std::string & existing_file, bool in_use, std::string & filename) {
+    if (!file_exists(io, filename))
+        return false;
+    if (existing_file == "DROP")
+        throw std::logic_error("File Exists. Dropping Packet!");
+    else if (existing_file == "TRUNCATE") {
+        if (in_use) {
+            throw std::logic_error("Cannot truncate a file currently being written to by this File Writer. Dropping Packet!");
+        }
+        finisher.wait(filename);
+    } else if (existing_file == "RENAME") {
+        int counter = 1;
+        std::string tmpFN = filename;
+        do {
+            tmpFN = filename + "-" + boost::lexical_cast<std::string>(counter);
+            counter++;
+        } while (file_exists(io, tmpFN) && counter <= 1024);
+        filename = tmpFN;
+        if (file_exists(io, filename))
+            throw std::logic_error("Cannot rename file to an available name. Dropping Reset of Packet!");
+    } else if (existing_file == "APPEND") {
+        finisher.wait(filename);
         return true;
     }
     return false;
 }
 
+/**
+ * Waits for a file that another thread is opening with stream_state_lock
+ * released (see singleService), by way of the lock of the file, which the
+ * opening thread holds. The caller must hold stream_state_lock.
+ */
+void FileWriter_i::wait_for_open(exclusive_lock & state_lock, file_struct & file) {
+    while (file.opening) {
+        state_lock.unlock();
+        {
+            exclusive_lock file_lock(file.file_lock);
+        }
+        state_lock.lock();
+    }
+}
+
+/**
+ * Start time of a file whose first sample is at T, in whole and fractional
+ * seconds
+ */
+void FileWriter_i::file_start_time(const BULKIO::PrecisionUTCTime & T, double & start_ws, double & start_fs) {
+    start_ws = T.twsec + floor(T.toff);
+    start_fs = T.tfsec + (T.toff-floor(T.toff));
+    if (start_fs >= 1.0) {
+        start_fs -= 1.0;
+        start_ws += 1.0;
+    }
+    else if (start_fs < 0) {
+        start_fs += 1.0;
+        start_ws -= 1.0;
+    }
+}
+
+/**
+ * With standby_files, opens the file that a stream rolls over to once file
+ * (just opened, starting at file_time) is full, in the background. It is named
+ * for the sample that follows file, which only holds while the timestamps are
+ * continuous; take_standby() discards it otherwise. Names that already exist
+ * are left to existing_file when the stream rolls over. The caller must hold
+ * stream_state_lock.
+ */
+void FileWriter_i::open_standby(const std::string & stream_id, const file_struct & file, const BULKIO::StreamSRI & sri, const std::string & dt, const BULKIO::PrecisionUTCTime & file_time, size_t element_size) {
+    if (!advanced_properties.standby_files || !advanced_properties.reset_on_max_file || file.max_size <= file.file_size_internal || !finisher.active())
+        return;
+    // A name from the system time cannot be known ahead of time
+    if (prop_basename_template.uses(basename_template::SYSTEM_TIMESTAMP) || prop_basename_template.uses(basename_template::SYSTEM_TIMESTAMP_NO_FRACT))
+        return;
+
+    size_t unit;
+    double step;
+    split_unit(sri, unit, step);
+    BULKIO::PrecisionUTCTime next_time = time_at(file_time, (file.max_size - file.file_size_internal) / (unit * element_size), step);
+    std::string filename = prop_dirname + stream_to_basename(stream_id, sri, next_time, file_format, dt);
+    if (filename == file.uri_filename || file_to_struct_mapping.find(filename) != file_to_struct_mapping.end() || file_exists(*file.io, filename))
+        return;
+
+    double start_ws, start_fs;
+    file_start_time(next_time, start_ws, start_fs);
+    boost::shared_ptr<file_struct> fs(new file_struct(filename, file.file_type, start_ws, start_fs, advanced_properties.enable_metadata_file, advanced_properties.use_hidden_files, advanced_properties.open_file_extension, advanced_properties.open_metadata_file_extension, stream_id, file.json_metadata, file.index_file_enabled()));
+    fs->io = file.io;
+    fs->max_size = rollover_size(*fs, sri, element_size);
+    fs->standby = true;
+
+    standby_file_map::iterator standby = standby_files.find(stream_id);
+    if (standby != standby_files.end())
+        discard_standby(standby->second);
+    standby_files[stream_id] = fs;
+    finisher.submit(filename, boost::bind(&FileWriter_i::open_standby_file, this, fs, open_options(false)));
+}
+
+void FileWriter_i::open_standby_file(boost::shared_ptr<file_struct> fs, file_open_options options) {
+    exclusive_lock file_lock(fs->file_lock);
+    // Taken (and opened) by its stream before this job got to it
+    if (!fs->standby)
+        return;
+    fs->opened = open_data_file(*fs, options);
+    if (!fs->opened)
+        LOG_DEBUG(FileWriter_i, "Could not open standby file " << fs->in_process_uri_filename);
+}
+
+/**
+ * Returns the standby file of a stream if it is named filename and starts at
+ * file_time, without waiting for it to be opened: the caller takes it over
+ * under its file_lock (see claim_standby). Any other standby file of the stream
+ * is discarded. One of the same name, from a jump of the timestamps within the
+ * second that names it, is removed right away to leave the name to the caller.
+ * The caller must hold stream_state_lock.
+ */
+boost::shared_ptr<file_struct> FileWriter_i::take_standby(const std::string & stream_id, const std::string & filename, const BULKIO::PrecisionUTCTime & file_time) {
+    standby_file_map::iterator standby_iter = standby_files.find(stream_id);
+    if (standby_iter == standby_files.end())
+        return boost::shared_ptr<file_struct>();
+    boost::shared_ptr<file_struct> standby = standby_iter->second;
+    standby_files.erase(standby_iter);
+    if (standby->uri_filename != filename) {
+        discard_standby(standby);
+        return boost::shared_ptr<file_struct>();
+    }
+    double start_ws, start_fs;
+    file_start_time(file_time, start_ws, start_fs);
+    if (standby->start_time_ws != start_ws || standby->start_time_fs != start_fs) {
+        remove_standby_file(standby);
+        return boost::shared_ptr<file_struct>();
+    }
+    return standby;
+}
+
+/**
+ * Takes a standby file over from open_standby_file(), opening it here if the
+ * background has yet to. The caller must hold the file_lock of the file.
+ */
+bool FileWriter_i::claim_standby(file_struct & fs) {
+    fs.standby = false;
+    if (!fs.opened)
+        fs.opened = open_data_file(fs, open_options(false));
+    return fs.opened;
+}
+
+void FileWriter_i::discard_standby(boost::shared_ptr<file_struct> fs) {
+    finisher.submit(fs->uri_filename, boost::bind(&FileWriter_i::remove_standby_file, this, fs));
+}
+
+/**
+ * Closes and deletes a standby file that its stream did not move on to
+ */
+void FileWriter_i::remove_standby_file(boost::shared_ptr<file_struct> fs) {
+    exclusive_lock file_lock(fs->file_lock);
+    fs->standby = false;
+    if (fs->opened) {
+        fs->io->close_file(fs->in_process_uri_filename);
+        if (fs->metdata_file_enabled())
+            fs->io->close_file(fs->in_process_uri_metadata_filename);
+        if (fs->index_file_enabled())
+            fs->io->close_file(fs->in_process_uri_index_filename);
+        fs->opened = false;
+    }
+    if (fs->io->exists(fs->in_process_uri_filename))
+        fs->io->delete_file(fs->in_process_uri_filename);
+    if (fs->metdata_file_enabled() && fs->io->exists(fs->in_process_uri_metadata_filename))
+        fs->io->delete_file(fs->in_process_uri_metadata_filename);
+    if (fs->index_file_enabled() && fs->io->exists(fs->in_process_uri_index_filename))
+        fs->io->delete_file(fs->in_process_uri_index_filename);
+}
+
+/**
+ * Splits a packet of elements starting at T into the parts that are inside and
+ * outside of the recording window, applying the recording timers that are
+ * due. Timers that use the packet timestamp take effect at the first sample
+ * (or frame, with a subsize) at or after their time. The others only take
+ * effect at packet granularity, at the start of the first packet serviced
+ * after their time. The system clock is read once for such a timer, when it is
+ * next due, to set its deadline on the monotonic clock, which each packet then
+ * checks; a step of the system clock after that does not move the deadline.
+ * Leaves recording_enabled set to the state at the end of the packet. The
+ * caller must hold stream_state_lock.
+ */
+void FileWriter_i::recording_segments(const BULKIO::PrecisionUTCTime & T, const BULKIO::StreamSRI & sri, size_t elements, size_t element_size, std::vector<recording_segment> & segments) {
+    trace_scope trace(tracer, TRACE_TIMER);
+    size_t unit;
+    double step;
+    split_unit(sri, unit, step);
+    size_t units = elements / unit;
+
+    segments.clear();
+    segments.push_back(recording_segment(0, recording_enabled));
+    // modified the interpretation of tcmode and tcstatus
+    //   tcmode stores (bool) use_pkt_timestamp
+    //   tcstatus stores (bool) recording_enable
+    while (timer_set_iter != timer_set.end()) {
+        size_t offset = 0;
+        if (timer_set_iter->tcmode == 1) {
+            // Whole and fractional seconds are subtracted apart to keep the precision
+            double seconds = (timer_set_iter->twsec - T.twsec) + (timer_set_iter->tfsec - T.tfsec);
+            if (seconds > 0) {
+                if (step <= 0)
+                    break;
+                double position = ceil(seconds / step - 1e-6);
+                if (position >= units)
+                    break; // after this packet
+                offset = size_t(position);
+            }
+        } else {
+            if (deadline_timer != timer_set_iter) {
+                BULKIO::PrecisionUTCTime now = getSystemTimestamp();
+                double seconds = (timer_set_iter->twsec - now.twsec) + (timer_set_iter->tfsec - now.tfsec);
+                timer_deadline_usec = monotonic_usec() + uint64_t(std::max(seconds, 0.0) * 1e6);
+                deadline_timer = timer_set_iter;
+            }
+            if (monotonic_usec() < timer_deadline_usec)
+                break;
+        }
+        bool enable = (timer_set_iter->tcstatus == 1);
+        timer_set_iter++;
+
+        size_t start = std::max(offset * unit * element_size, segments.back().start);
+        if (start == segments.back().start) {
+            segments.back().enabled = enable;
+            if (segments.size() > 1 && segments[segments.size() - 2].enabled == enable)
+                segments.pop_back();
+        } else if (enable != segments.back().enabled) {
+            segments.push_back(recording_segment(start, enable));
+        }
+    }
+    recording_enabled = segments.back().enabled;
+}
+
+void FileWriter_i::split_unit(const BULKIO::StreamSRI & sri, size_t & unit, double & step) {
+    bool framed = (sri.subsize > 0 && sri.ydelta > 0);
+    unit = (sri.mode + 1) * (framed ? sri.subsize : 1);
+    step = framed ? sri.ydelta : sri.xdelta;
+}
+
+/**
+ * Returns the time of the sample (or frame) that is units after the one at T
+ */
+BULKIO::PrecisionUTCTime FileWriter_i::time_at(const BULKIO::PrecisionUTCTime & T, size_t units, double step) {
+    BULKIO::PrecisionUTCTime time = T;
+    if (units == 0 || step <= 0)
+        return time;
+    double whole;
+    time.tfsec += modf(units * step, &whole);
+    time.twsec += whole;
+    if (time.tfsec >= 1.0) {
+        time.tfsec -= 1.0;
+        time.twsec += 1.0;
+    }
+    return time;
+}
+
+/**
+ * Returns the file_size_internal at which a file that was just opened rolls
+ * over, or 0 if its size is unlimited. The limit is a whole number of samples
+ * (or frames) of the stream that opened it. With max_file_time, the samples
+ * are counted from the start time of the file, either for max_file_time
+ * seconds or, with align_max_file_time, up to the next multiple of
+ * max_file_time since the epoch.
+ */
+unsigned long long FileWriter_i::rollover_size(const file_struct & file, const BULKIO::StreamSRI & sri, size_t element_size) {
+    size_t unit;
+    double step;
+    split_unit(sri, unit, step);
+    unsigned long long unit_bytes = unit * element_size;
+
+    unsigned long long limit = 0;
+    if (maxSize > 0)
+        limit = std::max((unsigned long long) maxSize / unit_bytes, 1ULL) * unit_bytes;
+
+    if (advanced_properties.max_file_time > 0 && step > 0) {
+        double seconds = advanced_properties.max_file_time;
+        if (advanced_properties.align_max_file_time) {
+            // Whole and fractional seconds are subtracted apart to keep the precision
+            double boundary = (floor(file.start_time_ws / seconds) + 1) * seconds;
+            seconds = (boundary - file.start_time_ws) - file.start_time_fs;
+        }
+        // The first sample at or after the boundary starts the next file
+        double units = std::max(ceil(seconds / step - 1e-6), 1.0);
+        unsigned long long time_limit = file.file_size_internal + (unsigned long long) units * unit_bytes;
+        if (limit == 0 || time_limit < limit)
+            limit = time_limit;
+    }
+    return limit;
+}
+
+/**
+ * Returns the open file that a stream writes to, which is empty once the file
+ * has been closed (e.g. on reaching max_file_size without reset_on_max_file).
+ * A file of the same name opened since then by another stream of the group
+ * takes its place. The caller must hold stream_state_lock.
+ */
+boost::shared_ptr<file_struct> FileWriter_i::stream_file(stream_state & state) {
+    if (!state.file || state.file->closed) {
+        std::map<std::string, boost::shared_ptr<file_struct> >::iterator curFileDescIter = file_to_struct_mapping.find(state.destination_filename);
+        if (curFileDescIter != file_to_struct_mapping.end())
+            state.file = curFileDescIter->second;
+        else
+            state.file.reset();
+    }
+    return state.file;
+}
+
+/**
+ * Parses the SRI values used for every packet of a stream (see sri_keywords).
+ * As with getKeywordValueByID, the first keyword with a given ID is used.
+ */
+void FileWriter_i::parse_sri_keywords(BULKIO::StreamSRI & sri, sri_keywords & keywords) {
+    keywords = sri_keywords();
+    keywords.extended_header.reset(new packed_extended_header());
+    keywords.stream_id = sri.streamID;
+    keywords.xdelta = sri.xdelta;
+    keywords.mode = sri.mode;
+    bool stream_group_found = false;
+    bool col_rf_found = false;
+    bool chan_rf_found = false;
+    for (unsigned int i = 0; i < sri.keywords.length(); i++) {
+        const char *id = sri.keywords[i].id;
+        if (!stream_group_found && !strcmp(id, "STREAM_GROUP")) {
+            sri.keywords[i].value >>= keywords.stream_id;
+            stream_group_found = true;
+        } else if (!col_rf_found && !strcmp(id, "COL_RF")) {
+            sri.keywords[i].value >>= keywords.col_rf;
+            col_rf_found = true;
+        } else if (!chan_rf_found && !strcmp(id, "CHAN_RF")) {
+            sri.keywords[i].value >>= keywords.chan_rf;
+            chan_rf_found = true;
+        }
+    }
+}
+
+/**
+ * Writes data to the file, through its staging buffer when write_buffer_size
+ * is set. With a swap_width of more than 1, the bytes of each element are
+ * reversed as the data is copied into the staging buffer (or into a buffer of
+ * its own when not staging); phase is the offset of data within its element.
+ * Returns false if the write-behind queue dropped the data (DROP overflow
+ * policy), which only happens to data that is not staged: staged data,
+ * compressed blocks, metadata and the index are never dropped, so that the
+ * files stay whole. The caller must hold file.file_lock.
+ */
+bool FileWriter_i::write_data(file_struct & file, const char *data, size_t size, const boost::shared_ptr<void> & owner, size_t swap_width, size_t phase) {
+    if (file.compression.enabled()) {
+        compress_data(file, data, size, swap_width, phase);
+        return true;
+    }
+    if (!file.data_staging.enabled()) {
+        if (swap_width > 1) {
+            staging_buffer::chunk swapped(new aligned_buffer(size, STAGING_BLOCK_SIZE));
+            {
+                trace_scope trace(tracer, TRACE_SWAP, size);
+                swap_copy(swapped->data, data, size, swap_width, phase);
+            }
+            return queue_data_write(file, swapped->data, size, advanced_properties.force_flush, swapped, true);
+        }
+        return queue_data_write(file, data, size, advanced_properties.force_flush, owner, true);
+    }
+
+    // Whole blocks of a large write are not worth copying, unless they have to
+    // be aligned in memory for direct I/O or byte swapped
+    size_t direct = (file.direct_io || swap_width > 1) ? 0 : file.data_staging.bypass(size);
+    if (direct > 0) {
+        queue_data_write(file, data, direct, false, owner);
+        data += direct;
+        size -= direct;
+    }
+    while (size > 0) {
+        size_t copied;
+        {
+            trace_scope trace(tracer, swap_width > 1 ? TRACE_SWAP : TRACE_COPY, size);
+            copied = file.data_staging.append(data, size, swap_width, phase);
+        }
+        data += copied;
+        size -= copied;
+        phase = (phase + copied) % swap_width;
+        if (file.data_staging.full())
+            flush_staged(file, false);
+    }
+    if (advanced_properties.write_buffer_max_age > 0 &&
+            file.data_staging.age(boost::posix_time::microsec_clock::universal_time()) >= advanced_properties.write_buffer_max_age)
+        flush_staged(file, true);
+    return true;
+}
+
+/**
+ * Writes to the metadata file, through its staging buffer when
+ * write_buffer_size is set. The caller must hold file.file_lock.
+ */
+void FileWriter_i::write_metadata(file_struct & file, const std::string & metadata) {
+    trace_scope trace(tracer, TRACE_METADATA);
+    if (!file.metadata_staging.enabled()) {
+        std::string tmp = metadata;
+        file.io->write(file.in_process_uri_metadata_filename, &tmp, flush_writes(file));
+        return;
+    }
+
+    const char *data = metadata.data();
+    size_t size = metadata.size();
+    while (size > 0) {
+        size_t copied = file.metadata_staging.append(data, size);
+        data += copied;
+        size -= copied;
+        if (file.metadata_staging.full())
+            flush_staged(file, true);
+    }
+}
+
+/**
+ * Writes a record to the time index, through its staging buffer unless
+ * force_flush is set. The caller must hold file.file_lock.
+ */
+void FileWriter_i::write_index(file_struct & file, const index_record & record) {
+    if (!file.index_staging.enabled()) {
+        file.io->write(file.in_process_uri_index_filename, (char*) &record, sizeof(record), flush_writes(file));
+        return;
+    }
+    // The buffer holds a whole number of records
+    file.index_staging.append((const char*) &record, sizeof(record));
+    if (file.index_staging.full())
+        flush_staged(file, true);
+}
+
+/**
+ * Submits a data file write through io_uring if the file is written that way,
+ * copies it into the mapping of a memory mapped file, and otherwise hands it to
+ * the write-behind queue. Every byte of the data file after its header goes
+ * through here, in file order, and is added to its checksum unless the
+ * write-behind queue drops it, which only a droppable write may be. Returns
+ * false if the write was dropped. The caller must hold file.file_lock.
+ */
+bool FileWriter_i::queue_data_write(file_struct & file, const char *data, size_t size, bool flush, const boost::shared_ptr<void> & owner, bool droppable) {
+    trace_scope trace(tracer, TRACE_WRITE, size);
+    if (file.async_io)
+        file.io->write_async(file.in_process_uri_filename, data, size, flush, owner);
+    else if (file.memory_mapped)
+        file.io->write(file.in_process_uri_filename, const_cast<char*>(data), size, flush);
+    else if (!write_behind.write(file.io, file.in_process_uri_filename, data, size, flush, owner, droppable))
+        return false;
+    if (file.digest.active())
+        file.digest.update(data, size);
+    return true;
+}
+
+/**
+ * Hands the staged data, metadata and index of the file to the write-behind queue.
+ * Unless all is set, data is only written up to the last block boundary.
+ * The caller must hold file.file_lock.
+ */
+void FileWriter_i::flush_staged(file_struct & file, bool all) {
+    staging_buffer::chunk chunk = file.data_staging.take(all);
+    if (chunk)
+        queue_data_write(file, chunk->data, chunk->size, false, chunk);
+    chunk = file.metadata_staging.take(true);
+    if (chunk)
+        write_behind.write(file.io, file.in_process_uri_metadata_filename, chunk->data, chunk->size, false, chunk);
+    chunk = file.index_staging.take(true);
+    if (chunk)
+        write_behind.write(file.io, file.in_process_uri_index_filename, chunk->data, chunk->size, false, chunk);
+    if (all && file.compression.enabled()) {
+        submit_compressed_block(file);
+        write_compressed_blocks(file, false);
+    }
+}
+
+/**
+ * Gathers the data of a compressed file into blocks, hands each block to the
+ * compressor once it is full, and writes out the blocks that have been
+ * compressed. The caller must hold file.file_lock.
+ */
+void FileWriter_i::compress_data(file_struct & file, const char *data, size_t size, size_t swap_width, size_t phase) {
+    while (size > 0) {
+        size_t copied = file.compression.block.append(data, size, swap_width, phase);
+        data += copied;
+        size -= copied;
+        phase = (phase + copied) % swap_width;
+        if (file.compression.block.full())
+            submit_compressed_block(file);
+    }
+    if (advanced_properties.write_buffer_max_age > 0 &&
+            file.compression.block.age(boost::posix_time::microsec_clock::universal_time()) >= advanced_properties.write_buffer_max_age)
+        submit_compressed_block(file);
+    write_compressed_blocks(file, false);
+}
+
+/**
+ * Hands the block that is being gathered, full or not, to the compressor.
+ * Waits for the oldest blocks of the file to be written when too many are
+ * in the compressor. The caller must hold file.file_lock.
+ */
+void FileWriter_i::submit_compressed_block(file_struct & file) {
+    staging_buffer::chunk block = file.compression.block.take(true);
+    if (!block)
+        return;
+    file.compression.jobs.push_back(compressor.submit(block, file.compression.codec, file.compression.level));
+    size_t max_blocks = std::max(compressor.threads(), size_t(1)) * COMPRESSION_BLOCKS_PER_THREAD;
+    while (file.compression.jobs.size() > max_blocks) {
+        compressor.wait(file.compression.jobs.front());
+        write_compressed_blocks(file, false);
+    }
+}
+
+/**
+ * Writes out the compressed blocks of a file, in the order they were
+ * submitted, up to the first one that is still being compressed, or all of
+ * them. The caller must hold file.file_lock.
+ */
+void FileWriter_i::write_compressed_blocks(file_struct & file, bool all) {
+    compressed_file & compression = file.compression;
+    while (!compression.jobs.empty()) {
+        boost::shared_ptr<compression_job> job = compression.jobs.front();
+        if (all)
+            compressor.wait(job);
+        else if (!compressor.done(job))
+            break;
+        compressed_index_entry entry;
+        entry.offset = compression.file_offset;
+        entry.data_offset = compression.data_offset;
+        compression.index.push_back(entry);
+        queue_data_write(file, job->output->data, job->output->size, flush_writes(file), job->output);
+        compression.file_offset += job->output->size;
+        compression.data_offset += job->input->size;
+        compression.jobs.pop_front();
+    }
+}
+
+/**
+ * Writes out the rest of the data of a compressed file, followed by its block
+ * index and footer. The caller must hold file.file_lock.
+ */
+void FileWriter_i::finish_compressed_file(file_struct & file) {
+    compressed_file & compression = file.compression;
+    submit_compressed_block(file);
+    write_compressed_blocks(file, true);
+
+    size_t index_bytes = compression.index.size() * sizeof(compressed_index_entry);
+    compressed_file_footer footer;
+    footer.index_offset = compression.file_offset;
+    footer.blocks = compression.index.size();
+    memcpy(footer.magic, COMPRESSED_INDEX_MAGIC, sizeof(footer.magic));
+    staging_buffer::chunk trailer(new aligned_buffer(index_bytes + sizeof(footer), STAGING_BLOCK_SIZE));
+    if (index_bytes > 0)
+        memcpy(trailer->data, &compression.index[0], index_bytes);
+    memcpy(trailer->data + index_bytes, &footer, sizeof(footer));
+    trailer->size = index_bytes + sizeof(footer);
+    queue_data_write(file, trailer->data, trailer->size, flush_writes(file), trailer);
+    compression.file_offset += trailer->size;
+    compression.codec = COMPRESSION_NONE;
+}
+
+/**
+ * Writes out the staging buffers of every open file whose oldest data is older
+ * than write_buffer_max_age, so that idle streams do not sit on their data.
+ */
+void FileWriter_i::flush_aged_buffers() {
+    read_lock lock(service_thread_lock);
+    if (advanced_properties.write_buffer_max_age <= 0)
+        return;
+
+    std::vector<boost::shared_ptr<file_struct> > files;
+    {
+        exclusive_lock state_lock(stream_state_lock);
+        for (std::map<std::string, boost::shared_ptr<file_struct> >::iterator curFileDescIter = file_to_struct_mapping.begin(); curFileDescIter != file_to_struct_mapping.end(); curFileDescIter++) {
+            files.push_back(curFileDescIter->second);
+        }
+    }
+
+    boost::posix_time::ptime now = boost::posix_time::microsec_clock::universal_time();
+    for (size_t i = 0; i < files.size(); ++i) {
+        exclusive_lock file_lock(files[i]->file_lock);
+        if (files[i]->data_staging.age(now) >= advanced_properties.write_buffer_max_age ||
+                files[i]->compression.block.age(now) >= advanced_properties.write_buffer_max_age ||
+                files[i]->metadata_staging.age(now) >= advanced_properties.write_buffer_max_age ||
+                files[i]->index_staging.age(now) >= advanced_properties.write_buffer_max_age)
+            flush_staged(*files[i], true);
+    }
+}
+
 std::string FileWriter_i::stream_to_basename(const std::string & stream_id, const BULKIO::StreamSRI& sri, const BULKIO::PrecisionUTCTime &_T, const std::string & extension, const std::string & dt) {
+    trace_scope trace(tracer, TRACE_BASENAME);
 
     // Create Timestamp String
     BULKIO::PrecisionUTCTime tstamp = _T;
@@ -724,11 +2041,19 @@ std::string FileWriter_i::stream_to_basename(const std::string & stream_id, cons
         tstamp.tfsec = fsec;
     }
 
-    std::string time_string_no_fract = time_to_string(tstamp, false, true);
-    std::string time_string = time_to_string(tstamp, true, true);
-    BULKIO::PrecisionUTCTime tstamp_system = getSystemTimestamp();
-    std::string system_time_string_no_fract = time_to_string(tstamp_system, false, true);
-    std::string system_time_string = time_to_string(tstamp_system, true, true);
+    std::string time_string_no_fract;
+    std::string time_string;
+    if (prop_basename_template.uses(basename_template::TIMESTAMP_NO_FRACT))
+        time_string_no_fract = time_to_string(tstamp, false, true);
+    if (prop_basename_template.uses(basename_template::TIMESTAMP))
+        time_string = time_to_string(tstamp, true, true);
+    std::string system_time_string_no_fract;
+    std::string system_time_string;
+    if (prop_basename_template.uses(basename_template::SYSTEM_TIMESTAMP) || prop_basename_template.uses(basename_template::SYSTEM_TIMESTAMP_NO_FRACT)) {
+        BULKIO::PrecisionUTCTime tstamp_system = getSystemTimestamp();
+        system_time_string_no_fract = time_to_string(tstamp_system, false, true);
+        system_time_string = time_to_string(tstamp_system, true, true);
+    }
 
     // Ensure extension is lowercase
     std::string ext = extension;
@@ -740,57 +2065,102 @@ std::string FileWriter_i::stream_to_basename(const std::string & stream_id, cons
         mode = "cplx";
 
     // Sample Rate
-    double sampleRate = 1.0 / sri.xdelta;
     char sr[25] = "";
-    sprintf(sr, "%.0f", sampleRate);
-
-
-    // Perform Replacements
-    std::string bn = prop_basename;
-    bn = replace_string(bn, "%STREAMID%", stream_id);
-    bn = replace_string(bn, "%TIMESTAMP%", time_string);
-    bn = replace_string(bn, "%TIMESTAMP_NO_FRACT%", time_string_no_fract);
-    bn = replace_string(bn, "%SYSTEM_TIMESTAMP%", system_time_string);
-    bn = replace_string(bn, "%SYSTEM_TIMESTAMP_NO_FRACT%", system_time_string_no_fract);
-    bn = replace_string(bn, "%COMP_NS_NAME%", naming_service_name);
-    bn = replace_string(bn, "%EXTENSION%", ext);
-    bn = replace_string(bn, "%MODE%", mode);
-    bn = replace_string(bn, "%SR%", std::string(sr));
-    bn = replace_string(bn, "%DT%", std::string(dt));
+    if (prop_basename_template.uses(basename_template::SR)) {
+        double sampleRate = 1.0 / sri.xdelta;
+        sprintf(sr, "%.0f", sampleRate);
+    }
 
     std::string cf_hz_str = "Hz";
     std::string colrf_hz_str = "";
     std::string chanrf_hz_str = "";
 
-    for (size_t i = 0; i < sri.keywords.length(); i++) {
-        std::string search = "%" + std::string(sri.keywords[i].id) + "%";
-        std::string replace = ossie::any_to_string(sri.keywords[i].value);
-        bn = replace_string(bn, search, replace);
-        if (std::string(sri.keywords[i].id) == "COL_RF") {
-            std::ostringstream result;
-            CORBA::Double tmp;
-            sri.keywords[i].value >>= tmp;
-            CORBA::LongLong tmpLL = CORBA::LongLong(tmp);
-            result << tmpLL;
-            colrf_hz_str = std::string(result.str()) + "Hz";
-        }
-        if (std::string(sri.keywords[i].id) == "CHAN_RF") {
-            std::ostringstream result;
-            CORBA::Double tmp;
-            sri.keywords[i].value >>= tmp;
-            CORBA::LongLong tmpLL = CORBA::LongLong(tmp);
-            result << tmpLL;
-            chanrf_hz_str = std::string(result.str()) + "Hz";
+    if (prop_basename_template.uses(basename_template::CF_HZ) || prop_basename_template.uses(basename_template::COLRF_HZ) ||
+            prop_basename_template.uses(basename_template::CHANRF_HZ)) {
+        for (size_t i = 0; i < sri.keywords.length(); i++) {
+            if (std::string(sri.keywords[i].id) == "COL_RF") {
+                std::ostringstream result;
+                CORBA::Double tmp;
+                sri.keywords[i].value >>= tmp;
+                CORBA::LongLong tmpLL = CORBA::LongLong(tmp);
+                result << tmpLL;
+                colrf_hz_str = std::string(result.str()) + "Hz";
+            }
+            if (std::string(sri.keywords[i].id) == "CHAN_RF") {
+                std::ostringstream result;
+                CORBA::Double tmp;
+                sri.keywords[i].value >>= tmp;
+                CORBA::LongLong tmpLL = CORBA::LongLong(tmp);
+                result << tmpLL;
+                chanrf_hz_str = std::string(result.str()) + "Hz";
+            }
         }
+        if (!chanrf_hz_str.empty())
+            cf_hz_str = chanrf_hz_str;
+        else if (!colrf_hz_str.empty())
+            cf_hz_str = colrf_hz_str;
     }
 
-    if (!chanrf_hz_str.empty())
-        cf_hz_str = chanrf_hz_str;
-    else if (!colrf_hz_str.empty())
-        cf_hz_str = colrf_hz_str;
-    bn = replace_string(bn, "%CF_HZ%", std::string(cf_hz_str));
-    bn = replace_string(bn, "%COLRF_HZ%", std::string(colrf_hz_str));
-    bn = replace_string(bn, "%CHANRF_HZ%", std::string(chanrf_hz_str));
+    // Perform Replacements
+    std::string bn;
+    const std::vector<basename_template::token> & tokens = prop_basename_template.tokens;
+    for (size_t t = 0; t < tokens.size(); t++) {
+        switch (tokens[t].type) {
+        case basename_template::LITERAL:
+            if (tokens[t].keywords) {
+                // Other %...% tokens are SRI keywords
+                std::string literal = tokens[t].text;
+                for (size_t i = 0; i < sri.keywords.length(); i++) {
+                    std::string search = "%" + std::string(sri.keywords[i].id) + "%";
+                    if (literal.find(search) != std::string::npos)
+                        literal = replace_string(literal, search, ossie::any_to_string(sri.keywords[i].value));
+                }
+                bn += literal;
+            } else {
+                bn += tokens[t].text;
+            }
+            break;
+        case basename_template::STREAMID:
+            bn += stream_id;
+            break;
+        case basename_template::TIMESTAMP:
+            bn += time_string;
+            break;
+        case basename_template::TIMESTAMP_NO_FRACT:
+            bn += time_string_no_fract;
+            break;
+        case basename_template::SYSTEM_TIMESTAMP:
+            bn += system_time_string;
+            break;
+        case basename_template::SYSTEM_TIMESTAMP_NO_FRACT:
+            bn += system_time_string_no_fract;
+            break;
+        case basename_template::COMP_NS_NAME:
+            bn += naming_service_name;
+            break;
+        case basename_template::EXTENSION:
+            bn += ext;
+            break;
+        case basename_template::MODE:
+            bn += mode;
+            break;
+        case basename_template::SR:
+            bn += sr;
+            break;
+        case basename_template::DT:
+            bn += dt;
+            break;
+        case basename_template::CF_HZ:
+            bn += cf_hz_str;
+            break;
+        case basename_template::COLRF_HZ:
+            bn += colrf_hz_str;
+            break;
+        case basename_template::CHANRF_HZ:
+            bn += chanrf_hz_str;
+            break;
+        }
+    }
 
     // Force to lower/upper case here if needed
     //advanced_properties.output_filename_case: 0 mixed; 1 lower; 2 upper
@@ -841,10 +2211,137 @@ std::string FileWriter_i::eos_to_XMLstring(const BULKIO::StreamSRI& sri) {
     return std::string(eos_string.str());
 }
 
-std::pair<blue::HeaderControlBlock, std::vector<char> > FileWriter_i::createBluefilesHeaders(const BULKIO::StreamSRI& sri, size_t datasize, std::string midasType, double start_ws, double start_fs) {
-    blue::HeaderControlBlock hcb;
+/**
+ * Checksum of a closed data file, for the XML metadata file
+ */
+std::string FileWriter_i::checksum_to_XMLstring(const file_digest & digest) {
+    std::ostringstream checksum_string;
+    checksum_string << "<checksum>";
+    checksum_string << "<algorithm>CRC32C</algorithm>";
+    checksum_string << "<size>" << digest.size() << "</size>";
+    checksum_string << "<value>" << crc32c_to_string(digest.value()) << "</value>";
+    std::vector<uint32_t> blocks = digest.block_values();
+    for (size_t i = 0; i < blocks.size(); ++i)
+        checksum_string << "<block>" << crc32c_to_string(blocks[i]) << "</block>";
+    checksum_string << "</checksum>";
+    return checksum_string.str();
+}
+
+/**
+ * One line of a JSONL metadata file for the checksum of a closed data file
+ */
+std::string FileWriter_i::checksum_to_JSONstring(const file_digest & digest) {
+    std::string checksum_string = "{\"type\":\"checksum\",\"algorithm\":\"CRC32C\",\"size\":";
+    json_append_integer(checksum_string, digest.size());
+    checksum_string += ",\"value\":";
+    json_append_string(checksum_string, crc32c_to_string(digest.value()).c_str());
+    checksum_string += ",\"blocks\":[";
+    std::vector<uint32_t> blocks = digest.block_values();
+    for (size_t i = 0; i < blocks.size(); ++i) {
+        if (i > 0)
+            checksum_string += ",";
+        json_append_string(checksum_string, crc32c_to_string(blocks[i]).c_str());
+    }
+    checksum_string += "]}\n";
+    return checksum_string;
+}
+
+/**
+ * One line of a JSONL metadata file for an SRI that came with a packet at T
+ */
+std::string FileWriter_i::sri_to_JSONstring(const BULKIO::StreamSRI& sri, const BULKIO::PrecisionUTCTime & T) {
+    std::string sri_string = "{\"type\":\"sri\",\"twsec\":";
+    json_append_number(sri_string, T.twsec);
+    sri_string += ",\"tfsec\":";
+    json_append_number(sri_string, T.tfsec);
+    sri_string += ",\"streamID\":";
+    json_append_string(sri_string, sri.streamID);
+    sri_string += ",\"hversion\":";
+    json_append_integer(sri_string, sri.hversion);
+    sri_string += ",\"xstart\":";
+    json_append_number(sri_string, sri.xstart);
+    sri_string += ",\"xdelta\":";
+    json_append_number(sri_string, sri.xdelta);
+    sri_string += ",\"xunits\":";
+    json_append_integer(sri_string, sri.xunits);
+    sri_string += ",\"subsize\":";
+    json_append_integer(sri_string, sri.subsize);
+    sri_string += ",\"ystart\":";
+    json_append_number(sri_string, sri.ystart);
+    sri_string += ",\"ydelta\":";
+    json_append_number(sri_string, sri.ydelta);
+    sri_string += ",\"yunits\":";
+    json_append_integer(sri_string, sri.yunits);
+    sri_string += ",\"mode\":";
+    json_append_integer(sri_string, sri.mode);
+    sri_string += ",\"keywords\":[";
+    for (unsigned int i = 0; i < sri.keywords.length(); i++) {
+        if (i > 0)
+            sri_string += ',';
+        sri_string += "{\"id\":";
+        json_append_string(sri_string, sri.keywords[i].id);
+        sri_string += ",\"value\":";
+        json_append_any(sri_string, sri.keywords[i].value);
+        sri_string += '}';
+    }
+    sri_string += "]}\n";
+    return sri_string;
+}
+
+std::string FileWriter_i::eos_to_JSONstring(const BULKIO::StreamSRI& sri, const BULKIO::PrecisionUTCTime & T) {
+    std::string eos_string = "{\"type\":\"eos\",\"twsec\":";
+    json_append_number(eos_string, T.twsec);
+    eos_string += ",\"tfsec\":";
+    json_append_number(eos_string, T.tfsec);
+    eos_string += ",\"streamID\":";
+    json_append_string(eos_string, sri.streamID);
+    eos_string += "}\n";
+    return eos_string;
+}
+
+/**
+ * Creates the header control block and the extended header of a Bluefile.
+ * The keywords in the extended header are packed once per extended_header,
+ * and reused for every file written with the same SRI.
+ */
+std::pair<blue::HeaderControlBlock, std::vector<char> > FileWriter_i::createBluefilesHeaders(const BULKIO::StreamSRI& sri, size_t datasize, std::string midasType, double start_ws, double start_fs, bool use_tc_prec, bool swapped,
+                                                                                           packed_extended_header *extended_header) {
+    blue::HeaderControlBlock hcb = createBluefileHCB(sri, datasize, midasType, start_ws, start_fs, use_tc_prec, swapped);
     blue::ExtendedHeader ecb;
 
+    std::vector<char> buff;
+    int NN;
+    if (extended_header) {
+        exclusive_lock lock(extended_header->lock);
+        if (!extended_header->packed) {
+            extended_header->keywords.clear();
+            extended_header->size = packExtendedHeader(sri, extended_header->keywords);
+            extended_header->packed = true;
+        }
+        buff = extended_header->keywords;
+        NN = extended_header->size;
+    } else {
+        NN = packExtendedHeader(sri, buff);
+    }
+
+    size_t startBlock = size_t(ceil(double(datasize) / double(BLUEFILE_BLOCK_SIZE)));
+    size_t numZeros = startBlock * BLUEFILE_BLOCK_SIZE - datasize;
+    hcb.setExtStart(startBlock);
+    //hcb.setExtSize(static_cast<int> (buff.size()));
+    hcb.setExtSize(static_cast<int> (NN));
+    buff.insert(buff.begin(), numZeros, 0);
+    return std::make_pair(hcb, buff);
+
+}
+
+/**
+ * Creates the header control block of a Bluefile of datasize bytes, including
+ * the header, without the extended header. With use_tc_prec, the part of the
+ * time code below a microsecond goes in the TC_PREC keyword. The data is
+ * marked EEEI when it was swapped (swap_bytes).
+ */
+blue::HeaderControlBlock FileWriter_i::createBluefileHCB(const BULKIO::StreamSRI& sri, size_t datasize, std::string midasType, double start_ws, double start_fs, bool use_tc_prec, bool swapped) {
+    blue::HeaderControlBlock hcb;
 
     if ( sri.subsize == 0) {
         hcb.setTypeCode(1000);
@@ -863,7 +2360,7 @@ std::pair<blue::HeaderControlBlock, std::vector<char> > FileWriter_i::createBlue
     }
 
     hcb.setFormatCode(midasType);
-    if ( !advanced_properties.use_tc_prec ) {
+    if ( !use_tc_prec ) {
         hcb.setTimeCode(start_ws + start_fs + long(631152000));
     } else {
         LOG_DEBUG(FileWriter_i, "Using TC_PREC keyword in BLUE file header for extra timecode precision.");
@@ -889,12 +2386,19 @@ std::pair<blue::HeaderControlBlock, std::vector<char> > FileWriter_i::createBlue
     hcb.setDataSize(datasize - BLUEFILE_BLOCK_SIZE);
     hcb.setHeaderRep(blue::IEEE); // Note: avoid EEEI headers (EEEI datasets are ok)
 
-    if (swap_bytes) {
+    if (swapped) {
         hcb.setDataRep(blue::EEEI);
     } else {
         hcb.setDataRep(blue::IEEE);
     }
+    return hcb;
+}
 
+/**
+ * Packs the SRI keywords as Midas keywords into buff, padded to a 512 byte
+ * boundary. Returns the size of the keywords before padding.
+ */
+int FileWriter_i::packExtendedHeader(const BULKIO::StreamSRI& sri, std::vector<char> & buff) {
     // Turn SRI keywords to Midas Keywords
     std::set<blue::Keyword> midasKeywords;
     for (int i = 0; i < (int) sri.keywords.length(); ++i) {
@@ -975,7 +2479,6 @@ std::pair<blue::HeaderControlBlock, std::vector<char> > FileWriter_i::createBlue
 
 
     // Add to buffer
-    std::vector<char> buff;
     std::set<blue::Keyword>::iterator it = midasKeywords.begin();
     int lastkeyword = -1;
     for (; it != midasKeywords.end(); ++it) {
@@ -1039,14 +2542,7 @@ std::pair<blue::HeaderControlBlock, std::vector<char> > FileWriter_i::createBlue
 
         buff.insert(buff.end(), newpad, 0);
     }
-    size_t startBlock = size_t(ceil(double(datasize) / double(BLUEFILE_BLOCK_SIZE)));
-    size_t numZeros = startBlock * BLUEFILE_BLOCK_SIZE - datasize;
-    hcb.setExtStart(startBlock);
-    //hcb.setExtSize(static_cast<int> (buff.size()));
-    hcb.setExtSize(static_cast<int> (NN));
-    buff.insert(buff.begin(), numZeros, 0);
-    return std::make_pair(hcb, buff);
-
+    return NN;
 }
 
 size_t FileWriter_i::sizeString_to_longBytes(std::string size) {
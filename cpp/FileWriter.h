@@ -51,20 +51,43 @@
 #include <boost/filesystem/convenience.hpp>
 #include <boost/smart_ptr.hpp>
 #include <boost/make_shared.hpp>
+#include <boost/unordered_map.hpp>
 #include <boost/thread/thread.hpp>
 #include <boost/thread/mutex.hpp>
+#include <boost/thread/shared_mutex.hpp>
+#include <boost/thread/locks.hpp>
 #include <boost/algorithm/string.hpp>
 #include <boost/lexical_cast.hpp>
 #include <HeaderControlBlock.h>
 #include <ExtendedHeader.h>
 #include <MidasKey.h>
 #include <abstracted_file_io.h>
-#include <byte_swap.h>
 #include <boost_compat.h>
+#include "port_feed.h"
+#include "write_behind_queue.h"
+#include "staging_buffer.h"
+#include "local_file.h"
+#include "swap_copy.h"
+#include "basename_template.h"
+#include "file_finisher.h"
+#include "json_format.h"
+#include "time_index.h"
+#include "block_compressor.h"
+#include "crc32c.h"
+#include "performance_statistics.h"
+#include "trace_buffer.h"
 class FileWriter_i;
 
 #define METADATA_EXTENSION ".metadata.xml"
+#define METADATA_JSONL_EXTENSION ".metadata.jsonl"
+#define METADATA_BUFFER_SIZE (64*1024) // smallest write buffer of JSONL metadata
+#define INDEX_EXTENSION ".index"
+#define INDEX_BUFFER_SIZE (64*1024) // write buffer of the time index, a whole number of records
 #define BLUEFILE_BLOCK_SIZE 512   // Exact size of fixed header
+#define FINISHER_MAX_QUEUED_JOBS 1024 // files waiting to be opened or finished in the background
+#define COMPRESSION_BLOCKS_PER_THREAD 2 // blocks of a file in the compressor at once, per compression thread
+#define STREAM_SCHEDULING_QUANTUM (64*1024) // bytes a stream of weight 1 gets per turn with fair_stream_scheduling
+#define SCHEDULING_PORT_TIMEOUT 0.1 // longest wait on a port with fair_stream_scheduling, so that stop() is not held up
 
 namespace FILE_WRITER_DOMAIN_MGR_HELPERS {
 
@@ -93,12 +116,229 @@ enum FILE_TYPES{
     RAW = 0,
     BLUEFILE = 1
 };
+
+enum INPUT_PORTS{
+    CHAR_PORT = 0,
+    OCTET_PORT = 1,
+    SHORT_PORT = 2,
+    USHORT_PORT = 3,
+    FLOAT_PORT = 4,
+    DOUBLE_PORT = 5,
+    XML_PORT = 6,
+    NUM_INPUT_PORTS = 7
+};
+
+/*
+ * Serializes every call made on an abstracted_file_io instance. Each input port
+ * owns one so that ports serviced by their own threads only contend with each
+ * other when they happen to share a file.
+ *
+ * Local files opened with direct_io, a uring_writer or mapped_bytes are
+ * written through their own descriptor (see local_file) rather than through
+ * abstracted_file_io.
+ */
+class locked_file_io {
+    typedef boost::mutex::scoped_lock exclusive_lock;
+    typedef std::map<std::string, boost::shared_ptr<local_file> > local_file_map;
+public:
+    void update_sca_file_manager(CF::FileManager_ptr fileMgr) {
+        exclusive_lock lock(io_lock);
+        io.update_sca_file_manager(fileMgr);
+    }
+    bool exists(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        return io.exists(uri);
+    }
+    size_t file_size(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        return io.file_size(uri);
+    }
+    bool open_file(const std::string& uri, bool create, bool append, bool direct_io = false, uring_writer *uring = NULL, size_t mapped_bytes = 0) {
+        exclusive_lock lock(io_lock);
+        const std::string & prefix = ABSTRACTED_FILE_IO::local_uri_prefix;
+        if ((direct_io || uring || mapped_bytes > 0) && uri.compare(0, prefix.size(), prefix) == 0) {
+            std::string path = uri.substr(prefix.size());
+            boost::shared_ptr<local_file> file(new local_file());
+            if ((mapped_bytes > 0 && file->open(path, append, false, NULL, mapped_bytes)) ||
+                    (mapped_bytes == 0 && direct_io && file->open(path, append, true, uring)) ||
+                    (mapped_bytes == 0 && uring && file->open(path, append, false, uring))) {
+                local_files[uri] = file;
+                return true;
+            }
+        }
+        return io.open_file(uri, create, append);
+    }
+    // True if the file was opened with O_DIRECT
+    bool is_direct(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        return local != local_files.end() && local->second->is_direct();
+    }
+    // True if writes to the file are submitted through io_uring
+    bool is_async(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        return local != local_files.end() && local->second->is_async();
+    }
+    // True if the file is written through a memory mapped window
+    bool is_mapped(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        return local != local_files.end() && local->second->is_mapped();
+    }
+    // Submits the write when the file is written through io_uring, otherwise writes it
+    bool write_async(const std::string& uri, const char* data, size_t size, bool flush, const boost::shared_ptr<void>& owner) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end())
+            return local->second->write_async(data, size, flush, owner);
+        return io.write(uri, const_cast<char*>(data), size, flush);
+    }
+    bool close_file(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end()) {
+            bool success = local->second->close();
+            local_files.erase(local);
+            return success;
+        }
+        return io.close_file(uri);
+    }
+    bool write(const std::string& uri, char* data, size_t size, bool flush) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end())
+            return local->second->write(data, size) && (!flush || local->second->sync());
+        return io.write(uri, data, size, flush);
+    }
+    // Writes at pos without moving the position of the file
+    bool write_at(const std::string& uri, size_t pos, char* data, size_t size, bool flush) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end())
+            return local->second->write_at(pos, data, size) && (!flush || local->second->sync());
+        size_t current = io.file_tell(uri);
+        bool success = io.file_seek(uri, pos) && io.write(uri, data, size, flush);
+        return io.file_seek(uri, current) && success;
+    }
+    bool write(const std::string& uri, std::string* data, bool flush) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end())
+            return local->second->write(data->data(), data->size()) && (!flush || local->second->sync());
+        return io.write(uri, data, flush);
+    }
+    bool read(const std::string& uri, std::vector<char>* buff, size_t size) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end())
+            return local->second->read(buff, size);
+        return io.read(uri, buff, size);
+    }
+    bool file_seek(const std::string& uri, size_t pos) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end()) {
+            local->second->seek(pos);
+            return true;
+        }
+        return io.file_seek(uri, pos);
+    }
+    size_t file_tell(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        local_file_map::iterator local = local_files.find(uri);
+        if (local != local_files.end())
+            return local->second->tell();
+        return io.file_tell(uri);
+    }
+    // Reserves size bytes of disk space for a local file without changing its size
+    bool preallocate(const std::string& uri, size_t size) {
+        const std::string & prefix = ABSTRACTED_FILE_IO::local_uri_prefix;
+        if (uri.compare(0, prefix.size(), prefix) != 0)
+            return false;
+        return local_file::preallocate(uri.substr(prefix.size()), size);
+    }
+    // Gives back the space reserved beyond the end of a closed local file
+    bool release_preallocation(const std::string& uri) {
+        const std::string & prefix = ABSTRACTED_FILE_IO::local_uri_prefix;
+        if (uri.compare(0, prefix.size(), prefix) != 0)
+            return false;
+        return local_file::release_preallocation(uri.substr(prefix.size()));
+    }
+    bool move_file(const std::string& from_uri, const std::string& to_uri) {
+        exclusive_lock lock(io_lock);
+        return io.move_file(from_uri, to_uri);
+    }
+    bool delete_file(const std::string& uri) {
+        exclusive_lock lock(io_lock);
+        return io.delete_file(uri);
+    }
+private:
+    boost::mutex io_lock;
+    ABSTRACTED_FILE_IO::abstracted_file_io io;
+    local_file_map local_files;
+};
+
+/*
+ * Keywords of an SRI packed for the extended header of a Bluefile, shared by
+ * the files that are written with that SRI, so that only the first of them to
+ * close packs the keywords.
+ */
+struct packed_extended_header {
+    packed_extended_header() : packed(false), size(0) {}
+    boost::mutex lock;
+    bool packed;
+    std::vector<char> keywords; // padded to a BLUEFILE_BLOCK_SIZE boundary
+    int size;                   // of the keywords before padding
+};
+
+/*
+ * SRI values that singleService needs for every packet of a stream. They are
+ * parsed when the SRI of the stream changes, rather than searched for in the
+ * keywords of every packet.
+ */
+struct sri_keywords {
+    sri_keywords() : col_rf(0), chan_rf(0), xdelta(0), mode(0) {}
+    std::string stream_id; // STREAM_GROUP if set, otherwise the stream ID
+    double col_rf;         // 0 when not set
+    double chan_rf;        // 0 when not set
+    double xdelta;
+    short mode;
+    boost::shared_ptr<packed_extended_header> extended_header; // new for every SRI
+};
+
+/*
+ * What singleService keeps for each stream of packets, by port name and stream
+ * id of the packets. Only the service thread of the port touches the entries of
+ * its streams, so they stay put while the thread writes with the lock released.
+ */
+struct packet_stream {
+    packet_stream() : statistics(new io_statistics()) {}
+    sri_keywords keywords;
+    boost::shared_ptr<io_statistics> statistics; // performance_statistics of the stream
+};
+
+typedef std::pair<std::string, std::string> packet_stream_key;
+typedef boost::unordered_map<packet_stream_key, packet_stream> packet_stream_map;
+
+// What finish_file() needs of the properties, settled on the service thread by close_file()
+struct file_finish_options {
+    file_finish_options() : force_flush(false), debug_output(false), use_tc_prec(false), swap_bytes(false) {}
+    bool force_flush;
+    bool debug_output;
+    bool use_tc_prec;
+    bool swap_bytes;
+};
+
 struct file_struct{
 	file_struct(std::string uri_full_filename, FILE_TYPES type, double start_ws, double start_fs, bool enable_metadata, bool hidden_tmp_files,
-				const std::string& open_file_extension, const std::string& open_metadata_file_extension, const std::string& file_stream_id)
+				const std::string& open_file_extension, const std::string& open_metadata_file_extension, const std::string& file_stream_id, bool jsonl_metadata = false, bool enable_index = false)
 	{
 		uri_filename = uri_full_filename;
-    	uri_metadata_filename = uri_filename + METADATA_EXTENSION;
+        json_metadata = jsonl_metadata;
+        std::string metadata_extension = json_metadata ? METADATA_JSONL_EXTENSION : METADATA_EXTENSION;
+    	uri_metadata_filename = uri_filename + metadata_extension;
+        uri_index_filename = uri_filename + INDEX_EXTENSION;
     	in_process_uri_filename = "";
     	in_process_uri_metadata_filename = "";
         file_size_internal = 0;
@@ -108,6 +348,17 @@ struct file_struct{
         start_time_fs = start_fs;
         stream_id = file_stream_id;
         midas_type = "";
+        io = NULL;
+        direct_io = false;
+        async_io = false;
+        memory_mapped = false;
+        preallocated = false;
+        closed = false;
+        opened = false;
+        standby = false;
+        opening = false;
+        max_size = 0;
+        checkpoint_size = 0;
 
         boost::filesystem::path uri_path = BOOST_FILESYSTEM_PATH(uri_filename);
         basename = BOOST_PATH_STRING(uri_path.filename());
@@ -117,33 +368,47 @@ struct file_struct{
         // Write to tmp file
         if(hidden_tmp_files){
             in_process_uri_filename = dirname + "/." + basename ;
-            in_process_uri_metadata_filename = dirname + "/." + basename+ METADATA_EXTENSION ;
+            in_process_uri_metadata_filename = dirname + "/." + basename+ metadata_extension ;
+            in_process_uri_index_filename = dirname + "/." + basename + INDEX_EXTENSION;
         }
         else{
             in_process_uri_filename = dirname + "/" + basename;
-            in_process_uri_metadata_filename = dirname + "/" + basename+ METADATA_EXTENSION ;
+            in_process_uri_metadata_filename = dirname + "/" + basename+ metadata_extension ;
+            in_process_uri_index_filename = dirname + "/" + basename + INDEX_EXTENSION;
         }
         if(!open_file_extension.empty())
             in_process_uri_filename += "." + open_file_extension;
         if(!open_metadata_file_extension.empty())
             in_process_uri_metadata_filename += "." + open_metadata_file_extension;
+        if(!open_metadata_file_extension.empty())
+            in_process_uri_index_filename += "." + open_metadata_file_extension;
 
         // Disabling of the metadata file
         if(!enable_metadata){
             uri_metadata_filename = "";
             in_process_uri_metadata_filename = "";
         }
+        if(!enable_index){
+            uri_index_filename = "";
+            in_process_uri_index_filename = "";
+        }
 
 
     };
     bool metdata_file_enabled(){
         return !uri_metadata_filename.empty();
     }
+    bool index_file_enabled() const {
+        return !uri_index_filename.empty();
+    }
     std::string uri_filename;
     std::string uri_metadata_filename;
+    bool json_metadata; // metadata_format JSONL, rather than XML
+    std::string uri_index_filename;
 
     std::string in_process_uri_filename;
     std::string in_process_uri_metadata_filename;
+    std::string in_process_uri_index_filename;
 
     std::string basename;
     std::string dirname;
@@ -154,12 +419,77 @@ struct file_struct{
     double start_time_fs;
     std::string stream_id;
     BULKIO::StreamSRI lastSRI;
+    sri_keywords last_keywords; // parsed from lastSRI
     std::string midas_type;
+    locked_file_io *io;      // filesystem of the port that opened the file
+    bool direct_io;          // the data file was opened with O_DIRECT
+    bool async_io;           // data file writes are submitted through io_uring
+    bool memory_mapped;      // the data file is written through a memory mapped window
+    bool preallocated;       // space was reserved for the data file when it was opened
+    bool closed;             // closed and removed from file_to_struct_mapping
+    file_finish_options finish; // taken by close_file(), once closed
+    bool opened;             // open_data_file() succeeded
+    bool standby;            // left to open_standby_file(), until its stream takes it, guarded by file_lock
+    bool opening;            // being opened with stream_state_lock released, see wait_for_open()
+    unsigned long long max_size; // file_size_internal at which the file rolls over, 0 when unlimited
+    unsigned long long checkpoint_size;       // file_size_internal at the last header checkpoint
+    boost::posix_time::ptime checkpoint_time; // of the last header checkpoint, not_a_date_time before the first
+    boost::mutex file_lock;  // held while writing to or closing the file
+    staging_buffer data_staging;     // write_buffer_size, guarded by file_lock
+    staging_buffer metadata_staging;
+    staging_buffer index_staging;
+    time_index index;        // enable_index_file, guarded by file_lock
+    compressed_file compression; // compression, guarded by file_lock
+    file_digest digest;      // checksum of the bytes written, guarded by file_lock
+};
+
+/*
+ * What singleService keeps for each stream id (the STREAM_GROUP, if any), so
+ * that a packet takes a single lookup to get to its file. The streams of a
+ * group share the file, each holding a reference to it, and num_writers
+ * counts them.
+ */
+struct stream_state {
+    stream_state() {}
+    stream_state(const std::string & filename, const boost::shared_ptr<file_struct> & open_file) :
+        destination_filename(filename), file(open_file) {}
+    std::string destination_filename;
+    boost::shared_ptr<file_struct> file; // may have been closed since, see stream_file()
+};
+
+typedef boost::unordered_map<std::string, stream_state> stream_state_map;
+
+// Files opened ahead of time by the streams that roll over (standby_files), by stream id
+typedef boost::unordered_map<std::string, boost::shared_ptr<file_struct> > standby_file_map;
+
+// How open_data_file() opens a file, settled on the service thread
+struct file_open_options {
+    file_open_options() :
+        append(false), direct_io(false), uring(NULL), memory_mapped(false),
+        write_buffer_bytes(0), metadata_buffer_bytes(0), index_interval(0),
+        compression(COMPRESSION_NONE), compression_level(0), compression_block_bytes(0),
+        checksum(false), checksum_block_bytes(0), force_flush(false), preallocate(false) {}
+    bool append;
+    bool direct_io;
+    uring_writer *uring;
+    bool memory_mapped;
+    size_t write_buffer_bytes;
+    size_t metadata_buffer_bytes;
+    size_t index_interval;
+    compression_codec compression;
+    int compression_level;
+    size_t compression_block_bytes;
+    bool checksum;
+    size_t checksum_block_bytes;
+    bool force_flush;
+    bool preallocate;
 };
 
 
 class FileWriter_i : public FileWriter_base {
     typedef boost::mutex::scoped_lock exclusive_lock;
+    typedef boost::unique_lock<boost::shared_mutex> write_lock;
+    typedef boost::shared_lock<boost::shared_mutex> read_lock;
     ENABLE_LOGGING;
 public:
     FileWriter_i(const char *uuid, const char *label);
@@ -179,29 +509,126 @@ private:
     void advanced_propertiesChanged(const advanced_properties_struct &oldValue, const advanced_properties_struct &newValue);
     void recording_timerChanged(const std::vector<timer_struct_struct> &oldValue, const std::vector<timer_struct_struct> &newValue);
     void construct_recording_timer(const std::vector<timer_struct_struct> &timers);
+    void stream_weightsChanged(const std::vector<stream_weight_struct> &oldValue, const std::vector<stream_weight_struct> &newValue);
+    void set_stream_weights(const std::vector<stream_weight_struct> &weights);
     
     long maxSize;
+    size_t checkpointSize; // header_checkpoint_size
     std::string prop_dirname;
     std::string prop_basename;
+    basename_template prop_basename_template; // prop_basename, compiled by change_uri()
     std::string prop_full_filename;
     std::pair<blue::HeaderControlBlock,std::vector<char> >
-       createBluefilesHeaders(const BULKIO::StreamSRI& sri, size_t datasize, std::string midasType, double start_ws, double start_fs);
+       createBluefilesHeaders(const BULKIO::StreamSRI& sri, size_t datasize, std::string midasType, double start_ws, double start_fs, bool use_tc_prec, bool swapped,
+                              packed_extended_header *extended_header = NULL);
+    int packExtendedHeader(const BULKIO::StreamSRI& sri, std::vector<char> & buff);
+    blue::HeaderControlBlock createBluefileHCB(const BULKIO::StreamSRI& sri, size_t datasize, std::string midasType, double start_ws, double start_fs, bool use_tc_prec, bool swapped);
+    bool header_checkpoint_due(const file_struct & file);
+    void checkpoint_header(file_struct & file);
 
     std::string sri_to_XMLstring(const BULKIO::StreamSRI& sri);
     std::string eos_to_XMLstring(const BULKIO::StreamSRI& sri);
+    std::string sri_to_JSONstring(const BULKIO::StreamSRI& sri, const BULKIO::PrecisionUTCTime & T);
+    std::string eos_to_JSONstring(const BULKIO::StreamSRI& sri, const BULKIO::PrecisionUTCTime & T);
+    std::string checksum_to_XMLstring(const file_digest & digest);
+    std::string checksum_to_JSONstring(const file_digest & digest);
     std::string stream_to_basename(const std::string & stream_id,const BULKIO::StreamSRI& sri, const BULKIO::PrecisionUTCTime &_T, const std::string & extension, const std::string & dt);
-    template <class IN_PORT_TYPE> bool singleService(IN_PORT_TYPE *dataIn, const std::string & dt);
+    template <class IN_PORT_TYPE> bool singleService(IN_PORT_TYPE *dataIn, const std::string & dt, locked_file_io & port_filesystem);
+    template <class IN_PORT_TYPE> void portServiceFunction(port_feed<IN_PORT_TYPE> *feed, const std::string dt, locked_file_io *port_filesystem);
+    template <class IN_PORT_TYPE> void start_port_thread(port_feed<IN_PORT_TYPE> *feed, const std::string & dt, INPUT_PORTS port);
+    void start_port_threads();
+    void stop_port_threads();
+    bool port_threads_active();
+    void start_packet_prefetch();
+    void stop_packet_prefetch();
+    bool packet_prefetch_active();
+    void configure_stream_scheduling();
+    template <class IN_PORT_TYPE> void log_dropped_packets(port_feed<IN_PORT_TYPE> &feed);
+    std::vector<io_statistics_struct> get_performance_statistics();
+    template <class IN_PORT_TYPE> void add_port_statistics(port_feed<IN_PORT_TYPE> &feed, locked_file_io &port_filesystem, std::vector<io_statistics_struct> &statistics);
+    void reset_performance_statistics();
+    io_statistics_struct io_statistics_to_struct(const io_statistics & counters);
+    std::vector<trace_event_struct> get_trace_events();
+    write_behind_statistics_struct get_write_behind_statistics();
+    bool write_data(file_struct & file, const char *data, size_t size, const boost::shared_ptr<void> & owner, size_t swap_width, size_t phase);
+    void write_metadata(file_struct & file, const std::string & metadata);
+    void write_index(file_struct & file, const index_record & record);
+    bool queue_data_write(file_struct & file, const char *data, size_t size, bool flush, const boost::shared_ptr<void> & owner, bool droppable = false);
+    void flush_staged(file_struct & file, bool all);
+    void compress_data(file_struct & file, const char *data, size_t size, size_t swap_width, size_t phase);
+    void submit_compressed_block(file_struct & file);
+    void write_compressed_blocks(file_struct & file, bool all);
+    void finish_compressed_file(file_struct & file);
+    void flush_aged_buffers();
     size_t sizeString_to_longBytes(std::string size);
-    bool close_file(const std::string& filename, const BULKIO::PrecisionUTCTime & timestamp, std::string streamId = "");
-
-    // Ensure that configure() and serviceFunction() are thread safe
-    boost::mutex service_thread_lock;
+    bool close_file(const std::string& filename, const BULKIO::PrecisionUTCTime & timestamp, std::string streamId = "", bool background = false);
+    void finish_file(boost::shared_ptr<file_struct> file, std::string stream_id);
+    file_open_options open_options(bool append);
+    file_finish_options finish_options();
+    bool flush_writes(const file_struct & file);
+    void finisher_error(const std::string & uri, const std::string & error);
+    bool open_data_file(file_struct & fs, const file_open_options & options);
+    bool file_exists(locked_file_io & io, const std::string & filename);
+    bool resolve_existing_file(locked_file_io & io, const std::string & existing_file, bool in_use, std::string & filename);
+    void wait_for_open(exclusive_lock & state_lock, file_struct & file);
+    void file_start_time(const BULKIO::PrecisionUTCTime & T, double & start_ws, double & start_fs);
+    void open_standby(const std::string & stream_id, const file_struct & file, const BULKIO::StreamSRI & sri, const std::string & dt, const BULKIO::PrecisionUTCTime & file_time, size_t element_size);
+    void open_standby_file(boost::shared_ptr<file_struct> fs, file_open_options options);
+    boost::shared_ptr<file_struct> take_standby(const std::string & stream_id, const std::string & filename, const BULKIO::PrecisionUTCTime & file_time);
+    bool claim_standby(file_struct & fs);
+    void discard_standby(boost::shared_ptr<file_struct> fs);
+    void remove_standby_file(boost::shared_ptr<file_struct> fs);
+    boost::shared_ptr<file_struct> stream_file(stream_state & state);
+    void parse_sri_keywords(BULKIO::StreamSRI & sri, sri_keywords & keywords);
+
+    // Ensure that configure() and serviceFunction() are thread safe. Service
+    // threads hold it shared, property changes and stop() hold it exclusively.
+    boost::shared_mutex service_thread_lock;
+    // Guards the stream/file tables, the recording timer and recording_enabled
+    boost::mutex stream_state_lock;
     ABSTRACTED_FILE_IO::abstracted_file_io filesystem;
+    // Submits local file writes when io_uring_queue_depth is set. Declared
+    // ahead of the port filesystems, whose open files refer to it.
+    uring_writer uring;
+    locked_file_io port_filesystems[NUM_INPUT_PORTS];
+    // Carries out data file writes in the background (write_behind_max_memory)
+    write_behind_queue<locked_file_io> write_behind;
+    // Compresses the blocks of compressed files (compression). Declared ahead
+    // of the finisher, which may finish compressed files as it stops.
+    block_compressor compressor;
+    // Opens standby files and finishes closed files in the background
+    // (standby_files, finalizer_threads)
+    file_finisher finisher;
+    // Next time serviceFunction looks for staged data older than write_buffer_max_age
+    boost::posix_time::ptime next_staging_check;
     FILE_TYPES current_writer_type;
 
-
-    std::map<std::string, std::string> stream_to_file_mapping;
-    std::map<std::string, file_struct> file_to_struct_mapping;
+    // Dedicated service threads, one per input port (thread_per_port)
+    std::vector<boost::shared_ptr<boost::thread> > port_threads;
+    boost::mutex port_threads_lock;
+    bool port_threads_running;
+
+    // Every port is serviced through its feed. With input_wait_timeout set, the
+    // feeds prefetch packets and raise packet_ready so the service thread can
+    // block until any port has data.
+    packet_signal packet_ready;
+    port_feed<bulkio::InCharPort> dataChar_feed;
+    port_feed<bulkio::InOctetPort> dataOctet_feed;
+    port_feed<bulkio::InShortPort> dataShort_feed;
+    port_feed<bulkio::InUShortPort> dataUshort_feed;
+    port_feed<bulkio::InFloatPort> dataFloat_feed;
+    port_feed<bulkio::InDoublePort> dataDouble_feed;
+    port_feed<bulkio::InXMLPort> dataXML_feed;
+    bool packet_prefetching;
+    double input_wait; // input_wait_timeout, as of the last start()
+    bool stream_scheduling; // fair_stream_scheduling, as of the last start()
+    // Latest events of the phases of the service threads (trace_buffer_events)
+    trace_buffer tracer;
+
+    stream_state_map stream_states;
+    packet_stream_map packet_streams;
+    standby_file_map standby_files;
+    std::map<std::string, boost::shared_ptr<file_struct> > file_to_struct_mapping;
 
     bool remove_file_from_filesystem(const std::string& filename){
         if(!filename.empty()){
@@ -289,8 +716,24 @@ private:
     }
     std::set<BULKIO::PrecisionUTCTime,utc_time_comp> timer_set;
     std::set<BULKIO::PrecisionUTCTime,utc_time_comp>::iterator timer_set_iter;
+    // The system time timer that timer_deadline_usec is the monotonic_usec() deadline of
+    std::set<BULKIO::PrecisionUTCTime,utc_time_comp>::iterator deadline_timer;
+    uint64_t timer_deadline_usec;
     utc_time_comp utc_time_comp_obj;
-    BULKIO::PrecisionUTCTime timer_timestamp;
+
+    // Part of a packet that is either inside or outside of the recording window
+    struct recording_segment {
+        recording_segment(size_t start_byte, bool recording) :
+            start(start_byte), enabled(recording) {}
+        size_t start;                  // offset in the packet, in bytes
+        bool enabled;
+    };
+    void recording_segments(const BULKIO::PrecisionUTCTime & T, const BULKIO::StreamSRI & sri, size_t elements, size_t element_size, std::vector<recording_segment> & segments);
+    // Packets are only split, into files or recording windows, between units of
+    // whole samples (or frames, with a subsize) that are step seconds apart
+    void split_unit(const BULKIO::StreamSRI & sri, size_t & unit, double & step);
+    BULKIO::PrecisionUTCTime time_at(const BULKIO::PrecisionUTCTime & T, size_t units, double step);
+    unsigned long long rollover_size(const file_struct & file, const BULKIO::StreamSRI & sri, size_t element_size);
 
     inline  BULKIO::PrecisionUTCTime getSystemTimestamp( double additional_time = 0.0 ) {
     		double  whole;
@@ -190,6 +190,39 @@ void FileWriter_base::loadProperties()
                 "external",
                 "property");
 
+    addProperty(stream_weights,
+                "stream_weights",
+                "stream_weights",
+                "readwrite",
+                "",
+                "external",
+                "property");
+
+    addProperty(performance_statistics,
+                "performance_statistics",
+                "performance_statistics",
+                "readonly",
+                "",
+                "external",
+                "property");
+
+    addProperty(trace_events,
+                "trace_events",
+                "trace_events",
+                "readonly",
+                "",
+                "external",
+                "property");
+
+    addProperty(write_behind_statistics,
+                write_behind_statistics_struct(),
+                "write_behind_statistics",
+                "write_behind_statistics",
+                "readonly",
+                "",
+                "external",
+                "property");
+
 }
 
 
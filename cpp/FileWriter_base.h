@@ -63,6 +63,14 @@ class FileWriter_base : public Component, protected ThreadedComponent
         component_status_struct component_status;
         /// Property: recording_timer
         std::vector<timer_struct_struct> recording_timer;
+        /// Property: stream_weights
+        std::vector<stream_weight_struct> stream_weights;
+        /// Property: performance_statistics
+        std::vector<io_statistics_struct> performance_statistics;
+        /// Property: trace_events
+        std::vector<trace_event_struct> trace_events;
+        /// Property: write_behind_statistics
+        write_behind_statistics_struct write_behind_statistics;
 
         // Ports
         /// Port: dataChar_in
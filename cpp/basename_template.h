@@ -0,0 +1,122 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_BASENAME_TEMPLATE_H
+#define FILEWRITER_BASENAME_TEMPLATE_H
+
+#include <string>
+#include <vector>
+
+/*
+ * Basename of destination_uri, split into literal text and the %...% tokens
+ * that are replaced when a file is named. It is compiled once when the URI
+ * changes, so that naming a file takes a single pass and only formats the
+ * values that the name uses.
+ *
+ * Tokens are matched from left to right. Any other %NAME% is left in the
+ * literal text, where it is replaced by the SRI keyword of that ID, if any.
+ */
+class basename_template {
+public:
+    enum token_type {
+        LITERAL,
+        STREAMID,
+        TIMESTAMP,
+        TIMESTAMP_NO_FRACT,
+        SYSTEM_TIMESTAMP,
+        SYSTEM_TIMESTAMP_NO_FRACT,
+        COMP_NS_NAME,
+        EXTENSION,
+        MODE,
+        SR,
+        DT,
+        CF_HZ,
+        COLRF_HZ,
+        CHANRF_HZ
+    };
+
+    struct token {
+        token(token_type token_kind, const std::string &literal = "") :
+            type(token_kind), text(literal), keywords(literal.find('%') != std::string::npos) {}
+        token_type type;
+        std::string text; // of a LITERAL
+        bool keywords;    // text may hold SRI keyword tokens
+    };
+
+    basename_template() : used(0) {}
+
+    void compile(const std::string &basename) {
+        static const struct {
+            const char *name;
+            token_type type;
+        } names[] = {
+            { "%STREAMID%", STREAMID },
+            { "%TIMESTAMP%", TIMESTAMP },
+            { "%TIMESTAMP_NO_FRACT%", TIMESTAMP_NO_FRACT },
+            { "%SYSTEM_TIMESTAMP%", SYSTEM_TIMESTAMP },
+            { "%SYSTEM_TIMESTAMP_NO_FRACT%", SYSTEM_TIMESTAMP_NO_FRACT },
+            { "%COMP_NS_NAME%", COMP_NS_NAME },
+            { "%EXTENSION%", EXTENSION },
+            { "%MODE%", MODE },
+            { "%SR%", SR },
+            { "%DT%", DT },
+            { "%CF_HZ%", CF_HZ },
+            { "%COLRF_HZ%", COLRF_HZ },
+            { "%CHANRF_HZ%", CHANRF_HZ }
+        };
+        const size_t num_names = sizeof(names) / sizeof(names[0]);
+
+        tokens.clear();
+        used = 0;
+        size_t literal_start = 0;
+        size_t pos = 0;
+        while ((pos = basename.find('%', pos)) != std::string::npos) {
+            size_t i = 0;
+            while (i < num_names && basename.compare(pos, std::string(names[i].name).size(), names[i].name) != 0)
+                ++i;
+            if (i == num_names) {
+                ++pos;
+                continue;
+            }
+            add_literal(basename.substr(literal_start, pos - literal_start));
+            tokens.push_back(token(names[i].type));
+            used |= (1u << names[i].type);
+            pos += std::string(names[i].name).size();
+            literal_start = pos;
+        }
+        add_literal(basename.substr(literal_start));
+    }
+
+    bool uses(token_type type) const {
+        return (used & (1u << type)) != 0;
+    }
+
+    std::vector<token> tokens;
+
+private:
+    void add_literal(const std::string &text) {
+        if (!text.empty())
+            tokens.push_back(token(LITERAL, text));
+    }
+
+    unsigned used; // bit per token_type
+};
+
+#endif
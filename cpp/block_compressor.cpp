@@ -0,0 +1,207 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#include "block_compressor.h"
+#include <string.h>
+#include <algorithm>
+#include <boost/bind.hpp>
+#ifdef HAVE_ZSTD
+#include <zstd.h>
+#endif
+#ifdef HAVE_LZ4
+#include <lz4.h>
+#endif
+
+// Compression state of a thread, reused from block to block
+struct block_compressor::context : boost::noncopyable {
+    context() {
+#ifdef HAVE_ZSTD
+        zstd = ZSTD_createCCtx();
+#endif
+    }
+    ~context() {
+#ifdef HAVE_ZSTD
+        ZSTD_freeCCtx(zstd);
+#endif
+    }
+#ifdef HAVE_ZSTD
+    ZSTD_CCtx *zstd;
+#endif
+};
+
+block_compressor::block_compressor() :
+    running(false) {
+}
+
+block_compressor::~block_compressor() {
+    stop();
+}
+
+bool block_compressor::available(compression_codec codec) {
+    switch (codec) {
+#ifdef HAVE_ZSTD
+        case COMPRESSION_ZSTD:
+            return true;
+#endif
+#ifdef HAVE_LZ4
+        case COMPRESSION_LZ4:
+            return true;
+#endif
+        default:
+            return false;
+    }
+}
+
+compression_codec block_compressor::codec_from_string(const std::string &name) {
+    if (name == "ZSTD")
+        return COMPRESSION_ZSTD;
+    if (name == "LZ4")
+        return COMPRESSION_LZ4;
+    return COMPRESSION_NONE;
+}
+
+void block_compressor::start(size_t num_threads) {
+    exclusive_lock lock(queue_lock);
+    if (running)
+        return;
+    running = true;
+    workers.clear();
+    for (size_t i = 0; i < std::max(num_threads, size_t(1)); ++i)
+        workers.push_back(boost::shared_ptr<boost::thread>(new boost::thread(boost::bind(&block_compressor::run, this))));
+}
+
+void block_compressor::stop() {
+    std::vector<boost::shared_ptr<boost::thread> > stopping;
+    {
+        exclusive_lock lock(queue_lock);
+        if (!running)
+            return;
+        running = false;
+        work_cond.notify_all();
+        stopping.swap(workers);
+    }
+    for (size_t i = 0; i < stopping.size(); ++i)
+        stopping[i]->join();
+}
+
+bool block_compressor::active() {
+    exclusive_lock lock(queue_lock);
+    return running;
+}
+
+size_t block_compressor::threads() {
+    exclusive_lock lock(queue_lock);
+    return workers.size();
+}
+
+boost::shared_ptr<compression_job> block_compressor::submit(const staging_buffer::chunk &block, compression_codec codec, int level) {
+    boost::shared_ptr<compression_job> job(new compression_job(block, codec, level));
+    exclusive_lock lock(queue_lock);
+    if (!running) {
+        lock.unlock();
+        context ctx;
+        compress(*job, ctx);
+        job->done = true;
+        return job;
+    }
+    queue.push_back(job);
+    work_cond.notify_one();
+    return job;
+}
+
+void block_compressor::wait(const boost::shared_ptr<compression_job> &job) {
+    exclusive_lock lock(queue_lock);
+    while (!job->done)
+        done_cond.wait(lock);
+}
+
+bool block_compressor::done(const boost::shared_ptr<compression_job> &job) {
+    exclusive_lock lock(queue_lock);
+    return job->done;
+}
+
+void block_compressor::run() {
+    context ctx;
+    exclusive_lock lock(queue_lock);
+    while (true) {
+        while (running && queue.empty())
+            work_cond.wait(lock);
+        if (queue.empty())
+            return;
+        boost::shared_ptr<compression_job> job = queue.front();
+        queue.pop_front();
+        lock.unlock();
+
+        compress(*job, ctx);
+
+        lock.lock();
+        job->done = true;
+        done_cond.notify_all();
+    }
+}
+
+/*
+ * Sets the output of the job to the block header and the block, compressed,
+ * or as is if it does not get any smaller
+ */
+void block_compressor::compress(compression_job &job, context &ctx) {
+    const aligned_buffer &input = *job.input;
+    size_t bound = input.size;
+#ifdef HAVE_ZSTD
+    if (job.codec == COMPRESSION_ZSTD)
+        bound = std::max(bound, size_t(ZSTD_compressBound(input.size)));
+#endif
+#ifdef HAVE_LZ4
+    if (job.codec == COMPRESSION_LZ4)
+        bound = std::max(bound, size_t(LZ4_compressBound(input.size)));
+#endif
+    job.output.reset(new aligned_buffer(sizeof(compressed_block_header) + bound, STAGING_BLOCK_SIZE));
+    char *dest = job.output->data + sizeof(compressed_block_header);
+
+    size_t compressed = 0;
+#ifdef HAVE_ZSTD
+    if (job.codec == COMPRESSION_ZSTD) {
+        size_t result = ZSTD_compressCCtx(ctx.zstd, dest, bound, input.data, input.size, job.level);
+        if (!ZSTD_isError(result))
+            compressed = result;
+    }
+#endif
+#ifdef HAVE_LZ4
+    if (job.codec == COMPRESSION_LZ4) {
+        int result = LZ4_compress_default(input.data, dest, input.size, bound);
+        if (result > 0)
+            compressed = result;
+    }
+#endif
+
+    compressed_block_header header;
+    header.size = input.size;
+    header.flags = 0;
+    header.reserved = 0;
+    if (compressed > 0 && compressed < input.size) {
+        header.stored_size = compressed;
+    } else {
+        header.stored_size = input.size;
+        header.flags = compressed_block_header::STORED;
+        memcpy(dest, input.data, input.size);
+    }
+    memcpy(job.output->data, &header, sizeof(header));
+    job.output->size = sizeof(header) + header.stored_size;
+}
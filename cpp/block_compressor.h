@@ -0,0 +1,166 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_BLOCK_COMPRESSOR_H
+#define FILEWRITER_BLOCK_COMPRESSOR_H
+
+#include <deque>
+#include <string>
+#include <vector>
+#include <stdint.h>
+#include <boost/thread/thread.hpp>
+#include <boost/thread/mutex.hpp>
+#include <boost/thread/condition_variable.hpp>
+#include <boost/smart_ptr.hpp>
+#include <boost/utility.hpp>
+#include "staging_buffer.h"
+
+/*
+ * Compressed files (compression) are a container of blocks that are each
+ * compressed on their own, so that a reader can decompress any block without
+ * the ones before it. All fields are in host byte order:
+ *
+ *   compressed_file_header
+ *   compressed_block_header, then stored_size bytes of block, for every block
+ *   compressed_index_entry for every block
+ *   compressed_file_footer
+ *
+ * A reader finds the index from the footer at the end of the file. A file
+ * that was not closed has no index, but its blocks can still be walked from
+ * the start.
+ */
+enum compression_codec {
+    COMPRESSION_NONE = 0,
+    COMPRESSION_ZSTD = 1,
+    COMPRESSION_LZ4 = 2
+};
+
+#define COMPRESSED_FILE_MAGIC "FWCB"
+#define COMPRESSED_INDEX_MAGIC "FWCI"
+#define COMPRESSED_FILE_VERSION 1
+
+struct compressed_file_header {
+    char magic[4];       // COMPRESSED_FILE_MAGIC
+    uint16_t version;
+    uint16_t codec;      // compression_codec
+    uint32_t block_size; // of the uncompressed blocks, the last one may be shorter
+    uint32_t reserved;
+};
+
+struct compressed_block_header {
+    enum {
+        STORED = 1 // the block did not compress and is stored as is
+    };
+    uint32_t stored_size; // of the block that follows
+    uint32_t size;        // of the block once decompressed
+    uint32_t flags;
+    uint32_t reserved;
+};
+
+struct compressed_index_entry {
+    uint64_t offset;      // of the compressed_block_header in the file
+    uint64_t data_offset; // of the block in the uncompressed data
+};
+
+struct compressed_file_footer {
+    uint64_t index_offset; // of the first compressed_index_entry in the file
+    uint32_t blocks;
+    char magic[4];         // COMPRESSED_INDEX_MAGIC
+};
+
+/*
+ * A block handed to block_compressor, which sets output to the
+ * compressed_block_header and block to write to the file
+ */
+struct compression_job {
+    compression_job(const staging_buffer::chunk &block, compression_codec block_codec, int block_level) :
+        input(block), codec(block_codec), level(block_level), done(false) {}
+    staging_buffer::chunk input;
+    staging_buffer::chunk output;
+    compression_codec codec;
+    int level;
+    bool done;
+};
+
+/*
+ * What a compressed file keeps while it is written, guarded by its file_lock.
+ * Blocks are compressed in parallel, but written in the order they were
+ * submitted.
+ */
+struct compressed_file {
+    compressed_file() : codec(COMPRESSION_NONE), level(0), file_offset(0), data_offset(0) {}
+
+    bool enabled() const {
+        return codec != COMPRESSION_NONE;
+    }
+
+    compression_codec codec;
+    int level;
+    staging_buffer block;  // gathers the data of the next block
+    std::deque<boost::shared_ptr<compression_job> > jobs; // submitted, and yet to be written
+    std::vector<compressed_index_entry> index;             // of the blocks written
+    uint64_t file_offset;  // where the next block is written
+    uint64_t data_offset;  // of the next block in the uncompressed data
+};
+
+/*
+ * Pool of threads that compress the blocks of the compressed files, so that
+ * compression is spread across the processors rather than held to the
+ * service threads.
+ *
+ * Without the library of a codec (zstd or lz4) at build time, available()
+ * is false for it. While stopped, submit() compresses the block right away.
+ */
+class block_compressor : boost::noncopyable {
+    typedef boost::mutex::scoped_lock exclusive_lock;
+public:
+    block_compressor();
+    ~block_compressor();
+
+    static bool available(compression_codec codec);
+    // Parses "ZSTD" or "LZ4", anything else is COMPRESSION_NONE
+    static compression_codec codec_from_string(const std::string &name);
+
+    void start(size_t num_threads);
+    // Compresses every block that was submitted, then stops the threads
+    void stop();
+    bool active();
+    size_t threads();
+
+    boost::shared_ptr<compression_job> submit(const staging_buffer::chunk &block, compression_codec codec, int level);
+    // Waits until the job's block is compressed
+    void wait(const boost::shared_ptr<compression_job> &job);
+    bool done(const boost::shared_ptr<compression_job> &job);
+
+private:
+    struct context;
+
+    void run();
+    static void compress(compression_job &job, context &ctx);
+
+    boost::mutex queue_lock;
+    boost::condition_variable work_cond; // a job was submitted
+    boost::condition_variable done_cond; // a job is done
+    std::deque<boost::shared_ptr<compression_job> > queue;
+    std::vector<boost::shared_ptr<boost::thread> > workers;
+    bool running;
+};
+
+#endif
@@ -0,0 +1,161 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#include "crc32c.h"
+#include <stdio.h>
+#include <string.h>
+
+// SSE 4.2 code is compiled with a target attribute and only run when the
+// processor supports it, which needs gcc 4.9 or later
+#if defined(__x86_64__) && defined(__GNUC__) && (__GNUC__ > 4 || (__GNUC__ == 4 && __GNUC_MINOR__ >= 9))
+#define CRC32C_SSE42
+#include <nmmintrin.h>
+#endif
+
+namespace {
+
+const uint32_t POLYNOMIAL = 0x82f63b78; // reversed Castagnoli polynomial
+
+// Tables to process 8 bytes at a time
+struct crc32c_tables {
+    crc32c_tables() {
+        for (uint32_t i = 0; i < 256; ++i) {
+            uint32_t crc = i;
+            for (int bit = 0; bit < 8; ++bit)
+                crc = (crc >> 1) ^ ((crc & 1) ? POLYNOMIAL : 0);
+            table[0][i] = crc;
+        }
+        for (uint32_t i = 0; i < 256; ++i) {
+            for (int t = 1; t < 8; ++t)
+                table[t][i] = (table[t - 1][i] >> 8) ^ table[0][table[t - 1][i] & 0xff];
+        }
+    }
+    uint32_t table[8][256];
+};
+
+const crc32c_tables tables;
+
+uint32_t crc32c_tables_update(uint32_t crc, const unsigned char *data, size_t length) {
+    const uint32_t (*t)[256] = tables.table;
+    for (; length >= 8; length -= 8, data += 8) {
+        uint32_t low, high;
+        memcpy(&low, data, 4);
+        memcpy(&high, data + 4, 4);
+        // Little endian words
+        low ^= crc;
+        crc = t[7][low & 0xff] ^ t[6][(low >> 8) & 0xff] ^ t[5][(low >> 16) & 0xff] ^ t[4][low >> 24] ^
+              t[3][high & 0xff] ^ t[2][(high >> 8) & 0xff] ^ t[1][(high >> 16) & 0xff] ^ t[0][high >> 24];
+    }
+    for (; length > 0; --length, ++data)
+        crc = (crc >> 8) ^ t[0][(crc ^ *data) & 0xff];
+    return crc;
+}
+
+#ifdef CRC32C_SSE42
+bool detect_sse42() {
+    __builtin_cpu_init();
+    return __builtin_cpu_supports("sse4.2");
+}
+
+const bool sse42 = detect_sse42();
+
+__attribute__((target("sse4.2")))
+uint32_t crc32c_sse42_update(uint32_t crc, const unsigned char *data, size_t length) {
+    uint64_t crc64 = crc;
+    for (; length >= 8; length -= 8, data += 8) {
+        uint64_t word;
+        memcpy(&word, data, 8);
+        crc64 = _mm_crc32_u64(crc64, word);
+    }
+    uint32_t crc32 = (uint32_t) crc64;
+    for (; length > 0; --length, ++data)
+        crc32 = _mm_crc32_u8(crc32, *data);
+    return crc32;
+}
+#endif
+
+// Multiplies vector by the 32x32 matrix over GF(2)
+uint32_t gf2_times(const uint32_t *matrix, uint32_t vector) {
+    uint32_t sum = 0;
+    for (; vector; vector >>= 1, ++matrix) {
+        if (vector & 1)
+            sum ^= *matrix;
+    }
+    return sum;
+}
+
+void gf2_square(uint32_t *square, const uint32_t *matrix) {
+    for (int n = 0; n < 32; ++n)
+        square[n] = gf2_times(matrix, matrix[n]);
+}
+
+}
+
+uint32_t crc32c(uint32_t crc, const char *data, size_t length) {
+    crc = ~crc;
+#ifdef CRC32C_SSE42
+    if (sse42)
+        return ~crc32c_sse42_update(crc, (const unsigned char*) data, length);
+#endif
+    return ~crc32c_tables_update(crc, (const unsigned char*) data, length);
+}
+
+/*
+ * Shifts crc_a over length_b zero bytes, by squaring the operator for one zero
+ * bit, and adds crc_b (the method of zlib's crc32_combine)
+ */
+uint32_t crc32c_combine(uint32_t crc_a, uint32_t crc_b, uint64_t length_b) {
+    if (length_b == 0)
+        return crc_a;
+
+    uint32_t even[32]; // operator for 2^n zero bits
+    uint32_t odd[32];  // operator for 2^(n+1) zero bits
+
+    // Operator for one zero bit
+    odd[0] = POLYNOMIAL;
+    uint32_t row = 1;
+    for (int n = 1; n < 32; ++n) {
+        odd[n] = row;
+        row <<= 1;
+    }
+    gf2_square(even, odd); // two zero bits
+    gf2_square(odd, even); // four zero bits
+
+    // The first squaring below gives the operator for one zero byte
+    do {
+        gf2_square(even, odd);
+        if (length_b & 1)
+            crc_a = gf2_times(even, crc_a);
+        length_b >>= 1;
+        if (length_b == 0)
+            break;
+        gf2_square(odd, even);
+        if (length_b & 1)
+            crc_a = gf2_times(odd, crc_a);
+        length_b >>= 1;
+    } while (length_b != 0);
+    return crc_a ^ crc_b;
+}
+
+std::string crc32c_to_string(uint32_t crc) {
+    char buffer[9];
+    snprintf(buffer, sizeof(buffer), "%08x", crc);
+    return buffer;
+}
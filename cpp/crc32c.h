@@ -0,0 +1,151 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_CRC32C_H
+#define FILEWRITER_CRC32C_H
+
+#include <stddef.h>
+#include <stdint.h>
+#include <string>
+#include <vector>
+
+/*
+ * Extends crc, the CRC32C (Castagnoli) of some data, to cover length more
+ * bytes. The CRC of no data is 0, and crc32c(0, "123456789", 9) is 0xe3069283.
+ *
+ * Uses the SSE 4.2 crc32 instruction when the processor supports it, picked
+ * at run time, and tables otherwise.
+ */
+uint32_t crc32c(uint32_t crc, const char *data, size_t length);
+
+/*
+ * Returns the CRC32C of A followed by B, from the CRC of A, the CRC of B and
+ * the length of B
+ */
+uint32_t crc32c_combine(uint32_t crc_a, uint32_t crc_b, uint64_t length_b);
+
+/*
+ * CRC32C of a file (checksum), computed from the bytes as they are written to
+ * it, and optionally of each block of block_size bytes of the file. The bytes
+ * must be added in file order; the start of the file may be added last, with
+ * prepend(), for a header that is rewritten once the rest of the file is
+ * known.
+ */
+class file_digest {
+public:
+    file_digest() : enabled(false), block_size(0), start(0), crc(0), length(0), block_crc(0), block_length(0), first_block_length(0) {}
+
+    /*
+     * Starts the digest of a file whose bytes are added from offset
+     * start_offset on. A block_size of 0 has no block digests.
+     */
+    void configure(uint64_t block_bytes, uint64_t start_offset) {
+        enabled = true;
+        block_size = block_bytes;
+        start = start_offset;
+        crc = 0;
+        length = 0;
+        block_crc = 0;
+        block_length = 0;
+        first_block_length = 0;
+        blocks.clear();
+    }
+
+    bool active() const {
+        return enabled;
+    }
+
+    void update(const char *data, size_t size) {
+        while (size > 0) {
+            size_t part = size;
+            if (block_size > 0) {
+                uint64_t room = block_size - (start + length + block_length) % block_size;
+                if (room < part)
+                    part = room;
+            }
+            block_crc = crc32c(block_crc, data, part);
+            block_length += part;
+            data += part;
+            size -= part;
+            if (block_size > 0 && (start + length + block_length) % block_size == 0)
+                end_block();
+        }
+    }
+
+    /*
+     * Adds the first start_offset bytes of the file, after the rest. They
+     * must fit in the first block.
+     */
+    void prepend(const char *data, size_t size) {
+        uint32_t prefix = crc32c(0, data, size);
+        if (blocks.empty()) {
+            block_crc = crc32c_combine(prefix, block_crc, block_length);
+            block_length += size;
+        } else {
+            blocks[0] = crc32c_combine(prefix, blocks[0], first_block_length);
+            first_block_length += size;
+            crc = crc32c_combine(prefix, crc, length);
+            length += size;
+        }
+        start -= size;
+    }
+
+    uint32_t value() const {
+        return crc32c_combine(crc, block_crc, block_length);
+    }
+
+    uint64_t size() const {
+        return length + block_length;
+    }
+
+    // Digests of the blocks of the file, the last one cut short by the end of the file
+    std::vector<uint32_t> block_values() const {
+        std::vector<uint32_t> values = blocks;
+        if (block_size > 0 && block_length > 0)
+            values.push_back(block_crc);
+        return values;
+    }
+
+private:
+    void end_block() {
+        if (blocks.empty())
+            first_block_length = block_length;
+        blocks.push_back(block_crc);
+        crc = crc32c_combine(crc, block_crc, block_length);
+        length += block_length;
+        block_crc = 0;
+        block_length = 0;
+    }
+
+    bool enabled;
+    uint64_t block_size;
+    uint64_t start;         // offset in the file of the first byte added
+    uint32_t crc;           // of the blocks that are complete
+    uint64_t length;
+    uint32_t block_crc;     // of the block being added to
+    uint64_t block_length;
+    uint64_t first_block_length;
+    std::vector<uint32_t> blocks;
+};
+
+// Lower case hex digits of a digest
+std::string crc32c_to_string(uint32_t crc);
+
+#endif
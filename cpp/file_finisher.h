@@ -0,0 +1,137 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_FILE_FINISHER_H
+#define FILEWRITER_FILE_FINISHER_H
+
+#include <algorithm>
+#include <exception>
+#include <string>
+#include <boost/function.hpp>
+#include "sharded_pool.h"
+
+struct file_finisher_counters {
+    file_finisher_counters() : queued_jobs(0), peak_queued_jobs(0), jobs(0), blocked_jobs(0), failed_jobs(0) {}
+
+    size_t queued_jobs;        // submitted, and yet to run
+    size_t peak_queued_jobs;
+    unsigned long long jobs;   // run
+    unsigned long long blocked_jobs; // had to wait for room in the queue
+    unsigned long long failed_jobs;  // threw an exception
+};
+
+/*
+ * Pool of background threads that open and finish files off the service
+ * threads, e.g. writing the Bluefile header, renaming and announcing a file
+ * that has been closed. Each job is submitted under the name of the file it
+ * works on, and a file counts as pending until its jobs have run, which lets
+ * the service threads wait for a file before reusing its name.
+ *
+ * At most max_jobs are queued; submit() waits for room beyond that.
+ *
+ * A job that throws is counted in failed_jobs and reported to the error
+ * handler given to start(), from the thread that ran it.
+ *
+ * While stopped, submit() runs the job right away.
+ */
+class file_finisher : public sharded_pool<boost::function<void ()> > {
+public:
+    typedef boost::function<void ()> job;
+    typedef boost::function<void (const std::string &uri, const std::string &error)> error_handler;
+
+    file_finisher() : max_jobs(0) {}
+
+    ~file_finisher() {
+        stop();
+    }
+
+    void start(size_t num_threads, size_t max_queued_jobs, const error_handler &on_error) {
+        exclusive_lock lock(pool_lock);
+        if (running)
+            return;
+        max_jobs = std::max(max_queued_jobs, size_t(1));
+        report = on_error;
+        start_threads(num_threads);
+    }
+
+    void submit(const std::string &uri, const job &work) {
+        exclusive_lock lock(pool_lock);
+        bool blocked = false;
+        while (running && stats.queued_jobs >= max_jobs) {
+            if (!blocked) {
+                stats.blocked_jobs++;
+                blocked = true;
+            }
+            space_cond.wait(lock);
+        }
+        if (!running) {
+            lock.unlock();
+            run_job(uri, work);
+            return;
+        }
+        enqueue(uri, work);
+        stats.queued_jobs++;
+        stats.peak_queued_jobs = std::max(stats.peak_queued_jobs, stats.queued_jobs);
+    }
+
+    file_finisher_counters counters() {
+        exclusive_lock lock(pool_lock);
+        return stats;
+    }
+
+protected:
+    void perform(const std::string &uri, job &work) {
+        run_job(uri, work);
+    }
+
+    void finished(const std::string &, const job &) {
+        stats.queued_jobs--;
+        stats.jobs++;
+    }
+
+private:
+    void run_job(const std::string &uri, const job &work) {
+        try {
+            work();
+            return;
+        } catch (const std::exception &e) {
+            failed(uri, e.what());
+        } catch (...) {
+            failed(uri, "unknown exception");
+        }
+    }
+
+    void failed(const std::string &uri, const std::string &error) {
+        error_handler handler;
+        {
+            exclusive_lock lock(pool_lock);
+            stats.failed_jobs++;
+            handler = report;
+        }
+        if (handler)
+            handler(uri, error);
+    }
+
+    file_finisher_counters stats;
+    size_t max_jobs;
+    error_handler report;
+};
+
+#endif
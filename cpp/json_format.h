@@ -0,0 +1,148 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_JSON_FORMAT_H
+#define FILEWRITER_JSON_FORMAT_H
+
+#include <stdio.h>
+#include <string>
+#include <boost/math/special_functions/fpclassify.hpp>
+#include <ossie/prop_helpers.h>
+
+/*
+ * Appends JSON values to a string, for the JSON lines metadata files
+ * (metadata_format). Values are formatted straight into the string rather
+ * than through a stream.
+ */
+
+inline void json_append_string(std::string &out, const char *value) {
+    static const char hex[] = "0123456789abcdef";
+    out += '"';
+    for (const char *c = value; *c; ++c) {
+        switch (*c) {
+            case '"':  out += "\\\""; break;
+            case '\\': out += "\\\\"; break;
+            case '\n': out += "\\n"; break;
+            case '\r': out += "\\r"; break;
+            case '\t': out += "\\t"; break;
+            default:
+                if ((unsigned char) *c < 0x20) {
+                    out += "\\u00";
+                    out += hex[(*c >> 4) & 0xf];
+                    out += hex[*c & 0xf];
+                } else {
+                    out += *c;
+                }
+        }
+    }
+    out += '"';
+}
+
+inline void json_append_number(std::string &out, double value) {
+    // JSON has no infinity or NaN
+    if (!(boost::math::isfinite)(value)) {
+        out += "null";
+        return;
+    }
+    char buffer[32];
+    snprintf(buffer, sizeof(buffer), "%.17g", value);
+    out += buffer;
+}
+
+inline void json_append_integer(std::string &out, long long value) {
+    char buffer[32];
+    snprintf(buffer, sizeof(buffer), "%lld", value);
+    out += buffer;
+}
+
+/*
+ * Numbers and booleans keep their type; anything else is written as the
+ * string that the XML metadata holds.
+ */
+inline void json_append_any(std::string &out, const CORBA::Any &value) {
+    CORBA::TypeCode_var type = value.type();
+    switch (type->kind()) {
+        case CORBA::tk_boolean: {
+            CORBA::Boolean tmp = false;
+            value >>= CORBA::Any::to_boolean(tmp);
+            out += tmp ? "true" : "false";
+            break;
+        }
+        case CORBA::tk_octet: {
+            CORBA::Octet tmp = 0;
+            value >>= CORBA::Any::to_octet(tmp);
+            json_append_integer(out, tmp);
+            break;
+        }
+        case CORBA::tk_short: {
+            CORBA::Short tmp = 0;
+            value >>= tmp;
+            json_append_integer(out, tmp);
+            break;
+        }
+        case CORBA::tk_ushort: {
+            CORBA::UShort tmp = 0;
+            value >>= tmp;
+            json_append_integer(out, tmp);
+            break;
+        }
+        case CORBA::tk_long: {
+            CORBA::Long tmp = 0;
+            value >>= tmp;
+            json_append_integer(out, tmp);
+            break;
+        }
+        case CORBA::tk_ulong: {
+            CORBA::ULong tmp = 0;
+            value >>= tmp;
+            json_append_integer(out, tmp);
+            break;
+        }
+        case CORBA::tk_longlong: {
+            CORBA::LongLong tmp = 0;
+            value >>= tmp;
+            json_append_integer(out, tmp);
+            break;
+        }
+        case CORBA::tk_ulonglong: {
+            CORBA::ULongLong tmp = 0;
+            value >>= tmp;
+            json_append_number(out, double(tmp));
+            break;
+        }
+        case CORBA::tk_float: {
+            CORBA::Float tmp = 0;
+            value >>= tmp;
+            json_append_number(out, tmp);
+            break;
+        }
+        case CORBA::tk_double: {
+            CORBA::Double tmp = 0;
+            value >>= tmp;
+            json_append_number(out, tmp);
+            break;
+        }
+        default:
+            json_append_string(out, ossie::any_to_string(value).c_str());
+            break;
+    }
+}
+
+#endif
@@ -0,0 +1,355 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_LOCAL_FILE_H
+#define FILEWRITER_LOCAL_FILE_H
+
+#include <fcntl.h>
+#include <unistd.h>
+#include <errno.h>
+#include <stdint.h>
+#include <sys/stat.h>
+#include <sys/mman.h>
+#include <algorithm>
+#include <string.h>
+#include <string>
+#include <vector>
+#include <boost/smart_ptr.hpp>
+#include <boost/utility.hpp>
+#include "uring_writer.h"
+
+#define DIRECT_IO_ALIGNMENT 4096          // covers 512 byte and 4K sector devices
+#define DIRECT_IO_BUFFER_SIZE (1024*1024) // smallest write buffer used with direct_io
+
+#define MMAP_WINDOW_SIZE (64*1024*1024)  // largest span of a file mapped at once with memory_mapped_files
+
+#ifndef FALLOC_FL_KEEP_SIZE
+#define FALLOC_FL_KEEP_SIZE 0x01
+#endif
+
+/*
+ * Local file written through its own descriptor instead of abstracted_file_io,
+ * optionally with O_DIRECT and/or with its writes submitted through io_uring.
+ *
+ * With O_DIRECT, writes that are aligned in memory, size and file position go
+ * straight to the device. Anything else (the Bluefile header, the last partial
+ * block of the file, reads) temporarily clears O_DIRECT on the descriptor,
+ * which the kernel keeps coherent with the direct writes.
+ *
+ * With a uring_writer, write_async() submits the write and returns. Every other
+ * call first waits for the submitted writes to complete.
+ *
+ * A memory mapped file is written by copying the data into a window of the
+ * file mapped in memory, which slides along as the file grows. It is opened
+ * with the number of bytes it will grow by, which bounds both the window and
+ * how far the file is extended, a window at a time; anything written beyond
+ * that goes through write(). The file is cut back to the data written when
+ * closed.
+ * The disk space of each window is allocated before it is mapped, as a store
+ * to a mapped hole that the disk has no room for raises SIGBUS. When the space
+ * cannot be allocated, the rest of the file is written through write().
+ */
+class local_file : boost::noncopyable {
+public:
+    local_file() :
+        fd(-1), position(0), use_direct(false), direct(false), ring(NULL),
+        use_mmap(false), window(NULL), window_size(0), window_offset(0), window_end(0), map_limit(0), file_length(0), data_end(0) {}
+
+    ~local_file() {
+        close();
+    }
+
+    /*
+     * Opens (creating it if needed) the file at path. Fails if o_direct is set
+     * and the file system does not support O_DIRECT, e.g. tmpfs. With
+     * mapped_bytes, the file is memory mapped for that many bytes from where
+     * writing starts.
+     */
+    bool open(const std::string &path, bool append, bool o_direct, uring_writer *uring = NULL, size_t mapped_bytes = 0) {
+        close();
+        int flags = O_RDWR | O_CREAT;
+        if (o_direct)
+            flags |= O_DIRECT;
+        if (!append)
+            flags |= O_TRUNC;
+        fd = ::open(path.c_str(), flags, 0644);
+        if (fd < 0)
+            return false;
+        use_direct = direct = o_direct;
+        ring = uring;
+        position = 0;
+        if (append) {
+            off_t end = ::lseek(fd, 0, SEEK_END);
+            position = (end > 0) ? size_t(end) : 0;
+        }
+        file_length = data_end = position;
+        use_mmap = mapped_bytes > 0;
+        if (use_mmap) {
+            // Window offsets are multiples of the window, so it is a whole number of pages
+            size_t page = ::sysconf(_SC_PAGESIZE);
+            window_size = std::min(size_t(MMAP_WINDOW_SIZE), (mapped_bytes + page - 1) / page * page);
+            map_limit = position + mapped_bytes;
+        }
+        return true;
+    }
+
+    bool is_open() const {
+        return fd >= 0;
+    }
+
+    // Opened with O_DIRECT
+    bool is_direct() const {
+        return use_direct;
+    }
+
+    // Writes are submitted through io_uring
+    bool is_async() const {
+        return ring != NULL;
+    }
+
+    // Written through a memory mapped window
+    bool is_mapped() const {
+        return use_mmap;
+    }
+
+    bool write(const char *data, size_t size) {
+        if (fd < 0)
+            return false;
+        if (use_mmap)
+            return write_mapped(data, size);
+        if (ring)
+            ring->drain(fd);
+        if (!set_direct(use_direct && aligned(data, size)))
+            return false;
+        while (size > 0) {
+            ssize_t written = ::pwrite(fd, data, size, position);
+            if (written < 0) {
+                if (errno == EINTR)
+                    continue;
+                return false;
+            }
+            data += written;
+            size -= written;
+            position += written;
+        }
+        return true;
+    }
+
+    /*
+     * Submits the write through io_uring when possible, keeping owner until it
+     * completes. Otherwise writes synchronously.
+     */
+    bool write_async(const char *data, size_t size, bool datasync, const boost::shared_ptr<void> &owner) {
+        if (fd < 0)
+            return false;
+        if (!ring || (use_direct && !aligned(data, size)))
+            return write(data, size);
+        // Only a synchronous write clears O_DIRECT, and it leaves nothing in flight
+        if (!set_direct(use_direct))
+            return false;
+        if (!ring->write(fd, data, size, position, datasync, owner))
+            return false;
+        position += size;
+        return true;
+    }
+
+    /*
+     * Writes at offset without moving the position of the file, e.g. to patch
+     * a header
+     */
+    bool write_at(size_t offset, const char *data, size_t size) {
+        size_t current = position;
+        position = offset;
+        bool success = write(data, size);
+        position = current;
+        return success;
+    }
+
+    // Flushes the data written so far to the device
+    bool sync() {
+        if (fd < 0)
+            return false;
+        if (ring)
+            ring->drain(fd);
+        // Only the part of the window that holds data has anything to write back
+        if (window != NULL && data_end > window_offset &&
+                ::msync(window, std::min(data_end, window_end) - window_offset, MS_SYNC) != 0)
+            return false;
+        return ::fdatasync(fd) == 0;
+    }
+
+    bool read(std::vector<char> *buff, size_t size) {
+        if (fd < 0)
+            return false;
+        if (ring)
+            ring->drain(fd);
+        if (!set_direct(false))
+            return false;
+        buff->resize(size);
+        ssize_t count = ::pread(fd, &(*buff)[0], size, position);
+        if (count < 0)
+            return false;
+        buff->resize(count);
+        position += count;
+        return true;
+    }
+
+    void seek(size_t pos) {
+        position = pos;
+    }
+
+    size_t tell() const {
+        return position;
+    }
+
+    bool close() {
+        if (fd < 0)
+            return true;
+        bool success = true;
+        if (use_mmap) {
+            unmap_window();
+            // Drop the part of the last window that was never written
+            if (file_length > data_end)
+                success = (::ftruncate(fd, data_end) == 0);
+        }
+        success &= ring ? ring->close(fd) : (::close(fd) == 0);
+        fd = -1;
+        ring = NULL;
+        return success;
+    }
+
+    /*
+     * Allocates disk space for the first size bytes of the file at path,
+     * without changing its size. Works whichever way the file is opened for
+     * writing, since the allocation belongs to the file, not the descriptor.
+     * Fails if the file system does not support fallocate.
+     */
+    static bool preallocate(const std::string &path, size_t size) {
+        int prealloc_fd = ::open(path.c_str(), O_WRONLY);
+        if (prealloc_fd < 0)
+            return false;
+        bool success = (::fallocate(prealloc_fd, FALLOC_FL_KEEP_SIZE, 0, size) == 0);
+        ::close(prealloc_fd);
+        return success;
+    }
+
+    /*
+     * Frees the space allocated beyond the end of the file at path, by
+     * truncating it to its current size.
+     */
+    static bool release_preallocation(const std::string &path) {
+        struct stat st;
+        if (::stat(path.c_str(), &st) != 0)
+            return false;
+        return ::truncate(path.c_str(), st.st_size) == 0;
+    }
+
+private:
+    bool aligned(const char *data, size_t size) const {
+        return (((uintptr_t) data) % DIRECT_IO_ALIGNMENT == 0) && (size % DIRECT_IO_ALIGNMENT == 0) && (position % DIRECT_IO_ALIGNMENT == 0);
+    }
+
+    bool write_mapped(const char *data, size_t size) {
+        while (size > 0) {
+            if (window == NULL || position < window_offset || position >= window_end) {
+                if (!map_window(position))
+                    return stop_mapping() && write(data, size);
+            }
+            size_t length = std::min(size, window_end - position);
+            memcpy(window + (position - window_offset), data, length);
+            data += length;
+            size -= length;
+            position += length;
+            data_end = std::max(data_end, position);
+        }
+        return true;
+    }
+
+    /*
+     * Maps the window of the file holding pos, up to map_limit, extending the
+     * file to cover it. Fails if pos is beyond map_limit, or if the disk space
+     * of the window cannot be allocated, e.g. the disk is full or the file
+     * system does not support fallocate.
+     */
+    bool map_window(size_t pos) {
+        unmap_window();
+        if (pos >= map_limit)
+            return false;
+        window_offset = pos - (pos % window_size);
+        window_end = std::min(window_offset + window_size, map_limit);
+        if (file_length < window_end) {
+            if (::fallocate(fd, 0, file_length, window_end - file_length) != 0)
+                return false;
+            file_length = window_end;
+        }
+        void *mapped = ::mmap(NULL, window_end - window_offset, PROT_READ | PROT_WRITE, MAP_SHARED, fd, window_offset);
+        if (mapped == MAP_FAILED)
+            return false;
+        window = (char*) mapped;
+        ::madvise(window, window_end - window_offset, MADV_SEQUENTIAL);
+        return true;
+    }
+
+    void unmap_window() {
+        if (window == NULL)
+            return;
+        ::munmap(window, window_end - window_offset);
+        window = NULL;
+    }
+
+    // Goes on writing the file through its descriptor, from the end of the data written
+    bool stop_mapping() {
+        unmap_window();
+        use_mmap = false;
+        if (file_length > data_end && ::ftruncate(fd, data_end) != 0)
+            return false;
+        file_length = data_end;
+        return true;
+    }
+
+    bool set_direct(bool enable) {
+        if (enable == direct)
+            return true;
+        int flags = ::fcntl(fd, F_GETFL);
+        if (flags < 0)
+            return false;
+        flags = enable ? (flags | O_DIRECT) : (flags & ~O_DIRECT);
+        if (::fcntl(fd, F_SETFL, flags) < 0)
+            return false;
+        direct = enable;
+        return true;
+    }
+
+    int fd;
+    size_t position;
+    bool use_direct; // opened with O_DIRECT
+    bool direct;     // O_DIRECT is currently set on the descriptor
+    uring_writer *ring;
+    bool use_mmap;
+    char *window;         // mapping of [window_offset, window_end)
+    size_t window_size;   // span of a whole window, up to MMAP_WINDOW_SIZE
+    size_t window_offset;
+    size_t window_end;
+    size_t map_limit;     // end of the part of the file that is mapped
+    size_t file_length;   // length of the file, including the unwritten part of the window
+    size_t data_end;      // end of the data written to the file
+};
+
+#endif
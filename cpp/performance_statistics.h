@@ -0,0 +1,196 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_PERFORMANCE_STATISTICS_H
+#define FILEWRITER_PERFORMANCE_STATISTICS_H
+
+#include <stddef.h>
+#include <stdint.h>
+#include <time.h>
+#include <algorithm>
+#include <boost/utility.hpp>
+
+// Microseconds on the monotonic clock
+inline uint64_t monotonic_usec() {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return uint64_t(now.tv_sec) * 1000000 + now.tv_nsec / 1000;
+}
+
+/*
+ * Counter that any thread may update without a lock. Reads are not
+ * synchronized with each other, so a set of counters read together may be
+ * a few updates apart.
+ */
+class atomic_counter {
+public:
+    atomic_counter() : value(0) {}
+
+    void add(uint64_t amount) {
+        __sync_fetch_and_add(&value, amount);
+    }
+
+    void raise_to(uint64_t amount) {
+        uint64_t current = get();
+        while (amount > current) {
+            uint64_t seen = __sync_val_compare_and_swap(&value, current, amount);
+            if (seen == current)
+                break;
+            current = seen;
+        }
+    }
+
+    uint64_t get() const {
+        return __sync_fetch_and_add(const_cast<volatile uint64_t*>(&value), 0);
+    }
+
+    void reset() {
+        __sync_lock_test_and_set(&value, 0);
+    }
+
+private:
+    volatile uint64_t value;
+};
+
+/*
+ * Histogram of latencies in microseconds, with four buckets for each power of
+ * two, so that a percentile is within a quarter of its value
+ */
+class latency_histogram : boost::noncopyable {
+public:
+    void record(uint64_t usec) {
+        buckets[bucket(usec)].add(1);
+        maximum.raise_to(usec);
+    }
+
+    // Upper bound of the bucket holding the given fraction of the latencies, 0 without any
+    double percentile(double fraction) const {
+        uint64_t counts[BUCKETS];
+        uint64_t total = 0;
+        for (size_t i = 0; i < BUCKETS; ++i) {
+            counts[i] = buckets[i].get();
+            total += counts[i];
+        }
+        if (total == 0)
+            return 0;
+        uint64_t rank = uint64_t(fraction * total + 0.5);
+        if (rank < 1)
+            rank = 1;
+        uint64_t seen = 0;
+        for (size_t i = 0; i < BUCKETS; ++i) {
+            seen += counts[i];
+            if (seen >= rank) {
+                uint64_t upper = (i + 1 < BUCKETS) ? lower_bound(i + 1) - 1 : maximum.get();
+                return double(std::min(upper, maximum.get()));
+            }
+        }
+        return double(maximum.get());
+    }
+
+    double max() const {
+        return double(maximum.get());
+    }
+
+    void reset() {
+        for (size_t i = 0; i < BUCKETS; ++i)
+            buckets[i].reset();
+        maximum.reset();
+    }
+
+private:
+    static const size_t BUCKETS = 252;
+
+    // Values under 4 have a bucket each, then each [2^n, 2^(n+1)) is split in four
+    static size_t bucket(uint64_t usec) {
+        if (usec < 4)
+            return usec;
+        size_t n = 63 - __builtin_clzll(usec);
+        return 4 * (n - 1) + ((usec >> (n - 2)) & 3);
+    }
+
+    static uint64_t lower_bound(size_t index) {
+        if (index < 4)
+            return index;
+        size_t n = index / 4 + 1;
+        return uint64_t(4 + index % 4) << (n - 2);
+    }
+
+    atomic_counter buckets[BUCKETS];
+    atomic_counter maximum;
+};
+
+// What performance_statistics reports for a port, or for a stream on it
+struct io_statistics : boost::noncopyable {
+    void reset() {
+        bytes_written.reset();
+        packets.reset();
+        write_latency.reset();
+        close_usec.reset();
+        rollovers.reset();
+        queue_flushes.reset();
+    }
+
+    atomic_counter bytes_written;
+    atomic_counter packets;
+    latency_histogram write_latency; // of each write of data to a file
+    atomic_counter close_usec;       // spent closing files in the service threads
+    atomic_counter rollovers;        // files closed for reaching max_file_size
+    atomic_counter queue_flushes;    // of the BulkIO queue of the port
+};
+
+// Updates the statistics of a port and of the stream of a packet together
+class packet_statistics {
+public:
+    packet_statistics(io_statistics &port, io_statistics &stream) : port(port), stream(stream) {}
+
+    void packet(bool queue_flushed) {
+        port.packets.add(1);
+        stream.packets.add(1);
+        if (queue_flushed) {
+            port.queue_flushes.add(1);
+            stream.queue_flushes.add(1);
+        }
+    }
+
+    void written(size_t bytes, uint64_t start_usec) {
+        uint64_t usec = monotonic_usec() - start_usec;
+        port.bytes_written.add(bytes);
+        stream.bytes_written.add(bytes);
+        port.write_latency.record(usec);
+        stream.write_latency.record(usec);
+    }
+
+    void closed(uint64_t start_usec) {
+        uint64_t usec = monotonic_usec() - start_usec;
+        port.close_usec.add(usec);
+        stream.close_usec.add(usec);
+    }
+
+    void rolled_over() {
+        port.rollovers.add(1);
+        stream.rollovers.add(1);
+    }
+
+private:
+    io_statistics &port;
+    io_statistics &stream;
+};
+
+#endif
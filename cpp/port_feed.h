@@ -0,0 +1,272 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_PORT_FEED_H
+#define FILEWRITER_PORT_FEED_H
+
+#include <boost/thread/thread.hpp>
+#include <boost/thread/mutex.hpp>
+#include <boost/thread/condition_variable.hpp>
+#include <boost/smart_ptr.hpp>
+#include <boost/bind.hpp>
+#include "stream_scheduler.h"
+#include "performance_statistics.h"
+
+/*
+ * Auto-reset event shared by the port feeds. A feed raises it when it has
+ * prefetched a packet, which lets a single service thread sleep until any one
+ * of the input ports has data instead of polling each of them in turn.
+ */
+class packet_signal {
+    typedef boost::mutex::scoped_lock exclusive_lock;
+public:
+    packet_signal() : ready(false), interrupted(false) {}
+
+    void notify() {
+        exclusive_lock lock(signal_lock);
+        ready = true;
+        signal_cond.notify_all();
+    }
+
+    /*
+     * Waits up to timeout seconds for the signal. Returns true (and resets the
+     * signal) if it was raised, false on timeout or once interrupt() is called.
+     */
+    bool wait(double timeout) {
+        exclusive_lock lock(signal_lock);
+        boost::system_time deadline = boost::get_system_time() + boost::posix_time::microseconds(long(timeout * 1e6));
+        while (!ready && !interrupted) {
+            if (!signal_cond.timed_wait(lock, deadline))
+                break;
+        }
+        bool was_ready = ready && !interrupted;
+        ready = false;
+        return was_ready;
+    }
+
+    // Makes every wait() return immediately until clear() is called (used by stop)
+    void interrupt() {
+        exclusive_lock lock(signal_lock);
+        interrupted = true;
+        signal_cond.notify_all();
+    }
+
+    void clear() {
+        exclusive_lock lock(signal_lock);
+        interrupted = false;
+    }
+
+private:
+    boost::mutex signal_lock;
+    boost::condition_variable signal_cond;
+    bool ready;
+    bool interrupted;
+};
+
+/*
+ * Wraps a BulkIO input port and is serviced in its place. It provides the same
+ * getPacket() call, but can also hold one packet back so the caller can wait
+ * for data without having to process it straight away:
+ *
+ *   - wait() blocks on the port itself (up to a timeout) until a packet is
+ *     available, leaving it pending for the next getPacket() call.
+ *   - start_prefetch() runs a thread that keeps one packet pending at a time
+ *     and raises the shared packet_signal whenever it gets one.
+ *
+ * With scheduling configured (fair_stream_scheduling), the prefetch thread
+ * instead drains the port into a stream_scheduler as fast as packets arrive,
+ * and getPacket() hands them out by stream in turn.
+ *
+ * Only one thread may pull from the port: either the prefetch thread, or
+ * whichever thread services the feed when it is not prefetching.
+ */
+template <class IN_PORT_TYPE>
+class port_feed {
+    typedef boost::mutex::scoped_lock exclusive_lock;
+public:
+    typedef typename IN_PORT_TYPE::dataTransfer dataTransfer;
+
+    port_feed(IN_PORT_TYPE *port, const std::string &port_name, packet_signal *signal) :
+        port(port), port_name(port_name), signal(signal), pending(NULL), prefetching(false), scheduling(false) {}
+
+    ~port_feed() {
+        stop_prefetch();
+        delete pending;
+    }
+
+    /*
+     * Returns the pending packet if there is one. Otherwise, when not
+     * prefetching, gets a packet from the port with the given timeout.
+     */
+    dataTransfer *getPacket(float timeout) {
+        exclusive_lock lock(feed_lock);
+        if (!scheduler.empty()) {
+            dataTransfer *packet = scheduler.pop();
+            // Another packet is waiting, which the prefetch thread will not signal
+            if (!scheduler.empty())
+                signal->notify();
+            return packet;
+        }
+        if (pending == NULL) {
+            if (prefetching)
+                return NULL;
+            lock.unlock();
+            return port->getPacket(timeout);
+        }
+        dataTransfer *packet = pending;
+        pending = NULL;
+        feed_cond.notify_all();
+        return packet;
+    }
+
+    /*
+     * Blocks for up to timeout seconds until a packet is pending. A timeout of
+     * zero only checks the port without waiting.
+     */
+    bool wait(double timeout) {
+        {
+            exclusive_lock lock(feed_lock);
+            if (pending != NULL || !scheduler.empty())
+                return true;
+            if (scheduling && prefetching) {
+                boost::system_time deadline = boost::get_system_time() + boost::posix_time::microseconds(long(timeout * 1e6));
+                while (prefetching && scheduler.empty()) {
+                    if (!feed_cond.timed_wait(lock, deadline))
+                        break;
+                }
+                return !scheduler.empty();
+            }
+        }
+        dataTransfer *packet = port->getPacket(timeout);
+        if (packet == NULL)
+            return false;
+        exclusive_lock lock(feed_lock);
+        pending = packet;
+        return true;
+    }
+
+    /*
+     * With enable, the next start_prefetch() queues packets by stream (see
+     * stream_scheduler). Only called while not prefetching. Packets that are
+     * already queued are handed out either way.
+     */
+    void configure_scheduling(bool enable, size_t max_queued_bytes, size_t quantum) {
+        exclusive_lock lock(feed_lock);
+        if (prefetching)
+            return;
+        scheduling = enable;
+        scheduler.configure(max_queued_bytes, quantum);
+    }
+
+    void set_stream_weights(const std::map<std::string, double> &weights) {
+        exclusive_lock lock(feed_lock);
+        scheduler.set_weights(weights);
+    }
+
+    stream_drop_map dropped_packets() {
+        exclusive_lock lock(feed_lock);
+        return scheduler.drops();
+    }
+
+    const std::string &name() const {
+        return port_name;
+    }
+
+    // Of the packets serviced from the port (performance_statistics)
+    io_statistics &statistics() {
+        return port_statistics;
+    }
+
+    void start_prefetch(double timeout) {
+        exclusive_lock lock(feed_lock);
+        if (prefetching)
+            return;
+        prefetching = true;
+        if (scheduling)
+            prefetch_thread.reset(new boost::thread(boost::bind(&port_feed::drain, this, timeout)));
+        else
+            prefetch_thread.reset(new boost::thread(boost::bind(&port_feed::prefetch, this, timeout)));
+    }
+
+    /*
+     * Stops the prefetch thread, which can take up to the prefetch timeout.
+     * A packet that is still pending, or queued, is kept for the next
+     * getPacket() call.
+     */
+    void stop_prefetch() {
+        {
+            exclusive_lock lock(feed_lock);
+            if (!prefetching)
+                return;
+            prefetching = false;
+            feed_cond.notify_all();
+        }
+        prefetch_thread->join();
+        prefetch_thread.reset();
+    }
+
+private:
+    void prefetch(double timeout) {
+        while (true) {
+            {
+                exclusive_lock lock(feed_lock);
+                while (prefetching && pending != NULL)
+                    feed_cond.wait(lock);
+                if (!prefetching)
+                    return;
+            }
+            if (wait(timeout))
+                signal->notify();
+        }
+    }
+
+    // Moves every packet that arrives on the port into the scheduler
+    void drain(double timeout) {
+        while (true) {
+            {
+                exclusive_lock lock(feed_lock);
+                if (!prefetching)
+                    return;
+            }
+            dataTransfer *packet = port->getPacket(timeout);
+            if (packet == NULL)
+                continue;
+            exclusive_lock lock(feed_lock);
+            scheduler.push(packet);
+            feed_cond.notify_all();
+            lock.unlock();
+            signal->notify();
+        }
+    }
+
+    IN_PORT_TYPE *port;
+    std::string port_name;
+    packet_signal *signal;
+    dataTransfer *pending;
+    bool prefetching;
+    bool scheduling;
+    stream_scheduler<dataTransfer> scheduler;
+    boost::mutex feed_lock;
+    boost::condition_variable feed_cond;
+    boost::scoped_ptr<boost::thread> prefetch_thread;
+    io_statistics port_statistics;
+};
+
+#endif
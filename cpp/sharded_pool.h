@@ -0,0 +1,164 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+
+#ifndef FILEWRITER_SHARDED_POOL_H
+#define FILEWRITER_SHARDED_POOL_H
+
+#include <algorithm>
+#include <deque>
+#include <map>
+#include <string>
+#include <utility>
+#include <vector>
+#include <boost/thread/thread.hpp>
+#include <boost/thread/mutex.hpp>
+#include <boost/thread/condition_variable.hpp>
+#include <boost/functional/hash.hpp>
+#include <boost/smart_ptr.hpp>
+#include <boost/bind.hpp>
+#include <boost/utility.hpp>
+
+/*
+ * Pool of background threads that carry out tasks, each submitted under the
+ * name of the file it works on. Files are sharded across the threads by name,
+ * which keeps the tasks for any one file in the order they were submitted, and
+ * a file counts as pending until its tasks have been carried out.
+ *
+ * A derived class carries out each task in perform(), without pool_lock held,
+ * then accounts for it in finished(), with pool_lock held. Its destructor must
+ * call stop(), while perform() can still be called.
+ */
+template <class TASK>
+class sharded_pool : boost::noncopyable {
+protected:
+    typedef boost::mutex::scoped_lock exclusive_lock;
+
+    sharded_pool() : running(false) {}
+
+    virtual ~sharded_pool() {}
+
+    virtual void perform(const std::string &uri, TASK &task) = 0;
+    virtual void finished(const std::string &uri, const TASK &task) = 0;
+
+    // Called with pool_lock held, while stopped
+    void start_threads(size_t num_threads) {
+        running = true;
+        shards.clear();
+        for (size_t i = 0; i < std::max(num_threads, size_t(1)); ++i) {
+            boost::shared_ptr<shard> s(new shard());
+            s->thread.reset(new boost::thread(boost::bind(&sharded_pool::run, this, s.get())));
+            shards.push_back(s);
+        }
+    }
+
+    // Called with pool_lock held, while running
+    void enqueue(const std::string &uri, const TASK &task) {
+        shard &s = *shard_for(uri);
+        s.tasks.push_back(std::make_pair(uri, task));
+        pending_tasks[uri]++;
+        s.work_cond.notify_one();
+    }
+
+public:
+    /*
+     * Stops the threads once every task that was submitted has been carried out
+     */
+    void stop() {
+        std::vector<boost::shared_ptr<shard> > stopping;
+        {
+            exclusive_lock lock(pool_lock);
+            if (!running)
+                return;
+            running = false;
+            for (size_t i = 0; i < shards.size(); ++i)
+                shards[i]->work_cond.notify_all();
+            stopping = shards;
+        }
+        for (size_t i = 0; i < stopping.size(); ++i)
+            stopping[i]->thread->join();
+        exclusive_lock lock(pool_lock);
+        shards.clear();
+        space_cond.notify_all();
+    }
+
+    bool active() {
+        exclusive_lock lock(pool_lock);
+        return running;
+    }
+
+    // True if a task for uri has yet to be carried out
+    bool pending(const std::string &uri) {
+        exclusive_lock lock(pool_lock);
+        return pending_tasks.find(uri) != pending_tasks.end();
+    }
+
+    /*
+     * Waits until every task submitted so far for uri has been carried out
+     */
+    void wait(const std::string &uri) {
+        exclusive_lock lock(pool_lock);
+        while (pending_tasks.find(uri) != pending_tasks.end())
+            space_cond.wait(lock);
+    }
+
+protected:
+    boost::mutex pool_lock;
+    boost::condition_variable space_cond; // a task has been carried out, or the threads stopped
+    bool running;
+
+private:
+    struct shard {
+        std::deque<std::pair<std::string, TASK> > tasks;
+        boost::condition_variable work_cond;
+        boost::scoped_ptr<boost::thread> thread;
+    };
+
+    boost::shared_ptr<shard> shard_for(const std::string &uri) {
+        return shards[boost::hash<std::string>()(uri) % shards.size()];
+    }
+
+    void run(shard *s) {
+        exclusive_lock lock(pool_lock);
+        while (true) {
+            while (running && s->tasks.empty())
+                s->work_cond.wait(lock);
+            if (s->tasks.empty())
+                return;
+            std::pair<std::string, TASK> next = s->tasks.front();
+            s->tasks.pop_front();
+            lock.unlock();
+
+            perform(next.first, next.second);
+
+            lock.lock();
+            std::map<std::string, size_t>::iterator count = pending_tasks.find(next.first);
+            if (--count->second == 0)
+                pending_tasks.erase(count);
+            finished(next.first, next.second);
+            space_cond.notify_all();
+        }
+    }
+
+    std::vector<boost::shared_ptr<shard> > shards;
+    std::map<std::string, size_t> pending_tasks; // by file name
+};
+
+#endif
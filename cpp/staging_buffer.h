@@ -0,0 +1,159 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_STAGING_BUFFER_H
+#define FILEWRITER_STAGING_BUFFER_H
+
+#include <stdlib.h>
+#include <string.h>
+#include <algorithm>
+#include <new>
+#include <boost/smart_ptr.hpp>
+#include <boost/utility.hpp>
+#include <boost/date_time/posix_time/posix_time.hpp>
+#include "swap_copy.h"
+
+#define STAGING_BLOCK_SIZE 4096
+
+/*
+ * Fixed size chunk of memory aligned to a block boundary
+ */
+struct aligned_buffer : boost::noncopyable {
+    aligned_buffer(size_t buffer_capacity, size_t alignment) : data(NULL), size(0), capacity(buffer_capacity) {
+        void *memory = NULL;
+        if (posix_memalign(&memory, std::max(alignment, sizeof(void*)), std::max(capacity, size_t(1))) != 0)
+            throw std::bad_alloc();
+        data = (char*) memory;
+    }
+    ~aligned_buffer() {
+        free(data);
+    }
+    char *data;
+    size_t size;
+    size_t capacity;
+};
+
+/*
+ * Gathers the small writes made to one file into large ones. Data is handed
+ * back in chunks that end on a block boundary of the file (relative to where
+ * the staged data starts in the file), whatever the packet sizes were. Only a
+ * final flush, or a flush because the data has aged, returns a partial block.
+ */
+class staging_buffer {
+public:
+    typedef boost::shared_ptr<aligned_buffer> chunk;
+
+    staging_buffer() : capacity(0), block_size(1), file_offset(0) {}
+
+    /*
+     * Enables the buffer. offset is the position in the file that the first
+     * staged byte will be written to. A buffer_size of 0 disables staging.
+     */
+    void configure(size_t buffer_size, size_t block, size_t offset) {
+        block_size = std::max(block, size_t(1));
+        capacity = buffer_size ? ((buffer_size + block_size - 1) / block_size) * block_size : 0;
+        file_offset = offset;
+        current.reset();
+    }
+
+    bool enabled() const {
+        return capacity > 0;
+    }
+
+    size_t size() const {
+        return current ? current->size : 0;
+    }
+
+    bool full() const {
+        return enabled() && size() >= capacity;
+    }
+
+    // Seconds since the oldest byte in the buffer was staged
+    double age(const boost::posix_time::ptime &now) const {
+        if (size() == 0)
+            return 0;
+        return (now - first_staged).total_microseconds() / 1e6;
+    }
+
+    /*
+     * Returns how many leading bytes of a write can skip the buffer and go
+     * straight to the file, and accounts for them as written. That is only the
+     * case for whole blocks of a large write while nothing is staged.
+     */
+    size_t bypass(size_t length) {
+        if (!enabled() || size() > 0 || length < capacity || file_offset % block_size != 0)
+            return 0;
+        size_t direct = length - (length % block_size);
+        file_offset += direct;
+        return direct;
+    }
+
+    /*
+     * Copies as much of data as fits and returns the number of bytes copied.
+     * With a swap_width, the bytes of each element are reversed as they are
+     * copied (see swap_copy).
+     */
+    size_t append(const char *data, size_t length, size_t swap_width = 1, size_t phase = 0) {
+        if (!current)
+            current.reset(new aligned_buffer(capacity, STAGING_BLOCK_SIZE));
+        if (current->size == 0)
+            first_staged = boost::posix_time::microsec_clock::universal_time();
+        size_t room = (capacity > current->size) ? capacity - current->size : 0;
+        size_t copied = std::min(room, length);
+        swap_copy(current->data + current->size, data, copied, swap_width, phase);
+        current->size += copied;
+        return copied;
+    }
+
+    /*
+     * Takes the staged data to be written out. Unless all is set, only the part
+     * ending on a block boundary is taken and the rest stays staged. Returns an
+     * empty chunk when there is nothing to write.
+     */
+    chunk take(bool all) {
+        chunk taken;
+        if (size() == 0)
+            return taken;
+        size_t length = current->size;
+        if (!all)
+            length -= (file_offset + length) % block_size;
+        if (length == 0)
+            return taken;
+        taken = current;
+        current.reset();
+        if (length < taken->size) {
+            boost::posix_time::ptime tail_staged = first_staged;
+            append(taken->data + length, taken->size - length);
+            first_staged = tail_staged;
+            taken->size = length;
+        }
+        file_offset += length;
+        return taken;
+    }
+
+private:
+    chunk current;
+    size_t capacity;
+    size_t block_size;
+    size_t file_offset;
+    boost::posix_time::ptime first_staged;
+};
+
+#endif
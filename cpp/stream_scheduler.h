@@ -0,0 +1,232 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_STREAM_SCHEDULER_H
+#define FILEWRITER_STREAM_SCHEDULER_H
+
+#include <deque>
+#include <map>
+#include <string>
+#include <algorithm>
+
+struct stream_drop_counters {
+    stream_drop_counters() : packets(0), bytes(0) {}
+
+    unsigned long long packets;
+    unsigned long long bytes;
+};
+
+typedef std::map<std::string, stream_drop_counters> stream_drop_map;
+
+/*
+ * Queues the packets of a port by stream and hands them out by deficit round
+ * robin, so that each stream with packets waiting gets a share of the bytes
+ * written in proportion to its weight, whatever the rate of the others.
+ *
+ * At most max_bytes are queued. Beyond that, the oldest packets of the
+ * stream holding the most data for its weight are dropped, so that overload
+ * degrades the noisiest stream rather than every stream on the port. EOS
+ * packets are never dropped, and an SRI change carried by a dropped packet
+ * is passed on to the next packet of the stream.
+ *
+ * Not thread safe; port_feed guards it.
+ */
+template <class PACKET>
+class stream_scheduler {
+public:
+    stream_scheduler() : max_bytes(0), quantum(1), queued_bytes(0) {}
+
+    ~stream_scheduler() {
+        clear();
+    }
+
+    // A max_queued_bytes of 0 never drops
+    void configure(size_t max_queued_bytes, size_t quantum_bytes) {
+        max_bytes = max_queued_bytes;
+        quantum = std::max(quantum_bytes, size_t(1));
+    }
+
+    // Streams without a weight have a weight of 1
+    void set_weights(const std::map<std::string, double> &stream_weights) {
+        weights = stream_weights;
+    }
+
+    bool empty() const {
+        return round.empty();
+    }
+
+    void push(PACKET *packet) {
+        stream_queue &queue = streams[packet->streamID];
+        if (queue.sri_pending) {
+            packet->sriChanged = true;
+            queue.sri_pending = false;
+        }
+        size_t size = packet_bytes(packet);
+        queue.packets.push_back(packet);
+        queue.bytes += size;
+        queued_bytes += size;
+        if (!queue.scheduled) {
+            queue.scheduled = true;
+            round.push_back(packet->streamID);
+        }
+        while (max_bytes > 0 && queued_bytes > max_bytes && drop_one());
+    }
+
+    // Returns the next packet to service, or NULL if there is none
+    PACKET *pop() {
+        while (!round.empty()) {
+            typename stream_map::iterator stream = streams.find(round.front());
+            stream_queue &queue = stream->second;
+            if (queue.packets.empty()) {
+                // Every packet of the stream was dropped
+                round.pop_front();
+                retire(stream);
+                continue;
+            }
+            if (!queue.credited) {
+                queue.deficit += quantum * weight(stream->first);
+                queue.credited = true;
+            }
+            PACKET *packet = queue.packets.front();
+            size_t size = packet_bytes(packet);
+            if (queue.deficit < size) {
+                // Its turn is over, the packet waits for the next round
+                queue.credited = false;
+                round.push_back(round.front());
+                round.pop_front();
+                continue;
+            }
+            queue.deficit -= size;
+            queue.packets.pop_front();
+            queue.bytes -= size;
+            queued_bytes -= size;
+            if (queue.packets.empty()) {
+                round.pop_front();
+                retire(stream);
+            }
+            return packet;
+        }
+        return NULL;
+    }
+
+    const stream_drop_map &drops() const {
+        return dropped;
+    }
+
+    void clear() {
+        for (typename stream_map::iterator stream = streams.begin(); stream != streams.end(); ++stream) {
+            for (size_t i = 0; i < stream->second.packets.size(); ++i)
+                delete stream->second.packets[i];
+        }
+        streams.clear();
+        round.clear();
+        queued_bytes = 0;
+    }
+
+private:
+    struct stream_queue {
+        stream_queue() : bytes(0), deficit(0), scheduled(false), credited(false), sri_pending(false) {}
+        std::deque<PACKET*> packets;
+        size_t bytes;
+        double deficit;   // bytes the stream may still take this round
+        bool scheduled;   // in the round
+        bool credited;    // got its quantum for its current turn
+        bool sri_pending; // the next packet carries the SRI change of a dropped one
+    };
+    typedef std::map<std::string, stream_queue> stream_map;
+
+    static size_t packet_bytes(const PACKET *packet) {
+        return packet->dataBuffer.size() * sizeof(packet->dataBuffer[0]);
+    }
+
+    double weight(const std::string &stream_id) const {
+        std::map<std::string, double>::const_iterator found = weights.find(stream_id);
+        if (found == weights.end() || found->second <= 0)
+            return 1.0;
+        return found->second;
+    }
+
+    /*
+     * Takes a stream whose queue ran dry out of the round. It is forgotten,
+     * unless its next packet has to carry the SRI change of a dropped one,
+     * so that streams that come and go do not pile up.
+     */
+    void retire(typename stream_map::iterator stream) {
+        stream_queue &queue = stream->second;
+        if (!queue.sri_pending) {
+            streams.erase(stream);
+            return;
+        }
+        queue.scheduled = false;
+        queue.deficit = 0;
+        queue.credited = false;
+    }
+
+    // Drops the oldest packet of the noisiest stream that has one to drop
+    bool drop_one() {
+        typename stream_map::iterator noisiest = streams.end();
+        double noisiest_share = 0;
+        for (typename stream_map::iterator stream = streams.begin(); stream != streams.end(); ++stream) {
+            double share = stream->second.bytes / weight(stream->first);
+            if (share > noisiest_share && droppable(stream->second) != stream->second.packets.end()) {
+                noisiest = stream;
+                noisiest_share = share;
+            }
+        }
+        if (noisiest == streams.end())
+            return false;
+
+        stream_queue &queue = noisiest->second;
+        typename std::deque<PACKET*>::iterator victim = droppable(queue);
+        PACKET *packet = *victim;
+        victim = queue.packets.erase(victim);
+        if (packet->sriChanged) {
+            if (victim != queue.packets.end())
+                (*victim)->sriChanged = true;
+            else
+                queue.sri_pending = true;
+        }
+        size_t size = packet_bytes(packet);
+        queue.bytes -= size;
+        queued_bytes -= size;
+        stream_drop_counters &counters = dropped[noisiest->first];
+        counters.packets++;
+        counters.bytes += size;
+        delete packet;
+        return true;
+    }
+
+    static typename std::deque<PACKET*>::iterator droppable(stream_queue &queue) {
+        typename std::deque<PACKET*>::iterator packet = queue.packets.begin();
+        while (packet != queue.packets.end() && (*packet)->EOS)
+            ++packet;
+        return packet;
+    }
+
+    size_t max_bytes;
+    size_t quantum;
+    std::map<std::string, double> weights;
+    stream_map streams;
+    std::deque<std::string> round; // streams with packets, in the order they take their turns
+    size_t queued_bytes;
+    stream_drop_map dropped;
+};
+
+#endif
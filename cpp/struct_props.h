@@ -48,6 +48,34 @@ struct advanced_properties_struct {
         open_metadata_file_extension = "inProgress";
         use_tc_prec = true;
         output_filename_case = 0;
+        thread_per_port = false;
+        input_wait_timeout = 0.0;
+        write_behind_max_memory = "0";
+        write_behind_threads = 1;
+        write_behind_overflow = "BLOCK";
+        write_buffer_size = "0";
+        write_buffer_max_age = 1.0;
+        direct_io = false;
+        io_uring_queue_depth = 0;
+        preallocate = false;
+        memory_mapped_files = false;
+        align_max_file_time = false;
+        standby_files = false;
+        finalizer_threads = 0;
+        header_checkpoint_size = "0";
+        header_checkpoint_interval = 0.0;
+        metadata_format = "XML";
+        enable_index_file = false;
+        index_interval = "0";
+        compression = "NONE";
+        compression_level = 0;
+        compression_block_size = "1MB";
+        compression_threads = 0;
+        checksum = "NONE";
+        checksum_block_size = "0";
+        fair_stream_scheduling = false;
+        stream_queue_max_memory = "64MB";
+        trace_buffer_events = 0;
     };
 
     static std::string getId() {
@@ -68,6 +96,34 @@ struct advanced_properties_struct {
     std::string open_metadata_file_extension;
     bool use_tc_prec;
     short output_filename_case;
+    bool thread_per_port;
+    double input_wait_timeout;
+    std::string write_behind_max_memory;
+    CORBA::Long write_behind_threads;
+    std::string write_behind_overflow;
+    std::string write_buffer_size;
+    double write_buffer_max_age;
+    bool direct_io;
+    CORBA::Long io_uring_queue_depth;
+    bool preallocate;
+    bool memory_mapped_files;
+    bool align_max_file_time;
+    bool standby_files;
+    CORBA::Long finalizer_threads;
+    std::string header_checkpoint_size;
+    double header_checkpoint_interval;
+    std::string metadata_format;
+    bool enable_index_file;
+    std::string index_interval;
+    std::string compression;
+    CORBA::Long compression_level;
+    std::string compression_block_size;
+    CORBA::Long compression_threads;
+    std::string checksum;
+    std::string checksum_block_size;
+    bool fair_stream_scheduling;
+    std::string stream_queue_max_memory;
+    CORBA::Long trace_buffer_events;
 };
 
 inline bool operator>>= (const CORBA::Any& a, advanced_properties_struct& s) {
@@ -116,6 +172,90 @@ inline bool operator>>= (const CORBA::Any& a, advanced_properties_struct& s) {
     if (props.contains("advanced_properties::output_filename_case")) {
         if (!(props["advanced_properties::output_filename_case"] >>= s.output_filename_case)) return false;
     }
+    if (props.contains("advanced_properties::thread_per_port")) {
+        if (!(props["advanced_properties::thread_per_port"] >>= s.thread_per_port)) return false;
+    }
+    if (props.contains("advanced_properties::input_wait_timeout")) {
+        if (!(props["advanced_properties::input_wait_timeout"] >>= s.input_wait_timeout)) return false;
+    }
+    if (props.contains("advanced_properties::write_behind_max_memory")) {
+        if (!(props["advanced_properties::write_behind_max_memory"] >>= s.write_behind_max_memory)) return false;
+    }
+    if (props.contains("advanced_properties::write_behind_threads")) {
+        if (!(props["advanced_properties::write_behind_threads"] >>= s.write_behind_threads)) return false;
+    }
+    if (props.contains("advanced_properties::write_behind_overflow")) {
+        if (!(props["advanced_properties::write_behind_overflow"] >>= s.write_behind_overflow)) return false;
+    }
+    if (props.contains("advanced_properties::write_buffer_size")) {
+        if (!(props["advanced_properties::write_buffer_size"] >>= s.write_buffer_size)) return false;
+    }
+    if (props.contains("advanced_properties::write_buffer_max_age")) {
+        if (!(props["advanced_properties::write_buffer_max_age"] >>= s.write_buffer_max_age)) return false;
+    }
+    if (props.contains("advanced_properties::direct_io")) {
+        if (!(props["advanced_properties::direct_io"] >>= s.direct_io)) return false;
+    }
+    if (props.contains("advanced_properties::io_uring_queue_depth")) {
+        if (!(props["advanced_properties::io_uring_queue_depth"] >>= s.io_uring_queue_depth)) return false;
+    }
+    if (props.contains("advanced_properties::preallocate")) {
+        if (!(props["advanced_properties::preallocate"] >>= s.preallocate)) return false;
+    }
+    if (props.contains("advanced_properties::memory_mapped_files")) {
+        if (!(props["advanced_properties::memory_mapped_files"] >>= s.memory_mapped_files)) return false;
+    }
+    if (props.contains("advanced_properties::align_max_file_time")) {
+        if (!(props["advanced_properties::align_max_file_time"] >>= s.align_max_file_time)) return false;
+    }
+    if (props.contains("advanced_properties::standby_files")) {
+        if (!(props["advanced_properties::standby_files"] >>= s.standby_files)) return false;
+    }
+    if (props.contains("advanced_properties::finalizer_threads")) {
+        if (!(props["advanced_properties::finalizer_threads"] >>= s.finalizer_threads)) return false;
+    }
+    if (props.contains("advanced_properties::header_checkpoint_size")) {
+        if (!(props["advanced_properties::header_checkpoint_size"] >>= s.header_checkpoint_size)) return false;
+    }
+    if (props.contains("advanced_properties::header_checkpoint_interval")) {
+        if (!(props["advanced_properties::header_checkpoint_interval"] >>= s.header_checkpoint_interval)) return false;
+    }
+    if (props.contains("advanced_properties::metadata_format")) {
+        if (!(props["advanced_properties::metadata_format"] >>= s.metadata_format)) return false;
+    }
+    if (props.contains("advanced_properties::enable_index_file")) {
+        if (!(props["advanced_properties::enable_index_file"] >>= s.enable_index_file)) return false;
+    }
+    if (props.contains("advanced_properties::index_interval")) {
+        if (!(props["advanced_properties::index_interval"] >>= s.index_interval)) return false;
+    }
+    if (props.contains("advanced_properties::compression")) {
+        if (!(props["advanced_properties::compression"] >>= s.compression)) return false;
+    }
+    if (props.contains("advanced_properties::compression_level")) {
+        if (!(props["advanced_properties::compression_level"] >>= s.compression_level)) return false;
+    }
+    if (props.contains("advanced_properties::compression_block_size")) {
+        if (!(props["advanced_properties::compression_block_size"] >>= s.compression_block_size)) return false;
+    }
+    if (props.contains("advanced_properties::compression_threads")) {
+        if (!(props["advanced_properties::compression_threads"] >>= s.compression_threads)) return false;
+    }
+    if (props.contains("advanced_properties::checksum")) {
+        if (!(props["advanced_properties::checksum"] >>= s.checksum)) return false;
+    }
+    if (props.contains("advanced_properties::checksum_block_size")) {
+        if (!(props["advanced_properties::checksum_block_size"] >>= s.checksum_block_size)) return false;
+    }
+    if (props.contains("advanced_properties::fair_stream_scheduling")) {
+        if (!(props["advanced_properties::fair_stream_scheduling"] >>= s.fair_stream_scheduling)) return false;
+    }
+    if (props.contains("advanced_properties::stream_queue_max_memory")) {
+        if (!(props["advanced_properties::stream_queue_max_memory"] >>= s.stream_queue_max_memory)) return false;
+    }
+    if (props.contains("advanced_properties::trace_buffer_events")) {
+        if (!(props["advanced_properties::trace_buffer_events"] >>= s.trace_buffer_events)) return false;
+    }
     return true;
 }
 
@@ -149,6 +289,62 @@ inline void operator<<= (CORBA::Any& a, const advanced_properties_struct& s) {
     props["advanced_properties::use_tc_prec"] = s.use_tc_prec;
  
     props["advanced_properties::output_filename_case"] = s.output_filename_case;
+ 
+    props["advanced_properties::thread_per_port"] = s.thread_per_port;
+ 
+    props["advanced_properties::input_wait_timeout"] = s.input_wait_timeout;
+ 
+    props["advanced_properties::write_behind_max_memory"] = s.write_behind_max_memory;
+ 
+    props["advanced_properties::write_behind_threads"] = s.write_behind_threads;
+ 
+    props["advanced_properties::write_behind_overflow"] = s.write_behind_overflow;
+ 
+    props["advanced_properties::write_buffer_size"] = s.write_buffer_size;
+ 
+    props["advanced_properties::write_buffer_max_age"] = s.write_buffer_max_age;
+ 
+    props["advanced_properties::direct_io"] = s.direct_io;
+ 
+    props["advanced_properties::io_uring_queue_depth"] = s.io_uring_queue_depth;
+ 
+    props["advanced_properties::preallocate"] = s.preallocate;
+ 
+    props["advanced_properties::memory_mapped_files"] = s.memory_mapped_files;
+ 
+    props["advanced_properties::align_max_file_time"] = s.align_max_file_time;
+ 
+    props["advanced_properties::standby_files"] = s.standby_files;
+ 
+    props["advanced_properties::finalizer_threads"] = s.finalizer_threads;
+ 
+    props["advanced_properties::header_checkpoint_size"] = s.header_checkpoint_size;
+ 
+    props["advanced_properties::header_checkpoint_interval"] = s.header_checkpoint_interval;
+ 
+    props["advanced_properties::metadata_format"] = s.metadata_format;
+ 
+    props["advanced_properties::enable_index_file"] = s.enable_index_file;
+ 
+    props["advanced_properties::index_interval"] = s.index_interval;
+ 
+    props["advanced_properties::compression"] = s.compression;
+ 
+    props["advanced_properties::compression_level"] = s.compression_level;
+ 
+    props["advanced_properties::compression_block_size"] = s.compression_block_size;
+ 
+    props["advanced_properties::compression_threads"] = s.compression_threads;
+ 
+    props["advanced_properties::checksum"] = s.checksum;
+ 
+    props["advanced_properties::checksum_block_size"] = s.checksum_block_size;
+ 
+    props["advanced_properties::fair_stream_scheduling"] = s.fair_stream_scheduling;
+ 
+    props["advanced_properties::stream_queue_max_memory"] = s.stream_queue_max_memory;
+ 
+    props["advanced_properties::trace_buffer_events"] = s.trace_buffer_events;
     a <<= props;
 }
 
@@ -181,6 +377,62 @@ inline bool operator== (const advanced_properties_struct& s1, const advanced_pro
         return false;
     if (s1.output_filename_case!=s2.output_filename_case)
         return false;
+    if (s1.thread_per_port!=s2.thread_per_port)
+        return false;
+    if (s1.input_wait_timeout!=s2.input_wait_timeout)
+        return false;
+    if (s1.write_behind_max_memory!=s2.write_behind_max_memory)
+        return false;
+    if (s1.write_behind_threads!=s2.write_behind_threads)
+        return false;
+    if (s1.write_behind_overflow!=s2.write_behind_overflow)
+        return false;
+    if (s1.write_buffer_size!=s2.write_buffer_size)
+        return false;
+    if (s1.write_buffer_max_age!=s2.write_buffer_max_age)
+        return false;
+    if (s1.direct_io!=s2.direct_io)
+        return false;
+    if (s1.io_uring_queue_depth!=s2.io_uring_queue_depth)
+        return false;
+    if (s1.preallocate!=s2.preallocate)
+        return false;
+    if (s1.memory_mapped_files!=s2.memory_mapped_files)
+        return false;
+    if (s1.align_max_file_time!=s2.align_max_file_time)
+        return false;
+    if (s1.standby_files!=s2.standby_files)
+        return false;
+    if (s1.finalizer_threads!=s2.finalizer_threads)
+        return false;
+    if (s1.header_checkpoint_size!=s2.header_checkpoint_size)
+        return false;
+    if (s1.header_checkpoint_interval!=s2.header_checkpoint_interval)
+        return false;
+    if (s1.metadata_format!=s2.metadata_format)
+        return false;
+    if (s1.enable_index_file!=s2.enable_index_file)
+        return false;
+    if (s1.index_interval!=s2.index_interval)
+        return false;
+    if (s1.compression!=s2.compression)
+        return false;
+    if (s1.compression_level!=s2.compression_level)
+        return false;
+    if (s1.compression_block_size!=s2.compression_block_size)
+        return false;
+    if (s1.compression_threads!=s2.compression_threads)
+        return false;
+    if (s1.checksum!=s2.checksum)
+        return false;
+    if (s1.checksum_block_size!=s2.checksum_block_size)
+        return false;
+    if (s1.fair_stream_scheduling!=s2.fair_stream_scheduling)
+        return false;
+    if (s1.stream_queue_max_memory!=s2.stream_queue_max_memory)
+        return false;
+    if (s1.trace_buffer_events!=s2.trace_buffer_events)
+        return false;
     return true;
 }
 
@@ -201,6 +453,8 @@ struct file_io_message_struct {
     std::string file_operation;
     std::string stream_id;
     std::string filename;
+    std::string checksum;
+    std::string block_checksums;
 };
 
 inline bool operator>>= (const CORBA::Any& a, file_io_message_struct& s) {
@@ -216,6 +470,12 @@ inline bool operator>>= (const CORBA::Any& a, file_io_message_struct& s) {
     if (props.contains("file_io_message::filename")) {
         if (!(props["file_io_message::filename"] >>= s.filename)) return false;
     }
+    if (props.contains("file_io_message::checksum")) {
+        if (!(props["file_io_message::checksum"] >>= s.checksum)) return false;
+    }
+    if (props.contains("file_io_message::block_checksums")) {
+        if (!(props["file_io_message::block_checksums"] >>= s.block_checksums)) return false;
+    }
     return true;
 }
 
@@ -227,6 +487,10 @@ inline void operator<<= (CORBA::Any& a, const file_io_message_struct& s) {
     props["file_io_message::stream_id"] = s.stream_id;
  
     props["file_io_message::filename"] = s.filename;
+ 
+    props["file_io_message::checksum"] = s.checksum;
+ 
+    props["file_io_message::block_checksums"] = s.block_checksums;
     a <<= props;
 }
 
@@ -237,6 +501,10 @@ inline bool operator== (const file_io_message_struct& s1, const file_io_message_
         return false;
     if (s1.filename!=s2.filename)
         return false;
+    if (s1.checksum!=s2.checksum)
+        return false;
+    if (s1.block_checksums!=s2.block_checksums)
+        return false;
     return true;
 }
 
@@ -351,4 +619,367 @@ inline bool operator!= (const timer_struct_struct& s1, const timer_struct_struct
     return !(s1==s2);
 }
 
+struct stream_weight_struct {
+    stream_weight_struct ()
+    {
+        weight = 1;
+    };
+
+    static std::string getId() {
+        return std::string("stream_weights::stream_weight");
+    };
+
+    std::string stream_id;
+    double weight;
+};
+
+inline bool operator>>= (const CORBA::Any& a, stream_weight_struct& s) {
+    CF::Properties* temp;
+    if (!(a >>= temp)) return false;
+    const redhawk::PropertyMap& props = redhawk::PropertyMap::cast(*temp);
+    if (props.contains("stream_weights::stream_id")) {
+        if (!(props["stream_weights::stream_id"] >>= s.stream_id)) return false;
+    }
+    if (props.contains("stream_weights::weight")) {
+        if (!(props["stream_weights::weight"] >>= s.weight)) return false;
+    }
+    return true;
+}
+
+inline void operator<<= (CORBA::Any& a, const stream_weight_struct& s) {
+    redhawk::PropertyMap props;
+ 
+    props["stream_weights::stream_id"] = s.stream_id;
+ 
+    props["stream_weights::weight"] = s.weight;
+    a <<= props;
+}
+
+inline bool operator== (const stream_weight_struct& s1, const stream_weight_struct& s2) {
+    if (s1.stream_id!=s2.stream_id)
+        return false;
+    if (s1.weight!=s2.weight)
+        return false;
+    return true;
+}
+
+inline bool operator!= (const stream_weight_struct& s1, const stream_weight_struct& s2) {
+    return !(s1==s2);
+}
+
+struct io_statistics_struct {
+    io_statistics_struct ()
+    {
+        bytes_written = 0;
+        packets = 0;
+        write_latency_p50 = 0;
+        write_latency_p99 = 0;
+        write_latency_max = 0;
+        close_time = 0;
+        rollovers = 0;
+        queue_flushes = 0;
+        dropped_packets = 0;
+        open_files = 0;
+    };
+
+    static std::string getId() {
+        return std::string("performance_statistics::io_statistics");
+    };
+
+    std::string port;
+    std::string stream_id;
+    CORBA::ULongLong bytes_written;
+    CORBA::ULongLong packets;
+    double write_latency_p50;
+    double write_latency_p99;
+    double write_latency_max;
+    double close_time;
+    CORBA::ULongLong rollovers;
+    CORBA::ULongLong queue_flushes;
+    CORBA::ULongLong dropped_packets;
+    CORBA::ULong open_files;
+};
+
+inline bool operator>>= (const CORBA::Any& a, io_statistics_struct& s) {
+    CF::Properties* temp;
+    if (!(a >>= temp)) return false;
+    const redhawk::PropertyMap& props = redhawk::PropertyMap::cast(*temp);
+    if (props.contains("performance_statistics::port")) {
+        if (!(props["performance_statistics::port"] >>= s.port)) return false;
+    }
+    if (props.contains("performance_statistics::stream_id")) {
+        if (!(props["performance_statistics::stream_id"] >>= s.stream_id)) return false;
+    }
+    if (props.contains("performance_statistics::bytes_written")) {
+        if (!(props["performance_statistics::bytes_written"] >>= s.bytes_written)) return false;
+    }
+    if (props.contains("performance_statistics::packets")) {
+        if (!(props["performance_statistics::packets"] >>= s.packets)) return false;
+    }
+    if (props.contains("performance_statistics::write_latency_p50")) {
+        if (!(props["performance_statistics::write_latency_p50"] >>= s.write_latency_p50)) return false;
+    }
+    if (props.contains("performance_statistics::write_latency_p99")) {
+        if (!(props["performance_statistics::write_latency_p99"] >>= s.write_latency_p99)) return false;
+    }
+    if (props.contains("performance_statistics::write_latency_max")) {
+        if (!(props["performance_statistics::write_latency_max"] >>= s.write_latency_max)) return false;
+    }
+    if (props.contains("performance_statistics::close_time")) {
+        if (!(props["performance_statistics::close_time"] >>= s.close_time)) return false;
+    }
+    if (props.contains("performance_statistics::rollovers")) {
+        if (!(props["performance_statistics::rollovers"] >>= s.rollovers)) return false;
+    }
+    if (props.contains("performance_statistics::queue_flushes")) {
+        if (!(props["performance_statistics::queue_flushes"] >>= s.queue_flushes)) return false;
+    }
+    if (props.contains("performance_statistics::dropped_packets")) {
+        if (!(props["performance_statistics::dropped_packets"] >>= s.dropped_packets)) return false;
+    }
+    if (props.contains("performance_statistics::open_files")) {
+        if (!(props["performance_statistics::open_files"] >>= s.open_files)) return false;
+    }
+    return true;
+}
+
+inline void operator<<= (CORBA::Any& a, const io_statistics_struct& s) {
+    redhawk::PropertyMap props;
+ 
+    props["performance_statistics::port"] = s.port;
+ 
+    props["performance_statistics::stream_id"] = s.stream_id;
+ 
+    props["performance_statistics::bytes_written"] = s.bytes_written;
+ 
+    props["performance_statistics::packets"] = s.packets;
+ 
+    props["performance_statistics::write_latency_p50"] = s.write_latency_p50;
+ 
+    props["performance_statistics::write_latency_p99"] = s.write_latency_p99;
+ 
+    props["performance_statistics::write_latency_max"] = s.write_latency_max;
+ 
+    props["performance_statistics::close_time"] = s.close_time;
+ 
+    props["performance_statistics::rollovers"] = s.rollovers;
+ 
+    props["performance_statistics::queue_flushes"] = s.queue_flushes;
+ 
+    props["performance_statistics::dropped_packets"] = s.dropped_packets;
+ 
+    props["performance_statistics::open_files"] = s.open_files;
+    a <<= props;
+}
+
+inline bool operator== (const io_statistics_struct& s1, const io_statistics_struct& s2) {
+    if (s1.port!=s2.port)
+        return false;
+    if (s1.stream_id!=s2.stream_id)
+        return false;
+    if (s1.bytes_written!=s2.bytes_written)
+        return false;
+    if (s1.packets!=s2.packets)
+        return false;
+    if (s1.write_latency_p50!=s2.write_latency_p50)
+        return false;
+    if (s1.write_latency_p99!=s2.write_latency_p99)
+        return false;
+    if (s1.write_latency_max!=s2.write_latency_max)
+        return false;
+    if (s1.close_time!=s2.close_time)
+        return false;
+    if (s1.rollovers!=s2.rollovers)
+        return false;
+    if (s1.queue_flushes!=s2.queue_flushes)
+        return false;
+    if (s1.dropped_packets!=s2.dropped_packets)
+        return false;
+    if (s1.open_files!=s2.open_files)
+        return false;
+    return true;
+}
+
+inline bool operator!= (const io_statistics_struct& s1, const io_statistics_struct& s2) {
+    return !(s1==s2);
+}
+
+struct trace_event_struct {
+    trace_event_struct ()
+    {
+        thread = 0;
+        start = 0;
+        duration = 0;
+        bytes = 0;
+    };
+
+    static std::string getId() {
+        return std::string("trace_events::trace_event");
+    };
+
+    std::string phase;
+    CORBA::ULong thread;
+    double start;
+    double duration;
+    CORBA::ULongLong bytes;
+};
+
+inline bool operator>>= (const CORBA::Any& a, trace_event_struct& s) {
+    CF::Properties* temp;
+    if (!(a >>= temp)) return false;
+    const redhawk::PropertyMap& props = redhawk::PropertyMap::cast(*temp);
+    if (props.contains("trace_events::phase")) {
+        if (!(props["trace_events::phase"] >>= s.phase)) return false;
+    }
+    if (props.contains("trace_events::thread")) {
+        if (!(props["trace_events::thread"] >>= s.thread)) return false;
+    }
+    if (props.contains("trace_events::start")) {
+        if (!(props["trace_events::start"] >>= s.start)) return false;
+    }
+    if (props.contains("trace_events::duration")) {
+        if (!(props["trace_events::duration"] >>= s.duration)) return false;
+    }
+    if (props.contains("trace_events::bytes")) {
+        if (!(props["trace_events::bytes"] >>= s.bytes)) return false;
+    }
+    return true;
+}
+
+inline void operator<<= (CORBA::Any& a, const trace_event_struct& s) {
+    redhawk::PropertyMap props;
+ 
+    props["trace_events::phase"] = s.phase;
+ 
+    props["trace_events::thread"] = s.thread;
+ 
+    props["trace_events::start"] = s.start;
+ 
+    props["trace_events::duration"] = s.duration;
+ 
+    props["trace_events::bytes"] = s.bytes;
+    a <<= props;
+}
+
+inline bool operator== (const trace_event_struct& s1, const trace_event_struct& s2) {
+    if (s1.phase!=s2.phase)
+        return false;
+    if (s1.thread!=s2.thread)
+        return false;
+    if (s1.start!=s2.start)
+        return false;
+    if (s1.duration!=s2.duration)
+        return false;
+    if (s1.bytes!=s2.bytes)
+        return false;
+    return true;
+}
+
+inline bool operator!= (const trace_event_struct& s1, const trace_event_struct& s2) {
+    return !(s1==s2);
+}
+
+struct write_behind_statistics_struct {
+    write_behind_statistics_struct ()
+    {
+        queued_bytes = 0;
+        peak_queued_bytes = 0;
+        written_bytes = 0;
+        writes = 0;
+        dropped_bytes = 0;
+        dropped_writes = 0;
+        blocked_writes = 0;
+        failed_writes = 0;
+    };
+
+    static std::string getId() {
+        return std::string("write_behind_statistics");
+    };
+
+    CORBA::ULongLong queued_bytes;
+    CORBA::ULongLong peak_queued_bytes;
+    CORBA::ULongLong written_bytes;
+    CORBA::ULongLong writes;
+    CORBA::ULongLong dropped_bytes;
+    CORBA::ULongLong dropped_writes;
+    CORBA::ULongLong blocked_writes;
+    CORBA::ULongLong failed_writes;
+};
+
+inline bool operator>>= (const CORBA::Any& a, write_behind_statistics_struct& s) {
+    CF::Properties* temp;
+    if (!(a >>= temp)) return false;
+    const redhawk::PropertyMap& props = redhawk::PropertyMap::cast(*temp);
+    if (props.contains("write_behind_statistics::queued_bytes")) {
+        if (!(props["write_behind_statistics::queued_bytes"] >>= s.queued_bytes)) return false;
+    }
+    if (props.contains("write_behind_statistics::peak_queued_bytes")) {
+        if (!(props["write_behind_statistics::peak_queued_bytes"] >>= s.peak_queued_bytes)) return false;
+    }
+    if (props.contains("write_behind_statistics::written_bytes")) {
+        if (!(props["write_behind_statistics::written_bytes"] >>= s.written_bytes)) return false;
+    }
+    if (props.contains("write_behind_statistics::writes")) {
+        if (!(props["write_behind_statistics::writes"] >>= s.writes)) return false;
+    }
+    if (props.contains("write_behind_statistics::dropped_bytes")) {
+        if (!(props["write_behind_statistics::dropped_bytes"] >>= s.dropped_bytes)) return false;
+    }
+    if (props.contains("write_behind_statistics::dropped_writes")) {
+        if (!(props["write_behind_statistics::dropped_writes"] >>= s.dropped_writes)) return false;
+    }
+    if (props.contains("write_behind_statistics::blocked_writes")) {
+        if (!(props["write_behind_statistics::blocked_writes"] >>= s.blocked_writes)) return false;
+    }
+    if (props.contains("write_behind_statistics::failed_writes")) {
+        if (!(props["write_behind_statistics::failed_writes"] >>= s.failed_writes)) return false;
+    }
+    return true;
+}
+
+inline void operator<<= (CORBA::Any& a, const write_behind_statistics_struct& s) {
+    redhawk::PropertyMap props;
+ 
+    props["write_behind_statistics::queued_bytes"] = s.queued_bytes;
+ 
+    props["write_behind_statistics::peak_queued_bytes"] = s.peak_queued_bytes;
+ 
+    props["write_behind_statistics::written_bytes"] = s.written_bytes;
+ 
+    props["write_behind_statistics::writes"] = s.writes;
+ 
+    props["write_behind_statistics::dropped_bytes"] = s.dropped_bytes;
+ 
+    props["write_behind_statistics::dropped_writes"] = s.dropped_writes;
+ 
+    props["write_behind_statistics::blocked_writes"] = s.blocked_writes;
+ 
+    props["write_behind_statistics::failed_writes"] = s.failed_writes;
+    a <<= props;
+}
+
+inline bool operator== (const write_behind_statistics_struct& s1, const write_behind_statistics_struct& s2) {
+    if (s1.queued_bytes!=s2.queued_bytes)
+        return false;
+    if (s1.peak_queued_bytes!=s2.peak_queued_bytes)
+        return false;
+    if (s1.written_bytes!=s2.written_bytes)
+        return false;
+    if (s1.writes!=s2.writes)
+        return false;
+    if (s1.dropped_bytes!=s2.dropped_bytes)
+        return false;
+    if (s1.dropped_writes!=s2.dropped_writes)
+        return false;
+    if (s1.blocked_writes!=s2.blocked_writes)
+        return false;
+    if (s1.failed_writes!=s2.failed_writes)
+        return false;
+    return true;
+}
+
+inline bool operator!= (const write_behind_statistics_struct& s1, const write_behind_statistics_struct& s2) {
+    return !(s1==s2);
+}
+
 #endif // STRUCTPROPS_H
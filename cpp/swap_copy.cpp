@@ -0,0 +1,182 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#include "swap_copy.h"
+#include <string.h>
+#include <algorithm>
+
+#ifdef __SSE2__
+#include <emmintrin.h>
+#endif
+
+// AVX2 code is compiled with a target attribute and only run when the
+// processor supports it, which needs gcc 4.9 or later
+#if (defined(__x86_64__) || defined(__i386__)) && defined(__GNUC__) && (__GNUC__ > 4 || (__GNUC__ == 4 && __GNUC_MINOR__ >= 9))
+#define SWAP_COPY_AVX2
+#include <immintrin.h>
+#endif
+
+namespace {
+
+enum simd_level {
+    SIMD_NONE,
+    SIMD_SSE2,
+    SIMD_AVX2
+};
+
+simd_level detect_simd() {
+#ifdef SWAP_COPY_AVX2
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx2"))
+        return SIMD_AVX2;
+#endif
+#ifdef __SSE2__
+    return SIMD_SSE2;
+#else
+    return SIMD_NONE;
+#endif
+}
+
+const simd_level simd = detect_simd();
+
+template <size_t WIDTH> void swap_elements_scalar(char *dest, const char *src, size_t count) {
+    for (; count > 0; --count, dest += WIDTH, src += WIDTH) {
+        for (size_t i = 0; i < WIDTH; ++i)
+            dest[i] = src[WIDTH - 1 - i];
+    }
+}
+
+#ifdef __SSE2__
+// SSE2 has no byte shuffle: swap the 16 bit words with shuffles, then the
+// bytes of each word with shifts
+inline __m128i swap_bytes_in_words(__m128i x) {
+    return _mm_or_si128(_mm_slli_epi16(x, 8), _mm_srli_epi16(x, 8));
+}
+
+template <size_t WIDTH> __m128i swap_vector_sse2(__m128i x);
+
+template <> inline __m128i swap_vector_sse2<2>(__m128i x) {
+    return swap_bytes_in_words(x);
+}
+
+template <> inline __m128i swap_vector_sse2<4>(__m128i x) {
+    x = _mm_shufflelo_epi16(x, _MM_SHUFFLE(2, 3, 0, 1));
+    x = _mm_shufflehi_epi16(x, _MM_SHUFFLE(2, 3, 0, 1));
+    return swap_bytes_in_words(x);
+}
+
+template <> inline __m128i swap_vector_sse2<8>(__m128i x) {
+    x = _mm_shufflelo_epi16(x, _MM_SHUFFLE(0, 1, 2, 3));
+    x = _mm_shufflehi_epi16(x, _MM_SHUFFLE(0, 1, 2, 3));
+    return swap_bytes_in_words(x);
+}
+
+// Returns the number of elements copied, a multiple of what fits in a vector
+template <size_t WIDTH> size_t swap_elements_sse2(char *dest, const char *src, size_t count) {
+    size_t bytes = (count * WIDTH) & ~size_t(15);
+    for (size_t i = 0; i < bytes; i += 16) {
+        __m128i x = _mm_loadu_si128((const __m128i*) (src + i));
+        _mm_storeu_si128((__m128i*) (dest + i), swap_vector_sse2<WIDTH>(x));
+    }
+    return bytes / WIDTH;
+}
+#endif
+
+#ifdef SWAP_COPY_AVX2
+// Byte i of each 128 bit lane comes from byte i ^ (WIDTH - 1)
+template <size_t WIDTH> struct avx2_shuffle {
+    avx2_shuffle() {
+        for (int i = 0; i < 32; ++i)
+            mask[i] = char((i % 16) ^ (WIDTH - 1));
+    }
+    char mask[32];
+};
+
+__attribute__((target("avx2")))
+size_t swap_bytes_avx2(char *dest, const char *src, size_t length, const char *shuffle) {
+    __m256i mask = _mm256_loadu_si256((const __m256i*) shuffle);
+    size_t bytes = length & ~size_t(31);
+    for (size_t i = 0; i < bytes; i += 32) {
+        __m256i x = _mm256_loadu_si256((const __m256i*) (src + i));
+        _mm256_storeu_si256((__m256i*) (dest + i), _mm256_shuffle_epi8(x, mask));
+    }
+    return bytes;
+}
+#endif
+
+template <size_t WIDTH> void swap_elements(char *dest, const char *src, size_t count) {
+    size_t done = 0;
+#ifdef SWAP_COPY_AVX2
+    static const avx2_shuffle<WIDTH> shuffle;
+    if (simd == SIMD_AVX2)
+        done = swap_bytes_avx2(dest, src, count * WIDTH, shuffle.mask) / WIDTH;
+#endif
+#ifdef __SSE2__
+    if (simd == SIMD_SSE2)
+        done = swap_elements_sse2<WIDTH>(dest, src, count);
+#endif
+    swap_elements_scalar<WIDTH>(dest + done * WIDTH, src + done * WIDTH, count - done);
+}
+
+template <size_t WIDTH> void swap_copy_width(char *dest, const char *data, size_t length, size_t phase) {
+    phase %= WIDTH;
+    // Rest of the element split at the start of data
+    if (phase > 0 && length > 0) {
+        char element[WIDTH];
+        swap_elements_scalar<WIDTH>(element, data - phase, 1);
+        size_t head = std::min(length, WIDTH - phase);
+        memcpy(dest, element + phase, head);
+        dest += head;
+        data += head;
+        length -= head;
+    }
+
+    size_t count = length / WIDTH;
+    swap_elements<WIDTH>(dest, data, count);
+    dest += count * WIDTH;
+    data += count * WIDTH;
+    length -= count * WIDTH;
+
+    // Start of the element split at the end of data
+    if (length > 0) {
+        char element[WIDTH];
+        swap_elements_scalar<WIDTH>(element, data, 1);
+        memcpy(dest, element, length);
+    }
+}
+
+}
+
+void swap_copy(char *dest, const char *data, size_t length, size_t width, size_t phase) {
+    switch (width) {
+        case 2:
+            swap_copy_width<2>(dest, data, length, phase);
+            break;
+        case 4:
+            swap_copy_width<4>(dest, data, length, phase);
+            break;
+        case 8:
+            swap_copy_width<8>(dest, data, length, phase);
+            break;
+        default:
+            memcpy(dest, data, length);
+            break;
+    }
+}
@@ -0,0 +1,40 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_SWAP_COPY_H
+#define FILEWRITER_SWAP_COPY_H
+
+#include <stddef.h>
+
+/*
+ * Copies length bytes from data to dest, reversing the byte order of each
+ * element of width bytes (2, 4 or 8; any other width is a plain copy).
+ *
+ * data does not have to start on an element: phase is the offset of data
+ * within its element, so that a packet can be copied in pieces that split
+ * elements. The bytes of a split element that fall outside of
+ * [data, data + length) are read, but not copied.
+ *
+ * The bulk of the copy is vectorized with AVX2 or SSE2, picked at run time
+ * from what the processor supports.
+ */
+void swap_copy(char *dest, const char *data, size_t length, size_t width, size_t phase = 0);
+
+#endif
@@ -0,0 +1,119 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_TIME_INDEX_H
+#define FILEWRITER_TIME_INDEX_H
+
+#include <stddef.h>
+#include <stdint.h>
+#include <math.h>
+
+/*
+ * Record of an index file (enable_index_file), in host byte order. Each
+ * record covers a run of samples that are contiguous in the data file and in
+ * time, so that a reader can find the data of a given time with a binary
+ * search, and sees the gaps in the timestamps as a new record.
+ */
+struct index_record {
+    enum {
+        SRI_CHANGED = 1 // the run starts with a new SRI
+    };
+    double twsec;     // time of the first sample of the run
+    double tfsec;
+    uint64_t offset;  // of the first sample of the run in the data file, in bytes
+    uint32_t samples; // in the run (complex samples count once)
+    uint32_t flags;
+};
+
+/*
+ * Builds the index_records of a file out of the writes to it. Writes are
+ * gathered into the current record as long as they follow on from it in time,
+ * with the same SRI, and the record covers less than interval bytes. Data that
+ * is not written (a write dropped by the write-behind queue) leaves a gap in
+ * time, which starts a new record. An interval of 0 makes a record of every write.
+ */
+class time_index {
+public:
+    time_index() : interval(0), next_offset(0), step(0), bytes(0), has_pending(false) {}
+
+    /*
+     * data_start is where the next data written to the file goes
+     */
+    void configure(size_t interval_bytes, uint64_t data_start) {
+        interval = interval_bytes;
+        next_offset = data_start;
+        has_pending = false;
+    }
+
+    /*
+     * Adds a write of samples (size bytes) that follows the last one added in
+     * the file, whose first sample is at twsec + tfsec, xdelta apart. Only
+     * data that is actually written is added. Returns true if it ends the
+     * current record, which is copied to done.
+     */
+    bool add(double twsec, double tfsec, uint32_t samples, size_t size, double xdelta, bool sri_changed, index_record &done) {
+        uint64_t offset = next_offset;
+        next_offset += size;
+        if (has_pending && !sri_changed && xdelta == step &&
+                interval != 0 && bytes < interval && follows(twsec, tfsec)) {
+            pending.samples += samples;
+            bytes += size;
+            return false;
+        }
+        bool ended = finish(done);
+        pending.twsec = twsec;
+        pending.tfsec = tfsec;
+        pending.offset = offset;
+        pending.samples = samples;
+        pending.flags = sri_changed ? index_record::SRI_CHANGED : 0;
+        step = xdelta;
+        bytes = size;
+        has_pending = true;
+        return ended;
+    }
+
+    /*
+     * Ends the current record, if any, copying it to done
+     */
+    bool finish(index_record &done) {
+        if (!has_pending)
+            return false;
+        done = pending;
+        has_pending = false;
+        return true;
+    }
+
+private:
+    // True if twsec + tfsec is the time of the sample after the current record, to half a sample
+    bool follows(double twsec, double tfsec) const {
+        // Whole and fractional seconds are subtracted apart to keep the precision
+        double gap = (twsec - pending.twsec) + (tfsec - pending.tfsec) - pending.samples * step;
+        return fabs(gap) <= step / 2;
+    }
+
+    size_t interval;
+    uint64_t next_offset; // of the next write in the file
+    double step;
+    size_t bytes; // covered by the pending record
+    bool has_pending;
+    index_record pending;
+};
+
+#endif
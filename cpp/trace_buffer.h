@@ -0,0 +1,171 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_TRACE_BUFFER_H
+#define FILEWRITER_TRACE_BUFFER_H
+
+#include <stddef.h>
+#include <stdint.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+#include <vector>
+#include <boost/thread/mutex.hpp>
+#include <boost/utility.hpp>
+#include "performance_statistics.h"
+#ifdef HAVE_SYS_SDT_H
+#include <sys/sdt.h>
+#endif
+
+/*
+ * Phases of the service of a packet that are traced. The numbers are the
+ * first argument of the filewriter:phase__start and filewriter:phase__done
+ * SDT probes.
+ */
+enum trace_phase {
+    TRACE_TIMER = 0,    // recording_timer windows of the packet
+    TRACE_BASENAME = 1, // name of a new file
+    TRACE_OPEN = 2,     // opening a data file
+    TRACE_COPY = 3,     // copying data into a staging buffer
+    TRACE_SWAP = 4,     // byte swapping data (swap_bytes)
+    TRACE_WRITE = 5,    // handing data to the file
+    TRACE_METADATA = 6, // writing to a metadata file
+    TRACE_CLOSE = 7     // closing a file
+};
+
+inline const char *trace_phase_name(trace_phase phase) {
+    static const char *names[] = {"TIMER", "BASENAME", "OPEN", "COPY", "SWAP", "WRITE", "METADATA", "CLOSE"};
+    return names[phase];
+}
+
+struct trace_event {
+    uint64_t start_usec; // monotonic_usec() at the start of the phase
+    uint64_t usec;
+    uint64_t bytes;      // of data, for the phases that handle data
+    uint32_t phase;      // trace_phase
+    uint32_t thread;     // Linux thread ID
+};
+
+/*
+ * Ring buffer of the latest trace events (trace_buffer_events). Any thread
+ * records without a lock, overwriting the oldest event; a reader skips the
+ * events that are overwritten while it copies them. With no events
+ * configured, nothing is recorded.
+ */
+class trace_buffer : boost::noncopyable {
+    typedef boost::mutex::scoped_lock exclusive_lock;
+public:
+    trace_buffer() : capacity(0), next(0) {}
+
+    // Only called while no thread records
+    void configure(size_t max_events) {
+        exclusive_lock lock(read_lock);
+        slots.assign(max_events, slot());
+        capacity = max_events;
+        next = 0;
+    }
+
+    bool enabled() const {
+        return capacity > 0;
+    }
+
+    void record(trace_phase phase, uint64_t start_usec, uint64_t bytes) {
+        uint64_t index = __sync_fetch_and_add(&next, 1);
+        slot &event = slots[index % capacity];
+        event.sequence = 0;
+        __sync_synchronize();
+        event.event.start_usec = start_usec;
+        event.event.usec = monotonic_usec() - start_usec;
+        event.event.bytes = bytes;
+        event.event.phase = phase;
+        event.event.thread = thread_id();
+        __sync_synchronize();
+        event.sequence = index + 1;
+    }
+
+    // The events still in the buffer, in the order they were recorded
+    std::vector<trace_event> events() {
+        exclusive_lock lock(read_lock);
+        std::vector<trace_event> result;
+        uint64_t end = __sync_fetch_and_add(&next, 0);
+        uint64_t begin = (end > capacity) ? end - capacity : 0;
+        for (uint64_t index = begin; index < end; ++index) {
+            const slot &event = slots[index % capacity];
+            uint64_t sequence = event.sequence;
+            __sync_synchronize();
+            trace_event copy = event.event;
+            __sync_synchronize();
+            if (sequence == index + 1 && event.sequence == sequence)
+                result.push_back(copy);
+        }
+        return result;
+    }
+
+private:
+    struct slot {
+        slot() : sequence(0) {}
+        volatile uint64_t sequence; // index of the event plus one, 0 while it is written
+        trace_event event;
+    };
+
+    static uint32_t thread_id() {
+        static __thread uint32_t id = 0;
+        if (id == 0)
+            id = syscall(SYS_gettid);
+        return id;
+    }
+
+    boost::mutex read_lock; // between readers and configure()
+    std::vector<slot> slots;
+    size_t capacity;
+    volatile uint64_t next; // index of the next event
+};
+
+/*
+ * Traces a phase for as long as it is in scope: fires the SDT probes when the
+ * build has them, and records an event when the buffer is enabled. Each costs
+ * no more than a no-op and a test while not in use.
+ */
+class trace_scope : boost::noncopyable {
+public:
+    trace_scope(trace_buffer &buffer, trace_phase phase, uint64_t bytes = 0) :
+        buffer(buffer), phase(phase), bytes(bytes), start_usec(0) {
+#ifdef HAVE_SYS_SDT_H
+        DTRACE_PROBE2(filewriter, phase__start, int(phase), bytes);
+#endif
+        if (buffer.enabled())
+            start_usec = monotonic_usec();
+    }
+
+    ~trace_scope() {
+#ifdef HAVE_SYS_SDT_H
+        DTRACE_PROBE2(filewriter, phase__done, int(phase), bytes);
+#endif
+        if (start_usec != 0)
+            buffer.record(phase, start_usec, bytes);
+    }
+
+private:
+    trace_buffer &buffer;
+    trace_phase phase;
+    uint64_t bytes;
+    uint64_t start_usec;
+};
+
+#endif
@@ -0,0 +1,271 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#include "uring_writer.h"
+#include <algorithm>
+#include <unistd.h>
+#include <errno.h>
+#include <sys/uio.h>
+#include <boost/bind.hpp>
+
+struct uring_writer::request {
+    request(int file, long expected_result, bool deleted_when_done = true) :
+        fd(file), expected(expected_result), result(0), offset(0), datasync(false), linked(false),
+        done(false), reaped(deleted_when_done) {}
+    int fd;
+    long expected;  // result of a successful operation
+    long result;
+    size_t offset;  // of a write in the file
+    bool datasync;  // a write is followed by a linked fdatasync
+    bool linked;    // an fdatasync linked to a write, cancelled if the write fails or is cut short
+    bool done;
+    bool reaped;    // deleted by the reaper, otherwise the submitter waits for it
+    struct iovec iov;
+    boost::shared_ptr<void> owner;
+};
+
+uring_writer::uring_writer() :
+    depth(0),
+    in_flight(0),
+    failed(0),
+    running(false),
+    op_write(false),
+    op_close(false) {
+}
+
+uring_writer::~uring_writer() {
+    stop();
+}
+
+bool uring_writer::active() {
+    exclusive_lock lock(ring_lock);
+    return running;
+}
+
+unsigned long long uring_writer::failures() {
+    exclusive_lock lock(ring_lock);
+    return failed;
+}
+
+void uring_writer::drain(int fd) {
+    exclusive_lock lock(ring_lock);
+    while (in_flight_per_file.find(fd) != in_flight_per_file.end())
+        ring_cond.wait(lock);
+}
+
+bool uring_writer::reserve(exclusive_lock &lock, unsigned entries) {
+    while (running && in_flight + entries > depth)
+        ring_cond.wait(lock);
+    return running;
+}
+
+#ifdef HAVE_LIBURING
+
+bool uring_writer::start(unsigned queue_depth) {
+    exclusive_lock lock(ring_lock);
+    if (running)
+        return true;
+    depth = std::max(queue_depth, 2u); // room for a write and its fdatasync
+    // One extra entry for the wake-up submitted by stop()
+    if (io_uring_queue_init(depth + 1, &ring, 0) < 0)
+        return false;
+    // Kernels before 5.6 have no probe, and only the operations of 5.1
+    struct io_uring_probe *probe = io_uring_get_probe_ring(&ring);
+    bool writes = true;
+    op_write = op_close = false;
+    if (probe) {
+        writes = io_uring_opcode_supported(probe, IORING_OP_WRITEV) && io_uring_opcode_supported(probe, IORING_OP_FSYNC);
+        op_write = io_uring_opcode_supported(probe, IORING_OP_WRITE);
+        op_close = io_uring_opcode_supported(probe, IORING_OP_CLOSE);
+        io_uring_free_probe(probe);
+    }
+    if (!writes) {
+        io_uring_queue_exit(&ring);
+        return false;
+    }
+    failed_files.clear();
+    running = true;
+    reaper.reset(new boost::thread(boost::bind(&uring_writer::reap, this)));
+    return true;
+}
+
+void uring_writer::stop() {
+    {
+        exclusive_lock lock(ring_lock);
+        if (!running)
+            return;
+        while (in_flight > 0)
+            ring_cond.wait(lock);
+        running = false;
+        // A completion without a request tells the reaper to exit
+        struct io_uring_sqe *sqe = io_uring_get_sqe(&ring);
+        io_uring_prep_nop(sqe);
+        io_uring_sqe_set_data(sqe, NULL);
+        io_uring_submit(&ring);
+    }
+    reaper->join();
+    reaper.reset();
+    io_uring_queue_exit(&ring);
+    ring_cond.notify_all();
+}
+
+bool uring_writer::write(int fd, const char *data, size_t size, size_t offset, bool datasync, const boost::shared_ptr<void> &owner) {
+    exclusive_lock lock(ring_lock);
+    unsigned entries = datasync ? 2 : 1;
+    if (!reserve(lock, entries))
+        return false;
+
+    request *write_request = new request(fd, long(size));
+    write_request->iov.iov_base = const_cast<char*>(data);
+    write_request->iov.iov_len = size;
+    write_request->offset = offset;
+    write_request->datasync = datasync;
+    write_request->owner = owner;
+    in_flight += entries;
+    in_flight_per_file[fd] += entries;
+    submit_write(write_request);
+    return true;
+}
+
+// Submits what is left of a write, and its fdatasync. Called with ring_lock held.
+void uring_writer::submit_write(request *write_request) {
+    struct io_uring_sqe *sqe = io_uring_get_sqe(&ring);
+    if (op_write)
+        io_uring_prep_write(sqe, write_request->fd, write_request->iov.iov_base, write_request->iov.iov_len, write_request->offset);
+    else
+        io_uring_prep_writev(sqe, write_request->fd, &write_request->iov, 1, write_request->offset);
+    io_uring_sqe_set_data(sqe, write_request);
+    if (write_request->datasync) {
+        sqe->flags |= IOSQE_IO_LINK;
+        sqe = io_uring_get_sqe(&ring);
+        io_uring_prep_fsync(sqe, write_request->fd, IORING_FSYNC_DATASYNC);
+        request *sync_request = new request(write_request->fd, 0);
+        sync_request->linked = true;
+        io_uring_sqe_set_data(sqe, sync_request);
+    }
+    io_uring_submit(&ring);
+}
+
+bool uring_writer::close(int fd) {
+    exclusive_lock lock(ring_lock);
+    while (in_flight_per_file.find(fd) != in_flight_per_file.end())
+        ring_cond.wait(lock);
+    bool write_failed = (failed_files.erase(fd) > 0);
+    if (!op_close || !reserve(lock, 1)) {
+        lock.unlock();
+        return (::close(fd) == 0) && !write_failed;
+    }
+
+    request close_request(fd, 0, false);
+    struct io_uring_sqe *sqe = io_uring_get_sqe(&ring);
+    io_uring_prep_close(sqe, fd);
+    io_uring_sqe_set_data(sqe, &close_request);
+    in_flight++;
+    in_flight_per_file[fd]++;
+    io_uring_submit(&ring);
+    while (!close_request.done)
+        ring_cond.wait(lock);
+    lock.unlock();
+    long result = close_request.result;
+    // The descriptor stays open when the ring could not run the close at all;
+    // any other error has released it, and it may already be reused
+    if (result == -EINVAL || result == -EOPNOTSUPP)
+        result = ::close(fd);
+    return (result == 0) && !write_failed;
+}
+
+void uring_writer::reap() {
+    while (true) {
+        struct io_uring_cqe *cqe = NULL;
+        int ret = io_uring_wait_cqe(&ring, &cqe);
+        if (ret == -EINTR)
+            continue;
+        if (ret < 0)
+            return;
+        request *completed = (request*) io_uring_cqe_get_data(cqe);
+        long result = cqe->res;
+        io_uring_cqe_seen(&ring, cqe);
+        if (completed == NULL)
+            return;
+
+        // A write cut short goes on with the rest of its data, which keeps its slot
+        if (result > 0 && result < completed->expected) {
+            exclusive_lock lock(ring_lock);
+            completed->iov.iov_base = (char*) completed->iov.iov_base + result;
+            completed->iov.iov_len -= result;
+            completed->offset += result;
+            completed->expected -= result;
+            if (completed->datasync) {
+                // Its fdatasync was cancelled, and is submitted again with it
+                in_flight++;
+                in_flight_per_file[completed->fd]++;
+            }
+            submit_write(completed);
+            continue;
+        }
+
+        // Release the buffer before taking the lock
+        completed->owner.reset();
+        bool reaped = completed->reaped;
+
+        {
+            exclusive_lock lock(ring_lock);
+            // A cancelled fdatasync follows a failed write, or one that is submitted again
+            bool cancelled = completed->linked && result == -ECANCELED;
+            if (result != completed->expected && !cancelled) {
+                failed++;
+                // close() reports the failures of a file, and sees its own result
+                if (reaped)
+                    failed_files.insert(completed->fd);
+            }
+            in_flight--;
+            std::map<int, unsigned>::iterator file = in_flight_per_file.find(completed->fd);
+            if (file != in_flight_per_file.end() && --file->second == 0)
+                in_flight_per_file.erase(file);
+            completed->result = result;
+            completed->done = true;
+            ring_cond.notify_all();
+        }
+        if (reaped)
+            delete completed;
+    }
+}
+
+#else
+
+bool uring_writer::start(unsigned queue_depth) {
+    return false;
+}
+
+void uring_writer::stop() {
+}
+
+bool uring_writer::write(int fd, const char *data, size_t size, size_t offset, bool datasync, const boost::shared_ptr<void> &owner) {
+    return false;
+}
+
+bool uring_writer::close(int fd) {
+    return ::close(fd) == 0;
+}
+
+void uring_writer::reap() {
+}
+
+#endif
@@ -0,0 +1,103 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_URING_WRITER_H
+#define FILEWRITER_URING_WRITER_H
+
+#include <map>
+#include <set>
+#include <boost/thread/thread.hpp>
+#include <boost/thread/mutex.hpp>
+#include <boost/thread/condition_variable.hpp>
+#include <boost/smart_ptr.hpp>
+#include <boost/utility.hpp>
+#ifdef HAVE_LIBURING
+#include <liburing.h>
+#endif
+
+/*
+ * Submits the writes to local files through a single io_uring, so that one
+ * thread can keep many writes in flight across every open file. Up to
+ * queue_depth operations are in flight at once; further submissions wait for
+ * a completion. Completions are reaped on a dedicated thread, which releases
+ * the owner that kept each write's buffer alive.
+ *
+ * Writes to a file may complete in any order, as each one is made at an
+ * explicit offset. Anything that needs the file to be up to date (reads,
+ * synchronous writes, close) calls drain() first.
+ *
+ * A write that completes short is submitted again for the rest of its data.
+ * A write that fails is counted, and reported by close() for its file.
+ *
+ * Without liburing, or when the kernel does not support io_uring writes,
+ * start() fails and the caller keeps writing synchronously. On kernels
+ * without IORING_OP_CLOSE (before 5.6), close() closes the descriptor itself.
+ */
+class uring_writer : boost::noncopyable {
+    typedef boost::mutex::scoped_lock exclusive_lock;
+public:
+    uring_writer();
+    ~uring_writer();
+
+    bool start(unsigned queue_depth);
+    // Waits for everything in flight, then releases the ring
+    void stop();
+    bool active();
+
+    /*
+     * Submits a write of size bytes at data to offset in the file. With
+     * datasync, an fdatasync linked to the write follows it.
+     */
+    bool write(int fd, const char *data, size_t size, size_t offset, bool datasync, const boost::shared_ptr<void> &owner);
+    // Waits for every operation submitted for fd to complete
+    void drain(int fd);
+    /*
+     * Closes fd through the ring once everything submitted for it is
+     * complete. Fails if the close or any write to fd failed.
+     */
+    bool close(int fd);
+
+    // Number of operations that failed or were cut short
+    unsigned long long failures();
+
+private:
+    struct request;
+
+    bool reserve(exclusive_lock &lock, unsigned entries);
+    void submit_write(request *write_request);
+    void reap();
+
+    boost::mutex ring_lock;
+    boost::condition_variable ring_cond; // an operation completed
+    unsigned depth;
+    unsigned in_flight;
+    std::map<int, unsigned> in_flight_per_file;
+    unsigned long long failed;
+    std::set<int> failed_files; // descriptors with a failed write
+    bool running;
+    bool op_write;  // the kernel supports IORING_OP_WRITE, otherwise IORING_OP_WRITEV is used
+    bool op_close;  // the kernel supports IORING_OP_CLOSE
+    boost::scoped_ptr<boost::thread> reaper;
+#ifdef HAVE_LIBURING
+    struct io_uring ring;
+#endif
+};
+
+#endif
@@ -0,0 +1,222 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK Basic Components FileWriter.
+ *
+ * REDHAWK Basic Components FileWriter is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK Basic Components FileWriter is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+
+#ifndef FILEWRITER_WRITE_BEHIND_QUEUE_H
+#define FILEWRITER_WRITE_BEHIND_QUEUE_H
+
+#include <algorithm>
+#include <string>
+#include <boost/smart_ptr.hpp>
+#include "performance_statistics.h"
+#include "sharded_pool.h"
+
+struct write_behind_counters {
+    write_behind_counters() :
+        queued_bytes(0), peak_queued_bytes(0), written_bytes(0), writes(0),
+        dropped_bytes(0), dropped_writes(0), blocked_writes(0), failed_writes(0) {}
+
+    size_t queued_bytes;        // currently waiting to be written
+    size_t peak_queued_bytes;
+    unsigned long long written_bytes;
+    unsigned long long writes;
+    unsigned long long dropped_bytes;
+    unsigned long long dropped_writes; // rejected by the DROP overflow policy
+    unsigned long long blocked_writes; // had to wait for room under the BLOCK policy
+    unsigned long long failed_writes;  // the file I/O layer reported an error
+};
+
+// A write queued by write_behind_queue
+template <class FILE_IO>
+struct write_behind_request {
+    write_behind_request() : io(NULL), data(NULL), size(0), flush(false), success(false) {}
+    FILE_IO *io;
+    const char *data;
+    size_t size;
+    bool flush;
+    boost::shared_ptr<void> owner;
+    bool success; // set once the write has been carried out
+};
+
+/*
+ * Bounded write-behind stage between the service threads and the file I/O
+ * layer. Writes are queued and carried out by a pool of I/O threads, so a slow
+ * disk or remote file system no longer stalls packet ingest. The writes to any
+ * one file are carried out in the order they were queued.
+ *
+ * The queued data is not copied. Each write carries an owner that keeps its
+ * buffer alive until the write has been carried out.
+ *
+ * While stopped, write() goes straight through to the file I/O layer without
+ * taking the lock of the queue, so that it costs the threads writing in
+ * parallel nothing more than the write itself.
+ */
+template <class FILE_IO>
+class write_behind_queue : public sharded_pool<write_behind_request<FILE_IO> > {
+    typedef sharded_pool<write_behind_request<FILE_IO> > pool;
+    typedef typename pool::exclusive_lock exclusive_lock;
+    typedef write_behind_request<FILE_IO> request;
+    using pool::pool_lock;
+    using pool::space_cond;
+    using pool::running;
+public:
+    enum overflow_policy {
+        BLOCK = 0,  // wait for the I/O threads to make room
+        DROP = 1    // discard the write, if it may be dropped
+    };
+
+    write_behind_queue() : max_bytes(0), policy(BLOCK), queueing(false) {}
+
+    ~write_behind_queue() {
+        this->stop();
+    }
+
+    void start(size_t max_queued_bytes, overflow_policy overflow, size_t num_threads) {
+        exclusive_lock lock(pool_lock);
+        if (running)
+            return;
+        max_bytes = max_queued_bytes;
+        policy = overflow;
+        this->start_threads(num_threads);
+        queueing = true;
+        __sync_synchronize();
+    }
+
+    /*
+     * Stops the I/O threads once everything that was queued has been written
+     */
+    void stop() {
+        pool::stop();
+        queueing = false;
+        __sync_synchronize();
+    }
+
+    /*
+     * Queues size bytes at data to be written to uri. The owner must keep data
+     * valid until the write is carried out. Only a droppable write is ever
+     * discarded by the DROP policy, the others wait for room as with BLOCK.
+     * Returns false if the write was dropped. A write that fails is counted
+     * in failed_writes.
+     */
+    bool write(FILE_IO *io, const std::string &uri, const char *data, size_t size, bool flush, const boost::shared_ptr<void> &owner, bool droppable = false) {
+        if (!queueing) {
+            write_now(io, uri, data, size, flush);
+            return true;
+        }
+        exclusive_lock lock(pool_lock);
+        if (!running) {
+            lock.unlock();
+            write_now(io, uri, data, size, flush);
+            return true;
+        }
+
+        // A single write larger than the cap is let through once the queue is empty
+        bool blocked = false;
+        while (running && stats.queued_bytes > 0 && stats.queued_bytes + size > max_bytes) {
+            if (policy == DROP && droppable) {
+                stats.dropped_bytes += size;
+                stats.dropped_writes++;
+                return false;
+            }
+            if (!blocked) {
+                stats.blocked_writes++;
+                blocked = true;
+            }
+            space_cond.wait(lock);
+        }
+        if (!running) {
+            lock.unlock();
+            write_now(io, uri, data, size, flush);
+            return true;
+        }
+
+        request req;
+        req.io = io;
+        req.data = data;
+        req.size = size;
+        req.flush = flush;
+        req.owner = owner;
+        this->enqueue(uri, req);
+        stats.queued_bytes += size;
+        stats.peak_queued_bytes = std::max(stats.peak_queued_bytes, stats.queued_bytes);
+        return true;
+    }
+
+    /*
+     * Waits until every write queued so far for uri has been carried out. Must
+     * be called before the file is read, repositioned or closed.
+     */
+    void drain(const std::string &uri) {
+        this->wait(uri);
+    }
+
+    write_behind_counters counters() {
+        exclusive_lock lock(pool_lock);
+        write_behind_counters result = stats;
+        result.written_bytes = written_bytes.get();
+        result.writes = writes.get();
+        result.failed_writes = failed_writes.get();
+        return result;
+    }
+
+protected:
+    void perform(const std::string &uri, request &req) {
+        req.success = false;
+        try {
+            req.success = req.io->write(uri, const_cast<char*>(req.data), req.size, req.flush);
+        } catch (...) {
+        }
+        req.owner.reset();
+    }
+
+    void finished(const std::string &, const request &req) {
+        stats.queued_bytes -= req.size;
+        count(req.size, req.success);
+    }
+
+private:
+    // Writes straight through while the I/O threads are stopped
+    void write_now(FILE_IO *io, const std::string &uri, const char *data, size_t size, bool flush) {
+        bool success = false;
+        try {
+            success = io->write(uri, const_cast<char*>(data), size, flush);
+        } catch (...) {
+        }
+        count(size, success);
+    }
+
+    void count(size_t size, bool success) {
+        if (success) {
+            written_bytes.add(size);
+            writes.add(1);
+        } else {
+            failed_writes.add(1);
+        }
+    }
+
+    write_behind_counters stats; // but for the counters of the writes carried out, below
+    atomic_counter written_bytes;
+    atomic_counter writes;
+    atomic_counter failed_writes;
+    size_t max_bytes;
+    overflow_policy policy;
+    volatile bool queueing; // running, for write() to read without pool_lock
+};
+
+#endif